@@ -1,174 +1,290 @@
-import numpy as np
-import pandas as pd
-import skfuzzy as fuzz
-import skfuzzy.control as ctrl
+import os
 import streamlit as st
-import pdfplumber
-import re
-from utils import generate_health_report_pdf
+import tracing
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from report_renderer import RENDERER, health_report
+from health_warnings import health_warnings
+from report_ingestion import PARSED_REPORTS, report_type, upload_key
+from extraction_jobs import EXTRACTIONS, ExtractionBusy
+from patient_log import live_stats, patient_log
+from datasets import dataset_cache_path, read_dataset
+from table_view import DEFAULT_PAGE_SIZE, QueryCache, TableView, table_view
+from batch_scoring import score_uploads
+from what_if import DEFAULT_STEPS, INPUT_TITLES, risk_chart, risk_grid
+from model_registry import REGISTRY
+from result_cache import quantize
+from population import percentile
+from doctor_directory import doctor_directory, recommended_doctors
 from diet_loader import load_diet_plan
 from streamlit_option_menu import option_menu
-from bs4 import BeautifulSoup
+from lazy_imports import lazy_import
 from streamlit import download_button
 
-# --- Load datasets ---
-def load_dataset(dataset_type):
-    try:
-        if dataset_type == "diabetes":
-            return pd.read_csv("diabetes.csv")
-        elif dataset_type == "heart":
-            return pd.read_csv("heart.csv")
-        elif dataset_type == "thyroid":
-            file_path = "thyroid_dataset_300_rows.csv"
-            df = pd.read_csv(file_path)
-            df.columns = df.columns.str.strip()
-            df.rename(columns={
-                'TSH (mIU/L)': 'TSH',
-                'T3 (ng/dL)': 'T3',
-                'T4 (µg/dL)': 'T4'
-            }, inplace=True)
-            return df
-        elif dataset_type == "pcod":
-            return pd.read_csv("pcod.csv")
-        elif dataset_type == "anxiety":
-            return pd.read_csv("anxiety_dataset_300_modified.csv")
-    except Exception as e:
-        st.error(f"Error loading {dataset_type} dataset: {e}")
-        return None
+# Heavy libraries load with the first page that needs them (see lazy_imports.py)
+pd = lazy_import("pandas")
+fuzzy_models = lazy_import("fuzzy_models")
 
+# Set MDS_LUT_MODE=1 to answer predictions from precomputed risk surfaces;
+# models whose surface misses its error tolerance (risk_surfaces.py) keep
+# using the engine, and their page says so
+LUT_MODE = os.environ.get("MDS_LUT_MODE") == "1"
 
-# --- Fuzzy Logic for Heart Disease ---
-def create_fuzzy_heart(df):
-    age = ctrl.Antecedent(np.arange(df['age'].min(), df['age'].max() + 1, 1), 'age')
-    cholesterol = ctrl.Antecedent(np.arange(df['Cholesterol'].min(), df['Cholesterol'].max() + 1, 1), 'cholesterol')
-    thalach = ctrl.Antecedent(np.arange(df['thalach'].min(), df['thalach'].max() + 1, 1), 'thalach')
-    chest_pain = ctrl.Antecedent(np.arange(0, 4, 1), 'chest_pain')
-    resting_bp = ctrl.Antecedent(np.arange(df['trestbps'].min(), df['trestbps'].max() + 1, 1), 'resting_bp')
-    heart_risk = ctrl.Consequent(np.arange(0, 101, 1), 'heart_risk')
-
-    age.automf(3)
-    cholesterol.automf(3)
-    thalach.automf(3)
-    chest_pain.automf(3)
-    resting_bp.automf(3)
-    heart_risk.automf(3)
-
-    rules = [
-        ctrl.Rule(age['poor'] & cholesterol['poor'], heart_risk['poor']),
-        ctrl.Rule(chest_pain['poor'] & resting_bp['poor'], heart_risk['poor']),
-        ctrl.Rule(age['average'] & cholesterol['average'], heart_risk['average']),
-        ctrl.Rule(thalach['good'] & cholesterol['good'], heart_risk['good']),
-        ctrl.Rule(chest_pain['good'] & thalach['good'] & age['good'], heart_risk['good']),
-    ]
-
-    heart_ctrl = ctrl.ControlSystem(rules)
-    return ctrl.ControlSystemSimulation(heart_ctrl)
-
-
-# --- Fuzzy Logic for Diabetes ---
-def create_fuzzy_diabetes(df):
-    glucose = ctrl.Antecedent(np.arange(df['Glucose'].min(), df['Glucose'].max() + 1, 1), 'glucose')
-    bmi = ctrl.Antecedent(np.arange(df['BMI'].min(), df['BMI'].max() + 1, 1), 'bmi')
-    age = ctrl.Antecedent(np.arange(df['Age'].min(), df['Age'].max() + 1, 1), 'age')
-    blood_pressure = ctrl.Antecedent(np.arange(df['BloodPressure'].min(), df['BloodPressure'].max() + 1, 1), 'blood_pressure')
-    diabetes_risk = ctrl.Consequent(np.arange(0, 101, 1), 'diabetes_risk')
-
-    glucose.automf(3)
-    bmi.automf(3)
-    age.automf(3)
-    blood_pressure.automf(3)
-    diabetes_risk.automf(3)
-
-    rules = [
-        ctrl.Rule(glucose['poor'] & bmi['poor'] & age['poor'], diabetes_risk['poor']),
-        ctrl.Rule(glucose['average'] & bmi['average'] & age['average'], diabetes_risk['average']),
-        ctrl.Rule(glucose['good'] & bmi['good'] & age['good'], diabetes_risk['good']),
-        ctrl.Rule(blood_pressure['poor'] & glucose['poor'], diabetes_risk['poor']),
-        ctrl.Rule(blood_pressure['average'] & bmi['average'] & age['average'], diabetes_risk['average']),
-        ctrl.Rule(glucose['average'] & blood_pressure['good'], diabetes_risk['average'])
-    ]
-
-    diabetes_ctrl = ctrl.ControlSystem(rules)
-    return ctrl.ControlSystemSimulation(diabetes_ctrl)
-
-
-
-
-
-
-# --- Fuzzy Logic for Thyroid ---
-def create_fuzzy_thyroid(df):
-    tsh = ctrl.Antecedent(np.arange(df['TSH'].min(), df['TSH'].max() + 1, 0.1), 'tsh')
-    t3 = ctrl.Antecedent(np.arange(df['T3'].min(), df['T3'].max() + 1, 1), 't3')
-    t4 = ctrl.Antecedent(np.arange(df['T4'].min(), df['T4'].max() + 1, 0.1), 't4')
-    thyroid_risk = ctrl.Consequent(np.arange(0, 101, 1), 'thyroid_risk')
-
-    tsh.automf(3)
-    t3.automf(3)
-    t4.automf(3)
-    thyroid_risk.automf(3)
-
-    rules = [
-        ctrl.Rule(tsh['good'] & t3['good'] & t4['good'], thyroid_risk['poor']),
-        ctrl.Rule(tsh['average'] | t3['average'] | t4['average'], thyroid_risk['average']),
-        ctrl.Rule(tsh['poor'] | t3['poor'] | t4['poor'], thyroid_risk['good']),
-    ]
-
-    system = ctrl.ControlSystem(rules)
-    return ctrl.ControlSystemSimulation(system)
-
-
-# --- Fuzzy Logic for PCOD ---
-def create_fuzzy_pcod(df):
-    bmi = ctrl.Antecedent(np.arange(df['BMI'].min(), df['BMI'].max() + 1, 1), 'bmi')
-    insulin = ctrl.Antecedent(np.arange(df['Insulin_Level'].min(), df['Insulin_Level'].max() + 1, 1), 'insulin')
-    lh = ctrl.Antecedent(np.arange(df['LH'].min(), df['LH'].max() + 1, 1), 'lh')
-    pcod_risk = ctrl.Consequent(np.arange(0, 101, 1), 'pcod_risk')
-
-    bmi.automf(3)
-    insulin.automf(3)
-    lh.automf(3)
-    pcod_risk.automf(3)
-
-    rules = [
-        ctrl.Rule(bmi['good'] & insulin['good'] & lh['good'], pcod_risk['poor']),
-        ctrl.Rule(bmi['average'] | insulin['average'] | lh['average'], pcod_risk['average']),
-        ctrl.Rule(bmi['poor'] | insulin['poor'] | lh['poor'], pcod_risk['good'])
-    ]
-
-    system = ctrl.ControlSystem(rules)
-    return ctrl.ControlSystemSimulation(system)
-
-# --- Fuzzy Logic for Anxiety ---
-
-def create_fuzzy_anxiety(df):
-    sleep = ctrl.Antecedent(np.arange(df['SleepHours'].min(), df['SleepHours'].max()+0.1, 0.1), 'sleep')
-    heart_rate = ctrl.Antecedent(np.arange(df['HeartRate'].min(), df['HeartRate'].max()+1, 1), 'heart_rate')
-    fatigue = ctrl.Antecedent(np.arange(0, 2, 1), 'fatigue')
-    irritability = ctrl.Antecedent(np.arange(0, 2, 1), 'irritability')
-    restlessness = ctrl.Antecedent(np.arange(0, 2, 1), 'restlessness')
-    score = ctrl.Antecedent(np.arange(df['ScoreGAD7'].min(), df['ScoreGAD7'].max()+1, 1), 'score')
-    anxiety_risk = ctrl.Consequent(np.arange(0, 101, 1), 'anxiety_risk')
-
-    sleep.automf(3)
-    heart_rate.automf(3)
-    fatigue.automf(3)
-    irritability.automf(3)
-    restlessness.automf(3)
-    score.automf(3)
-    anxiety_risk.automf(3)
+# Set MDS_PATIENT_LOG=1 to append the values of each prediction made on the
+# pages to the patient logs (patient_log.py), which feed the widget defaults
+# and, with MDS_LIVE_BOUNDS=1, the model universes
+PATIENT_LOG = os.environ.get("MDS_PATIENT_LOG") == "1"
 
-    rules = [
-        ctrl.Rule(sleep['poor'] | score['good'] | heart_rate['good'], anxiety_risk['good']),
-        ctrl.Rule(score['average'] | irritability['average'] | fatigue['average'], anxiety_risk['average']),
-        ctrl.Rule(sleep['good'] & fatigue['poor'] & irritability['poor'], anxiety_risk['poor']),
-        ctrl.Rule(restlessness['poor'] | fatigue['good'], anxiety_risk['good']),  # ✅ Added rule with restlessness
-    ]
+# Set MDS_DEBUG=1 to show the model registry and cache stats in the sidebar;
+# end users never see them otherwise
+DEBUG = os.environ.get("MDS_DEBUG") == "1"
 
 
-    system = ctrl.ControlSystem(rules)
-    return ctrl.ControlSystemSimulation(system)
-
+# Reference column stats (for widget defaults) plus a per-session simulation
+# over the shared compiled model
+def load_model(dataset_type):
+    try:
+        with tracing.span("load_model"):
+            stats, sim = live_stats(dataset_type), REGISTRY.simulation(dataset_type, lut=LUT_MODE)
+    except Exception as e:
+        st.error(f"Error loading {dataset_type} model: {e}")
+        return None, None
+    note = REGISTRY.lut_fallback(dataset_type) if LUT_MODE else None
+    if note:
+        st.caption(f"LUT mode: {note}.")
+    return stats, sim
+
+
+def log_prediction(disease, inputs):
+    # One record per distinct set of values in a session, however often
+    # Predict is clicked; values are rounded as the model cache rounds them
+    if not PATIENT_LOG:
+        return
+    columns = fuzzy_models.MODELS[disease]["inputs"]
+    record = {columns[label]: value for label, value in quantize(disease, inputs).items()}
+    if st.session_state.get(f"{disease}_logged") != record:
+        patient_log(disease).append(record)
+        st.session_state[f"{disease}_logged"] = record
+
+
+def show_recommended_doctors(disease, label):
+    st.subheader(f"Recommended Doctors for {label}")
+    try:
+        groups = recommended_doctors(disease)
+        if groups:
+            for location, doctors in groups:
+                st.markdown(f"##### 📍 Location: {location}")
+                st.dataframe(doctors, use_container_width=True)
+        else:
+            st.info(f"No doctors found for {label}.")
+    except Exception as e:
+        st.error(f"Error loading doctors data: {e}")
+
+
+def show_report_download(name, condition, diagnosis, warnings):
+    # Rendered once per distinct report content, shared across sessions
+    with tracing.span("report_pdf"):
+        pdf = RENDERER.render(health_report(name, condition, diagnosis, warnings))
+    st.download_button(
+        label="📄 Download PDF",
+        data=pdf,
+        file_name=f"{name}_Health_Report.pdf",
+        mime="application/pdf"
+    )
+
+
+def show_population_percentile(disease, risk):
+    # Sorted reference-cohort risks, scored once per dataset/model version
+    with tracing.span("population_percentile"):
+        risks = REGISTRY.population(disease)
+        share = percentile(risks, risk)
+    st.caption(f"📊 Your risk score ({risk:.1f}) is higher than {share:.0f}% of the "
+               f"{len(risks)} people in the reference dataset.")
+
+
+def uploaded_reports(disease, uploaded_files):
+    """[(file name, cache key, LabReport or the error reading it)], or None while files are still being read.
+
+    Parsed reports are cached by content (report_ingestion.PARSED_REPORTS),
+    so reruns and re-uploads cost a hash. Files not in the cache go to the
+    background extraction pool (extraction_jobs.py), which reads them
+    concurrently; the job is kept in the session and its progress shown
+    until it completes. A single CSV/XLSX file is read inline.
+    """
+    job_key = f"{disease}_upload_job"
+    job = st.session_state.get(job_key)
+    if not uploaded_files:
+        if job is not None:
+            job.cancel()
+            del st.session_state[job_key]
+        return None
+
+    with tracing.span("parse_upload"):
+        files = []
+        for uploaded_file in uploaded_files:
+            data = uploaded_file.getvalue()
+            files.append((uploaded_file.name, data, upload_key(disease, uploaded_file.name, data)))
+        outcomes = {key: PARSED_REPORTS.get(key) for _, _, key in files}
+        todo = list({key: (name, data, key) for name, data, key in files if outcomes[key] is None}.values())
+        if len(todo) == 1 and report_type(todo[0][0]) != "pdf":
+            name, data, key = todo.pop()
+            try:
+                outcomes[key] = PARSED_REPORTS.parse(disease, name, data, key)
+            except Exception as e:
+                outcomes[key] = e
+    if job is not None and not {key for _, _, key in todo} <= set(job.keys):
+        job.cancel()
+        del st.session_state[job_key]
+        job = None
+
+    if todo:
+        if job is None:
+            try:
+                job = EXTRACTIONS.submit(disease, todo)
+            except ExtractionBusy as e:
+                st.warning(f"⏳ {e}")
+                return None
+            st.session_state[job_key] = job
+        if not job.done:
+            show_extraction_progress(job)
+            return None
+        # Failed files stay with the job in the session and are not read again
+        for key, outcome in zip(job.keys, job.outcomes()):
+            if key in outcomes and outcomes[key] is None:
+                outcomes[key] = outcome
+                if not isinstance(outcome, BaseException):
+                    PARSED_REPORTS.put(key, outcome)
+    elif job is not None:
+        del st.session_state[job_key]
+    return [(name, key, outcomes[key]) for name, _, key in files]
+
+
+def uploaded_report(disease, uploaded_files):
+    """LabReport of a single uploaded patient; raises the error reading it.
+
+    None while files are being read, or when the upload holds several
+    patients -- those are scored together and shown as a table instead.
+    """
+    uploads = uploaded_reports(disease, uploaded_files)
+    if not uploads:
+        return None
+    if len(uploads) == 1:
+        _, _, outcome = uploads[0]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if outcome.patients <= 1:
+            return outcome
+    show_batch_results(disease, uploads)
+    return None
+
+
+def show_batch_results(disease, uploads):
+    # Every patient scored in one batched evaluation (batch_scoring.py); kept
+    # in the session until the set of uploaded files changes
+    batch_key = f"{disease}_batch"
+    keys = tuple(key for _, key, _ in uploads)
+    batch = st.session_state.get(batch_key)
+    if batch is None or batch[0] != keys:
+        with tracing.span("batch_score"):
+            results = score_uploads(disease, [(name, outcome) for name, _, outcome in uploads])
+        batch = st.session_state[batch_key] = (keys, results, TableView(results))
+    _, results, view = batch
+
+    scored = results["diagnosis"] != ""
+    st.success(f"✅ {len(results)} patients from {len(uploads)} files: {int(scored.sum())} scored, "
+               f"{int((results['diagnosis'] == 'Yes').sum())} predicted Yes")
+    if not scored.all():
+        st.warning(f"⚠️ {int((~scored).sum())} patients not scored: see the missing and error columns")
+    show_table(view, batch_key)
+    st.download_button(
+        label="📥 Download results (CSV)",
+        data=results.to_csv(index=False).encode("utf-8"),
+        file_name=f"{disease}_results.csv",
+        mime="text/csv"
+    )
+
+
+@st.fragment(run_every=0.5)
+def show_extraction_progress(job):
+    # Polls the job; the whole page reruns once its values are ready
+    if job.done:
+        st.rerun()
+    if job.status == "queued":
+        st.progress(0.0, text=f"⏳ Waiting to read {job.name}...")
+    elif len(job.names) == 1:
+        done, total = job.pages[0]
+        st.progress(job.fraction, text=f"📄 Reading {job.name}: page {done} of {total or '?'}")
+    else:
+        st.progress(job.fraction, text=f"📄 Reading {job.name}: {job.files_done} done")
+
+
+def show_what_if(disease, values):
+    # Risk over two inputs with the others held at the values entered above
+    # (what_if.py); grids are cached per held values and grid size
+    if not st.toggle("🧭 What-if risk map", key=f"{disease}_what_if"):
+        return
+    labels = {INPUT_TITLES[label]: label for label in values}
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        x_title = st.selectbox("Horizontal axis", list(labels), index=0, key=f"{disease}_what_if_x")
+    with col2:
+        y_title = st.selectbox("Vertical axis", [title for title in labels if title != x_title],
+                               key=f"{disease}_what_if_y")
+    with col3:
+        steps = st.selectbox("Grid", [50, DEFAULT_STEPS, 200], index=1, key=f"{disease}_what_if_steps")
+    x, y = labels[x_title], labels[y_title]
+    with tracing.span("what_if"):
+        grid = risk_grid(disease, x, y, values, steps)
+        st.altair_chart(risk_chart(grid, (values[x], values[y]), x_title, y_title), width="stretch")
+    held = ", ".join(f"{title} {values[label]:.4g}" for title, label in labels.items() if label not in (x, y))
+    st.caption(f"Risk with {held}; ✚ marks the values entered above. Red is at or above the Yes cut-off of 50.")
+
+
+def show_table(view, key):
+    # Filters, sorting and paging run server-side (table_view.py); the browser
+    # only receives the current page. Results are cached for this session.
+    with st.expander("🔎 Filter & sort"):
+        search = st.text_input("Search text columns", key=f"{key}_search").strip()
+        ranges = ()
+        column = st.selectbox("Range filter", ["(none)"] + view.numeric_columns, key=f"{key}_range_column")
+        if column != "(none)":
+            low, high = view.bounds(column)
+            if low < high:
+                ranges = ((column, *st.slider(column, low, high, (low, high), key=f"{key}_range_{column}")),)
+        sort = st.selectbox("Sort by", ["(file order)"] + view.columns, key=f"{key}_sort")
+        descending = st.checkbox("Descending", key=f"{key}_descending")
+    sort = None if sort == "(file order)" else sort
+    query = (view, key, search, ranges, sort, descending)
+
+    cache = st.session_state.setdefault("table_queries", QueryCache())
+    with tracing.span("table_query"):
+        rows = cache.get(("rows",) + query,
+                         lambda: view.select(search, ranges=ranges, sort=sort, ascending=not descending))
+
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        page_size = st.selectbox("Rows per page", [25, DEFAULT_PAGE_SIZE, 100, 500], index=1, key=f"{key}_page_size")
+    pages = max(1, -(-len(rows) // page_size))
+    with col2:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    first = (page - 1) * page_size
+    if len(rows):
+        st.caption(f"Rows {first + 1}–{min(first + page_size, len(rows))} of {len(rows)} matching "
+                   f"({view.rows} in total)")
+    else:
+        st.caption(f"No matching rows ({view.rows} in total)")
+    st.dataframe(view.page(rows, page - 1, page_size))
+
+    with st.expander("📈 Column summary (matching rows)"):
+        st.dataframe(cache.get(("summary",) + query, lambda: view.summary(rows)))
+
+
+def show_warnings(warnings):
+    if warnings:
+        warning_html = '<div style="background-color:#fbeaea;padding:10px;border-radius:8px;">' + \
+                       '<br>'.join(f'<span style="color:#d00000;">{w}</span>' for w in warnings) + \
+                       '</div>'
+        st.markdown(warning_html, unsafe_allow_html=True)
+
 
 # --- Streamlit UI ---
 def main():
@@ -180,6 +296,22 @@ def main():
                                 menu_icon="cast",default_index=0
 
 )
+        tracing.set_page(selected)
+        # Build/hit counts per model; builds should only grow when a dataset changes
+        if DEBUG:
+            with st.expander("⚙️ Model registry"):
+                stats = REGISTRY.stats()
+                if any(s["builds"] for s in stats.values()):
+                    st.dataframe(pd.DataFrame(stats).T)
+                else:
+                    st.caption("No models loaded yet.")
+                st.caption("Report PDFs: " + ", ".join(f"{k} {v:.3g}" for k, v in RENDERER.stats().items()))
+                st.caption("Parsed uploads: " + ", ".join(f"{k} {v:.3g}" for k, v in PARSED_REPORTS.stats().items()))
+        if tracing.enabled():
+            with st.expander("⏱️ Stage timings (ms)"):
+                timings = {f"{stage} [{page}]": {k: 1000 * v if k != "count" else v for k, v in stats.items()}
+                           for (stage, page), stats in tracing.stage_stats().items()}
+                st.dataframe(pd.DataFrame(timings).T)
 
     if selected == "Home":
         st.markdown("""<div style='text-align: justify; font-size: 16px; line-height: 1.6'>
@@ -203,33 +335,39 @@ def main():
     elif selected == "Doctors":
         st.subheader("Doctors' Dataset")
         try:
-            doctor_data = pd.read_csv("indian_doctors_dataset.csv")
-            st.dataframe(doctor_data)
+            directory = doctor_directory()
+            show_table(table_view(("doctors", directory.fingerprint), lambda: directory.doctors), "doctors")
         except FileNotFoundError:
             st.warning("Doctor dataset not found. Please upload or check the file.")
     elif selected == "Dataset":
         st.subheader(" View Dataset")
         dataset_choice = st.selectbox("Select which dataset to display", ["Heart", "Diabetes", "Thyroid", "PCOD","Anxiety"])
 
-        df = load_dataset(dataset_choice.lower())
-        if df is not None:
-            st.dataframe(df)
+        disease = dataset_choice.lower()
+        try:
+            view = table_view((f"dataset:{disease}", dataset_cache_path(disease)), lambda: read_dataset(disease))
+        except Exception as e:
+            st.error(f"Error loading {disease} dataset: {e}")
+        else:
+            show_table(view, f"dataset_{disease}")
 
 # Heart disease logic
 
     elif selected == "Heart Disease":
-        df = load_dataset("heart")
-        if df is None:
+        stats, sim = load_model("heart")
+        if stats is None:
             return
 
-        sim = create_fuzzy_heart(df)
         st.subheader("Heart Disease")
 
-        age = st.number_input("Age", min_value=1, max_value=100, value=int(df['age'].mean()))
-        cholesterol = st.number_input("Cholesterol", int(df['Cholesterol'].min()), int(df['Cholesterol'].max()), int(df['Cholesterol'].mean()))
-        thalach = st.number_input("Max Heart Rate", min_value=40, max_value=220, value=int(df['thalach'].mean()))
+        age = st.number_input("Age", min_value=1, max_value=100, value=int(stats['age']['mean']))
+        cholesterol = st.number_input("Cholesterol", int(stats['Cholesterol']['min']), int(stats['Cholesterol']['max']), int(stats['Cholesterol']['mean']))
+        thalach = st.number_input("Max Heart Rate", min_value=40, max_value=220, value=int(stats['thalach']['mean']))
         chest_pain = st.slider("Chest Pain Type (0: Typical, 1: Atypical, 2: Non-anginal, 3: Asymptomatic)", 0, 3, 1)
-        resting_bp = st.number_input("Resting Blood Pressure", min_value=60, max_value=200, value=int(df['trestbps'].mean()))
+        resting_bp = st.number_input("Resting Blood Pressure", min_value=60, max_value=200, value=int(stats['trestbps']['mean']))
+
+        show_what_if("heart", {"age": age, "cholesterol": cholesterol, "thalach": thalach,
+                               "chest_pain": chest_pain, "resting_bp": resting_bp})
 
         col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
@@ -244,82 +382,30 @@ def main():
             sim.input['thalach'] = thalach
             sim.input['chest_pain'] = chest_pain
             sim.input['resting_bp'] = resting_bp
-            sim.compute()
+            with tracing.span("compute"):
+                sim.compute()
 
             risk = sim.output['heart_risk']
             st.session_state.heart_diagnosis = "Yes" if risk >= 50 else "No"
             st.success(f"Predicted Heart Disease Risk: {st.session_state.heart_diagnosis}")
+            show_population_percentile("heart", risk)
+            log_prediction("heart", sim.input)
 
         name = st.text_input("Enter your name", key="user_name_heart")
 
         st.write(f"🛠️ Debug: diagnosis = {st.session_state.get('heart_diagnosis')}, name = '{name}'")
 
         if st.session_state.get("heart_diagnosis") and name:
-            # Only generate once
-            if "heart_pdf" not in st.session_state or st.session_state.get("pdf_name") != name:
-                health_tips = [
-                    "Maintain a balanced diet",
-                    "Exercise regularly",
-                    "Avoid processed sugar",
-                    "Follow up with a physician"
-                ]
-                raw_diet = load_diet_plan("Heart Disease", 3, "diet_plans.xlsx")
-                diet_text = BeautifulSoup(raw_diet, "html.parser").get_text()
-                pdf_file = generate_health_report_pdf(name)
-                st.session_state.heart_pdf = pdf_file
-                st.session_state.pdf_name = name
-
-            st.download_button(
-                label="📄 Download PDF",
-                data=st.session_state.heart_pdf,
-                file_name=f"{name}_Health_Report.pdf",
-                mime="application/pdf"
-            )
-
             # Health Warnings
-            warnings = []
-            if cholesterol > 240:
-                warnings.append("⚠️ High Cholesterol – Increased risk of heart disease.")
-            if cholesterol < 125:
-                warnings.append("⚠️ Low Cholesterol – May indicate underlying health issues or malnutrition.")
-            if resting_bp > 140:
-                warnings.append("⚠️ High Resting Blood Pressure – May indicate hypertension.")
-            if resting_bp < 100:
-                warnings.append("⚠️ Low Resting Blood Pressure – May lead to dizziness or fainting.")
-            if thalach < 100:
-                warnings.append("⚠️ Low Max Heart Rate – May be a sign of poor cardiovascular fitness.")
-            if age > 60:
-                warnings.append("⚠️ Age over 60 – Age is a major risk factor for heart disease.")
-            if chest_pain == 3:
-                warnings.append("⚠️ Asymptomatic Chest Pain Type – Often linked with higher heart disease risk.")
-
-            if warnings:
-                warning_html = '<div style="background-color:#fbeaea;padding:10px;border-radius:8px;">' + \
-                               '<br>'.join(f'<span style="color:#d00000;">{w}</span>' for w in warnings) + \
-                               '</div>'
-                st.markdown(warning_html, unsafe_allow_html=True)
+            warnings = health_warnings("heart", {"age": age, "cholesterol": cholesterol, "thalach": thalach,
+                                                 "chest_pain": chest_pain, "resting_bp": resting_bp})
+
+            show_report_download(name, "Heart Disease", st.session_state.heart_diagnosis, warnings)
+
+            show_warnings(warnings)
 
         elif show_doctors:
-            st.subheader("Recommended Doctors for Heart Disease")
-            try:
-                doctor_data = pd.read_csv("indian_doctors_dataset.csv")
-                h_doctors = doctor_data[
-                    doctor_data['Specialist'].str.lower().str.contains("heart", na=False)
-                ]
-                if not h_doctors.empty:
-                    grouped = h_doctors.groupby('Clinic Address')
-                    count = 0
-                    for name, group in grouped:
-                        st.markdown(f"##### 📍 Location: {name}")
-                        top5 = group.head(3)[['Doctor Name', 'Specialist', 'Phone Number', 'Email']]
-                        st.dataframe(top5, use_container_width=True)
-                        count += 1
-                        if count >= 3:
-                            break
-                else:
-                    st.info("No doctors found for Heart Disease.")
-            except Exception as e:
-                st.error(f"Error loading doctors data: {e}")
+            show_recommended_doctors("heart", "Heart Disease")
 
 
 
@@ -327,63 +413,40 @@ def main():
 # Diabetes logic
 
     elif selected == "Diabetes":
-        df = load_dataset("diabetes")
-        if df is None:
+        stats, sim = load_model("diabetes")
+        if stats is None:
             return
 
-        sim = create_fuzzy_diabetes(df)
         st.subheader("Diabetes")
 
-        glucose = st.number_input("Glucose", min_value=40, max_value=300, value=int(df['Glucose'].mean()), key="glucose_input")
-        bmi = st.number_input("BMI", min_value=10.5, max_value=60.0, value=float(df['BMI'].mean()))
-        age = st.number_input("Age", min_value=1, max_value=100, value=int(df['Age'].mean()))
-        bp = st.number_input("Blood Pressure", min_value=60, max_value=200, value=int(df['BloodPressure'].mean()))
+        glucose = st.number_input("Glucose", min_value=40, max_value=300, value=int(stats['Glucose']['mean']), key="glucose_input")
+        bmi = st.number_input("BMI", min_value=10.5, max_value=60.0, value=float(stats['BMI']['mean']))
+        age = st.number_input("Age", min_value=1, max_value=100, value=int(stats['Age']['mean']))
+        bp = st.number_input("Blood Pressure", min_value=60, max_value=200, value=int(stats['BloodPressure']['mean']))
 
-        st.markdown("### 📄 Upload Blood Test Report (CSV, PDF, or Excel)")
-        uploaded_file = st.file_uploader("Choose a file", type=["csv", "xlsx", "pdf"])
+        st.markdown("### 📄 Upload Blood Test Reports (CSV, PDF, or Excel)")
+        uploaded_files = st.file_uploader("Choose files (several files or table rows are scored together)",
+                                          type=["csv", "xlsx", "pdf"], accept_multiple_files=True)
 
-        if uploaded_file:
-            try:
-                if uploaded_file.name.endswith('.csv'):
-                    user_data = pd.read_csv(uploaded_file)
-                elif uploaded_file.name.endswith('.xlsx'):
-                    user_data = pd.read_excel(uploaded_file)
-                elif uploaded_file.name.endswith('.pdf'):
-                    with pdfplumber.open(uploaded_file) as pdf:
-                        text = ""
-                        for page in pdf.pages:
-                            page_text = page.extract_text()
-                            if page_text:
-                                text += page_text + "\n"
-                    patterns = {
-                        "Glucose": r"Glucose[:\s]+([\d.]+)",
-                        "BMI": r"BMI[:\s]+([\d.]+)",
-                        "Age": r"Age[:\s]+([\d.]+)",
-                        "BloodPressure": r"BloodPressure[:\s]+([\d.]+)"
-                    }
-                    data = {}
-                    for key, pattern in patterns.items():
-                        match = re.search(pattern, text, re.IGNORECASE)
-                        if match:
-                            data[key] = float(match.group(1))
-                        else:
-                            data[key] = None
-                    user_data = pd.DataFrame([data])
-                else:
-                    st.error("Unsupported file type.")
-                    st.stop()
+        try:
+            report = uploaded_report("diabetes", uploaded_files)
+        except Exception as e:
+            st.error(f"⚠️ Error reading file: {e}")
+            return
 
-                st.success("✅ Report uploaded successfully!")
-                st.dataframe(user_data)
+        if report is not None:
+            st.success("✅ Report uploaded successfully!")
+            st.dataframe(report.table)
+            # Fields the report doesn't contain keep the values entered above
+            if report.missing:
+                st.warning(f"⚠️ Not found in report, using the values entered above: {', '.join(report.missing)}")
 
-                glucose = user_data['Glucose'][0]
-                bmi = user_data['BMI'][0]
-                age = user_data['Age'][0]
-                bp = user_data['BloodPressure'][0]
+            glucose = report.value('Glucose', glucose)
+            bmi = report.value('BMI', bmi)
+            age = report.value('Age', age)
+            bp = report.value('BloodPressure', bp)
 
-            except Exception as e:
-                st.error(f"⚠️ Error reading file: {e}")
-                return
+        show_what_if("diabetes", {"glucose": glucose, "bmi": bmi, "age": age, "blood_pressure": bp})
 
         col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
@@ -396,133 +459,61 @@ def main():
             sim.input['bmi'] = bmi
             sim.input['age'] = age
             sim.input['blood_pressure'] = bp
-            sim.compute()
+            with tracing.span("compute"):
+                sim.compute()
 
             risk = sim.output['diabetes_risk']
             st.session_state.diabetes_diagnosis = "Yes" if risk >= 50 else "No"
             st.success(f"Predicted Diabetes Status: {st.session_state.diabetes_diagnosis}")
+            show_population_percentile("diabetes", risk)
+            log_prediction("diabetes", sim.input)
 
         name = st.text_input("Enter your name", key="user_name_diabetes")
         st.write(f"🛠️ Debug: diagnosis = {st.session_state.get('diabetes_diagnosis')}, name = '{name}'")
 
         if st.session_state.get("diabetes_diagnosis") and name:
-            if "diabetes_pdf" not in st.session_state or st.session_state.get("pdf_name_diabetes") != name:
-                health_tips = [
-                    "Maintain a balanced diet",
-                    "Exercise regularly",
-                    "Avoid processed sugar",
-                    "Follow up with a physician"
-                ]
-                raw_diet = load_diet_plan("Diabetes", 3, "diet_plans.xlsx")
-                diet_text = BeautifulSoup(raw_diet, "html.parser").get_text()
-                pdf_file = generate_health_report_pdf(name)
-                st.session_state.diabetes_pdf = pdf_file
-                st.session_state.pdf_name_diabetes = name
-
-            st.download_button(
-                label="📄 Download PDF",
-                data=st.session_state.diabetes_pdf,
-                file_name=f"{name}_Health_Report.pdf",
-                mime="application/pdf"
-            )
-
-            warnings = []
-            if glucose > 140:
-                warnings.append("⚠️ High glucose")
-            if glucose < 70:
-                warnings.append("⚠️ Low glucose – Your sugar level is too low.")
-            if bmi > 30:
-                warnings.append("⚠️ High BMI – Risk of obesity-related diabetes.")
-            if bmi < 18.5:
-                warnings.append("⚠️ Low BMI – Consider nutritional evaluation.")
-            if bp > 80:
-                warnings.append("⚠️ High Blood Pressure")
-            if bp < 60:
-                warnings.append("⚠️ Low Blood Pressure – May cause dizziness.")
-
-            if warnings:
-                warning_html = '<div style="background-color:#fbeaea;padding:10px;border-radius:8px;">' + \
-                               '<br>'.join(f'<span style="color:#d00000;">{w}</span>' for w in warnings) + \
-                               '</div>'
-                st.markdown(warning_html, unsafe_allow_html=True)
+            warnings = health_warnings("diabetes", {"glucose": glucose, "bmi": bmi, "age": age, "blood_pressure": bp})
+
+            show_report_download(name, "Diabetes", st.session_state.diabetes_diagnosis, warnings)
+
+            show_warnings(warnings)
 
         elif show_doctors:
-            st.subheader("Recommended Doctors for Diabetes")
-            try:
-                doctor_data = pd.read_csv("indian_doctors_dataset.csv")
-                diabetes_doctors = doctor_data[
-                    doctor_data['Specialist'].str.lower().str.contains("diabet", na=False)
-                ]
-                if not diabetes_doctors.empty:
-                    grouped = diabetes_doctors.groupby('Clinic Address')
-                    count = 0
-                    for name, group in grouped:
-                        st.markdown(f"##### 📍 Location: {name}")
-                        top5 = group.head(3)[['Doctor Name', 'Specialist', 'Phone Number', 'Email']]
-                        st.dataframe(top5, use_container_width=True)
-                        count += 1
-                        if count >= 3:
-                            break
-                else:
-                    st.info("No doctors found for Diabetes.")
-            except Exception as e:
-                st.error(f"Error loading doctors data: {e}")
+            show_recommended_doctors("diabetes", "Diabetes")
 # thyroid logic
     elif selected == "Thyroid":
-        df = load_dataset("thyroid")
-        if df is None:
+        stats, sim = load_model("thyroid")
+        if stats is None:
             return
 
-        sim = create_fuzzy_thyroid(df)
         st.subheader("Thyroid")
 
-        tsh = st.number_input("TSH (mIU/L)", float(df['TSH'].min()), float(df['TSH'].max()), float(df['TSH'].mean()))
-        t3 = st.number_input("T3 (ng/dL)", min_value=45.9, max_value=500.0, value=float(df['T3'].mean()))
-        t4 = st.number_input("T4 (µg/dL)", min_value=4.5, max_value=500.0, value=float(df['T4'].mean()))
+        tsh = st.number_input("TSH (mIU/L)", float(stats['TSH']['min']), float(stats['TSH']['max']), float(stats['TSH']['mean']))
+        t3 = st.number_input("T3 (ng/dL)", min_value=45.9, max_value=500.0, value=float(stats['T3']['mean']))
+        t4 = st.number_input("T4 (µg/dL)", min_value=4.5, max_value=500.0, value=float(stats['T4']['mean']))
 
-        st.markdown("### 📄 Upload Blood Test Report (CSV, PDF, or Excel)")
-        uploaded_file = st.file_uploader("Choose a file", type=["csv", "xlsx", "pdf"])
+        st.markdown("### 📄 Upload Blood Test Reports (CSV, PDF, or Excel)")
+        uploaded_files = st.file_uploader("Choose files (several files or table rows are scored together)",
+                                          type=["csv", "xlsx", "pdf"], accept_multiple_files=True)
 
-        if uploaded_file:
-            try:
-                if uploaded_file.name.endswith('.csv'):
-                    user_data = pd.read_csv(uploaded_file, encoding='latin1')
-                elif uploaded_file.name.endswith('.xlsx'):
-                    user_data = pd.read_excel(uploaded_file)
-                elif uploaded_file.name.endswith('.pdf'):
-                    with pdfplumber.open(uploaded_file) as pdf:
-                        text = ""
-                        for page in pdf.pages:
-                            page_text = page.extract_text()
-                            if page_text:
-                                text += page_text + "\n"
-                    patterns = {
-                        "TSH": r"TSH[:\s]+([\d.]+)",
-                        "T3": r"T3[:\s]+([\d.]+)",
-                        "T4": r"T4[:\s]+([\d.]+)"
-                    }
-                    data = {}
-                    for key, pattern in patterns.items():
-                        match = re.search(pattern, text, re.IGNORECASE)
-                        if match:
-                            data[key] = float(match.group(1))
-                        else:
-                            data[key] = None
-                    user_data = pd.DataFrame([data])
-                else:
-                    st.error("Unsupported file type.")
-                    st.stop()
+        try:
+            report = uploaded_report("thyroid", uploaded_files)
+        except Exception as e:
+            st.error(f"⚠️ Error reading file: {e}")
+            return
 
-                st.success("✅ Report uploaded successfully!")
-                st.dataframe(user_data)
+        if report is not None:
+            st.success("✅ Report uploaded successfully!")
+            st.dataframe(report.table)
+            # Fields the report doesn't contain keep the values entered above
+            if report.missing:
+                st.warning(f"⚠️ Not found in report, using the values entered above: {', '.join(report.missing)}")
 
-                tsh = user_data['TSH'][0]
-                t3 = user_data['T3'][0]
-                t4 = user_data['T4'][0]
+            tsh = report.value('TSH', tsh)
+            t3 = report.value('T3', t3)
+            t4 = report.value('T4', t4)
 
-            except Exception as e:
-                st.error(f"⚠️ Error reading file: {e}")
-                return
+        show_what_if("thyroid", {"tsh": tsh, "t3": t3, "t4": t4})
 
         col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
@@ -534,133 +525,64 @@ def main():
             sim.input['tsh'] = tsh
             sim.input['t3'] = t3
             sim.input['t4'] = t4
-            sim.compute()
+            with tracing.span("compute"):
+                sim.compute()
 
             risk = sim.output['thyroid_risk']
             st.session_state.thyroid_diagnosis = "Yes" if risk >= 50 else "No"
             st.success(f"Predicted Thyroid Status: {st.session_state.thyroid_diagnosis}")
+            show_population_percentile("thyroid", risk)
+            log_prediction("thyroid", sim.input)
 
         name = st.text_input("Enter your name", key="user_name_thyroid")
         st.write(f"🛠️ Debug: diagnosis = {st.session_state.get('thyroid_diagnosis')}, name = '{name}'")
 
         if st.session_state.get("thyroid_diagnosis") and name:
-            if "thyroid_pdf" not in st.session_state or st.session_state.get("pdf_name_thyroid") != name:
-                health_tips = [
-                    "Maintain a balanced diet",
-                    "Exercise regularly",
-                    "Avoid processed sugar",
-                    "Follow up with a physician"
-                ]
-                raw_diet = load_diet_plan("Thyroid", 3, "diet_plans.xlsx")
-                diet_text = BeautifulSoup(raw_diet, "html.parser").get_text()
-                pdf_file = generate_health_report_pdf(name)
-                st.session_state.thyroid_pdf = pdf_file
-                st.session_state.pdf_name_thyroid = name
-
-            st.download_button(
-                label="📄 Download PDF",
-                data=st.session_state.thyroid_pdf,
-                file_name=f"{name}_Health_Report.pdf",
-                mime="application/pdf"
-            )
-
-            warnings = []
-            if tsh > 4.0:
-                warnings.append("⚠️ High TSH – Could indicate hypothyroidism.")
-            if tsh < 0.4:
-                warnings.append("⚠️ Low TSH – Could be a sign of hyperthyroidism.")
-            if t3 < 70:
-                warnings.append("⚠️ Low T3 – Often seen in hypothyroidism.")
-            if t3 > 200:
-                warnings.append("⚠️ High T3 – Might indicate an overactive thyroid.")
-            if t4 < 5.0:
-                warnings.append("⚠️ Low T4 – May signal thyroid hormone deficiency.")
-            if t4 > 12:
-                warnings.append("⚠️ High T4 – Often seen in hyperthyroidism.")
-
-            if warnings:
-                warning_html = '<div style="background-color:#fbeaea;padding:10px;border-radius:8px;">' + \
-                               '<br>'.join(f'<span style="color:#d00000;">{w}</span>' for w in warnings) + \
-                               '</div>'
-                st.markdown(warning_html, unsafe_allow_html=True)
+            warnings = health_warnings("thyroid", {"tsh": tsh, "t3": t3, "t4": t4})
+
+            show_report_download(name, "Thyroid", st.session_state.thyroid_diagnosis, warnings)
+
+            show_warnings(warnings)
 
         elif show_doctors:
-            st.subheader("Recommended Doctors for Thyroid")
-            try:
-                doctor_data = pd.read_csv("indian_doctors_dataset.csv")
-                t_doctors = doctor_data[
-                    doctor_data['Specialist'].str.lower().str.contains("thyroid", na=False)
-                ]
-                if not t_doctors.empty:
-                    grouped = t_doctors.groupby('Clinic Address')
-                    count = 0
-                    for name, group in grouped:
-                        st.markdown(f"##### 📍 Location: {name}")
-                        top5 = group.head(3)[['Doctor Name', 'Specialist', 'Phone Number', 'Email']]
-                        st.dataframe(top5, use_container_width=True)
-                        count += 1
-                        if count >= 3:
-                            break
-                else:
-                    st.info("No doctors found for Thyroid.")
-            except Exception as e:
-                st.error(f"Error loading doctors data: {e}")
+            show_recommended_doctors("thyroid", "Thyroid")
 
 
 # PCOD Logic          
 
     elif selected == "PCOD":
-        df = load_dataset("pcod")
-        if df is None:
+        stats, sim = load_model("pcod")
+        if stats is None:
             return
 
-        sim = create_fuzzy_pcod(df)
         st.subheader("PCOD")
 
-        bmi = st.number_input("BMI", min_value=10.5, max_value=60.0, value=float(df['BMI'].mean()))
-        insulin = st.number_input("Insulin Level", float(df['Insulin_Level'].min()), max_value=400.0, value=float(df['Insulin_Level'].mean()))
-        lh = st.number_input("LH", float(df['LH'].min()), max_value=120.0, value=float(df['LH'].mean()))
+        bmi = st.number_input("BMI", min_value=10.5, max_value=60.0, value=float(stats['BMI']['mean']))
+        insulin = st.number_input("Insulin Level", float(stats['Insulin_Level']['min']), max_value=400.0, value=float(stats['Insulin_Level']['mean']))
+        lh = st.number_input("LH", float(stats['LH']['min']), max_value=120.0, value=float(stats['LH']['mean']))
 
-        st.markdown("### 📄 Upload Blood Test Report (CSV, PDF, or Excel)")
-        uploaded_file = st.file_uploader("Choose a file", type=["csv", "xlsx", "pdf"])
+        st.markdown("### 📄 Upload Blood Test Reports (CSV, PDF, or Excel)")
+        uploaded_files = st.file_uploader("Choose files (several files or table rows are scored together)",
+                                          type=["csv", "xlsx", "pdf"], accept_multiple_files=True)
 
-        if uploaded_file:
-            try:
-                if uploaded_file.name.endswith('.csv'):
-                    user_data = pd.read_csv(uploaded_file)
-                elif uploaded_file.name.endswith('.xlsx'):
-                    user_data = pd.read_excel(uploaded_file)
-                elif uploaded_file.name.endswith('.pdf'):
-                    with pdfplumber.open(uploaded_file) as pdf:
-                        text = ""
-                        for page in pdf.pages:
-                            page_text = page.extract_text()
-                            if page_text:
-                                text += page_text + "\n"
-                    patterns = {
-                        "BMI": r"BMI[:\s]+([\d.]+)",
-                        "Insulin_Level": r"Insulin[_\s]?Level[:\s]+([\d.]+)",
-                        "LH": r"LH[:\s]+([\d.]+)"
-                    }
-                    data = {}
-                    for key, pattern in patterns.items():
-                        match = re.search(pattern, text, re.IGNORECASE)
-                        data[key] = float(match.group(1)) if match else None
-                    user_data = pd.DataFrame([data])
-                else:
-                    st.error("Unsupported file type.")
-                    st.stop()
+        try:
+            report = uploaded_report("pcod", uploaded_files)
+        except Exception as e:
+            st.error(f"⚠️ Error reading file: {e}")
+            return
 
-                st.success("✅ Report uploaded successfully!")
-                st.dataframe(user_data)
+        if report is not None:
+            st.success("✅ Report uploaded successfully!")
+            st.dataframe(report.table)
+            # Fields the report doesn't contain keep the values entered above
+            if report.missing:
+                st.warning(f"⚠️ Not found in report, using the values entered above: {', '.join(report.missing)}")
 
-                bmi = user_data['BMI'][0]
-                insulin = user_data['Insulin_Level'][0]
-                lh = user_data['LH'][0]
+            bmi = report.value('BMI', bmi)
+            insulin = report.value('Insulin_Level', insulin)
+            lh = report.value('LH', lh)
 
-            except Exception as e:
-                st.error(f"⚠️ Error reading file: {e}")
-                return
+        show_what_if("pcod", {"bmi": bmi, "insulin": insulin, "lh": lh})
 
         col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
@@ -672,89 +594,40 @@ def main():
             sim.input['bmi'] = bmi
             sim.input['insulin'] = insulin
             sim.input['lh'] = lh
-            sim.compute()
+            with tracing.span("compute"):
+                sim.compute()
 
             risk = sim.output['pcod_risk']
             st.session_state.pcod_diagnosis = "Yes" if risk >= 50 else "No"
             st.success(f"Predicted PCOD Status: {st.session_state.pcod_diagnosis}")
+            show_population_percentile("pcod", risk)
+            log_prediction("pcod", sim.input)
 
         name = st.text_input("Enter your name", key="user_name_pcod")
         st.write(f"🛠️ Debug: diagnosis = {st.session_state.get('pcod_diagnosis')}, name = '{name}'")
 
         if st.session_state.get("pcod_diagnosis") and name:
-            if "pcod_pdf" not in st.session_state or st.session_state.get("pdf_name_pcod") != name:
-                health_tips = [
-                    "Maintain a balanced diet",
-                    "Exercise regularly",
-                    "Avoid processed sugar",
-                    "Follow up with a physician"
-                ]
-                raw_diet = load_diet_plan("PCOD", 3, "diet_plans.xlsx")
-                diet_text = BeautifulSoup(raw_diet, "html.parser").get_text()
-                pdf_file = generate_health_report_pdf(name)
-                st.session_state.pcod_pdf = pdf_file
-                st.session_state.pdf_name_pcod = name
-
-            st.download_button(
-                label="📄 Download PDF",
-                data=st.session_state.pcod_pdf,
-                file_name=f"{name}_Health_Report.pdf",
-                mime="application/pdf"
-            )
-
-            warnings = []
-            if bmi > 25:
-                warnings.append("⚠️ High BMI – Obesity is a major risk factor for PCOD.")
-            if bmi < 18.5:
-                warnings.append("⚠️ Low BMI – Consider monitoring nutritional health.")
-            if insulin > 15:
-                warnings.append("⚠️ Elevated Insulin – May indicate insulin resistance.")
-            if insulin < 10:
-                warnings.append("⚠️ Very Low Insulin – May need medical attention.")
-            if lh > 9:
-                warnings.append("⚠️ High LH – Can contribute to irregular ovulation.")
-
-            if warnings:
-                warning_html = '<div style="background-color:#fbeaea;padding:10px;border-radius:8px;">' + \
-                               '<br>'.join(f'<span style="color:#d00000;">{w}</span>' for w in warnings) + \
-                               '</div>'
-                st.markdown(warning_html, unsafe_allow_html=True)
+            warnings = health_warnings("pcod", {"bmi": bmi, "insulin": insulin, "lh": lh})
+
+            show_report_download(name, "PCOD", st.session_state.pcod_diagnosis, warnings)
+
+            show_warnings(warnings)
 
         elif show_doctors:
-            st.subheader("Recommended Doctors for PCOD")
-            try:
-                doctor_data = pd.read_csv("indian_doctors_dataset.csv")
-                p_doctors = doctor_data[
-                    doctor_data['Specialist'].str.lower().str.contains("pcod", na=False)
-                ]
-                if not p_doctors.empty:
-                    grouped = p_doctors.groupby('Clinic Address')
-                    count = 0
-                    for name, group in grouped:
-                        st.markdown(f"##### 📍 Location: {name}")
-                        top5 = group.head(3)[['Doctor Name', 'Specialist', 'Phone Number', 'Email']]
-                        st.dataframe(top5, use_container_width=True)
-                        count += 1
-                        if count >= 3:
-                            break
-                else:
-                    st.info("No doctors found for PCOD.")
-            except Exception as e:
-                st.error(f"Error loading doctors data: {e}")
+            show_recommended_doctors("pcod", "PCOD")
 
 
 # Anxiety logic
 
     elif selected == "Anxiety":
-        df = load_dataset("anxiety")
-        if df is None:
+        stats, sim = load_model("anxiety")
+        if stats is None:
             return
 
-        sim = create_fuzzy_anxiety(df)
         st.subheader("Anxiety")
 
-        sleep = st.number_input("Sleep Hours", min_value=0.0, max_value=12.0, value=float(df['SleepHours'].mean()))
-        heart_rate = st.number_input("Heart Rate", min_value=40, max_value=220, value=int(df['HeartRate'].mean()))
+        sleep = st.number_input("Sleep Hours", min_value=0.0, max_value=12.0, value=float(stats['SleepHours']['mean']))
+        heart_rate = st.number_input("Heart Rate", min_value=40, max_value=220, value=int(stats['HeartRate']['mean']))
 
         fatigue_str = st.selectbox("Fatigue", ["No", "Yes"])
         fatigue = 1 if fatigue_str == "Yes" else 0
@@ -765,7 +638,10 @@ def main():
         restlessness_str = st.selectbox("Restlessness", ["No", "Yes"])
         restlessness = 1 if restlessness_str == "Yes" else 0
 
-        score = st.slider("GAD-7 Score", int(df['ScoreGAD7'].min()), int(df['ScoreGAD7'].max()), int(df['ScoreGAD7'].mean()))
+        score = st.slider("GAD-7 Score", int(stats['ScoreGAD7']['min']), int(stats['ScoreGAD7']['max']), int(stats['ScoreGAD7']['mean']))
+
+        show_what_if("anxiety", {"sleep": sleep, "heart_rate": heart_rate, "fatigue": fatigue,
+                                 "irritability": irritability, "restlessness": restlessness, "score": score})
 
         col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
@@ -780,83 +656,29 @@ def main():
             sim.input['irritability'] = irritability
             sim.input['restlessness'] = restlessness
             sim.input['score'] = score
-            sim.compute()
+            with tracing.span("compute"):
+                sim.compute()
 
             risk = sim.output['anxiety_risk']
             st.session_state.anxiety_diagnosis = "Yes" if risk >= 50 else "No"
             st.success(f"Predicted Anxiety Status: {st.session_state.anxiety_diagnosis}")
+            show_population_percentile("anxiety", risk)
+            log_prediction("anxiety", sim.input)
 
         name = st.text_input("Enter your name", key="user_name_anxiety")
         st.write(f"🛠️ Debug: diagnosis = {st.session_state.get('anxiety_diagnosis')}, name = '{name}'")
 
         if st.session_state.get("anxiety_diagnosis") and name:
-            if "anxiety_pdf" not in st.session_state or st.session_state.get("pdf_name_anxiety") != name:
-                health_tips = [
-                    "Maintain a balanced diet",
-                    "Exercise regularly",
-                    "Avoid processed sugar",
-                    "Follow up with a physician"
-                ]
-                raw_diet = load_diet_plan("Anxiety", 3, "diet_plans.xlsx")
-                diet_text = BeautifulSoup(raw_diet, "html.parser").get_text()
-                pdf_file = generate_health_report_pdf(name)
-                st.session_state.anxiety_pdf = pdf_file
-                st.session_state.pdf_name_anxiety = name
-
-            st.download_button(
-                label="📄 Download PDF",
-                data=st.session_state.anxiety_pdf,
-                file_name=f"{name}_Health_Report.pdf",
-                mime="application/pdf"
-            )
-
-            warnings = []
-            if restlessness == 1:
-                warnings.append("⚠️ High Restlessness – Major contributor to anxiety.")
-            if sleep < 6:
-                warnings.append("⚠️ Poor Sleep – Can worsen anxiety.")
-            if fatigue == 1:
-                warnings.append("⚠️ Fatigue – Often linked with anxiety symptoms.")
-            if irritability == 1:
-                warnings.append("⚠️ Irritability – A strong emotional indicator.")
-            if sleep > 9:
-                warnings.append("⚠️ Oversleeping – May signal underlying issues.")
-            if heart_rate < 60:
-                warnings.append("⚠️ Low Heart Rate – May indicate bradycardia or exhaustion.")
-            if heart_rate > 100:
-                warnings.append("⚠️ Elevated Heart Rate – Could be a sign of anxiety or stress.")
-            if score < 5:
-                warnings.append("✅ Low GAD-7 Score – Minimal anxiety risk.")
-            elif score >= 15:
-                warnings.append("⚠️ Severe anxiety – Consider professional evaluation.")
-
-            if warnings:
-                warning_html = '<div style="background-color:#fbeaea;padding:10px;border-radius:8px;">' + \
-                               '<br>'.join(f'<span style="color:#d00000;">{w}</span>' for w in warnings) + \
-                               '</div>'
-                st.markdown(warning_html, unsafe_allow_html=True)
+            warnings = health_warnings("anxiety", {"sleep": sleep, "heart_rate": heart_rate, "fatigue": fatigue,
+                                                   "irritability": irritability, "restlessness": restlessness,
+                                                   "score": score})
+
+            show_report_download(name, "Anxiety", st.session_state.anxiety_diagnosis, warnings)
+
+            show_warnings(warnings)
 
         elif show_doctors:
-            st.subheader("Recommended Doctors for Anxiety")
-            try:
-                doctor_data = pd.read_csv("indian_doctors_dataset.csv")
-                a_doctors = doctor_data[
-                    doctor_data['Specialist'].str.lower().str.contains("anxiety", na=False)
-                ]
-                if not a_doctors.empty:
-                    grouped = a_doctors.groupby('Clinic Address')
-                    count = 0
-                    for name, group in grouped:
-                        st.markdown(f"##### 📍 Location: {name}")
-                        top5 = group.head(3)[['Doctor Name', 'Specialist', 'Phone Number', 'Email']]
-                        st.dataframe(top5, use_container_width=True)
-                        count += 1
-                        if count >= 3:
-                            break
-                else:
-                    st.info("No doctors found for Anxiety.")
-            except Exception as e:
-                st.error(f"Error loading doctors data: {e}")
+            show_recommended_doctors("anxiety", "Anxiety")
 
     elif selected == "Diet Recommendation":
         st.subheader("🍽️ Diet Recommendation")
@@ -866,7 +688,8 @@ def main():
 
         if st.button("Show Diet Plan", key="show_diet_plan"):
             try:
-                plan_text = load_diet_plan(condition, days, "diet_plans.xlsx")
+                with tracing.span("load_diet_plan"):
+                    plan_text = load_diet_plan(condition, days, "diet_plans.xlsx")
                 st.markdown(plan_text)
             except Exception as e:
                 st.error(f"Failed to load diet plan: {e}")
@@ -875,4 +698,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # Stage timings per rerun when MDS_TRACE=1 (see tracing.py)
+    ctx = get_script_run_ctx()
+    with tracing.rerun(ctx.session_id if ctx else ""):
+        main()
@@ -0,0 +1,69 @@
+import os
+import re
+from health_warnings import warning_lists, warning_matrix
+from lazy_imports import lazy_import
+from model_registry import REGISTRY
+from report_ingestion import REPORT_FIELDS
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+fuzzy_models = lazy_import("fuzzy_models")
+
+# Scoring of uploads with many patients (several files, or CSV/XLSX tables
+# with one patient per row) on the disease pages. Every patient of an
+# upload becomes one results row; rows with all model fields are scored in
+# one batched engine evaluation and the warning rules run once over the
+# whole cohort.
+
+RESULT_COLUMNS = ["file", "patient", "risk", "diagnosis", "warnings", "missing", "error"]
+
+
+def patient_name(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    stem = re.sub(r"(_thyroid)?_report$", "", stem, flags=re.IGNORECASE)
+    return stem.replace("_", " ").strip()
+
+
+def patient_names(path, count):
+    """Names of the count patients in a report file: the file's own, numbered if there are several."""
+    patient = patient_name(path)
+    return [patient] if count == 1 else [f"{patient} #{i + 1}" for i in range(count)]
+
+
+def _file_rows(name, outcome):
+    if isinstance(outcome, BaseException) or not outcome.patients:
+        error = f"{type(outcome).__name__}: {outcome}" if isinstance(outcome, BaseException) else "no patient rows"
+        return pd.DataFrame({"file": [name], "patient": [patient_name(name)], "error": [error]})
+    rows = outcome.rows.copy()
+    rows.insert(0, "file", name)
+    rows.insert(1, "patient", patient_names(name, len(rows)))
+    rows["error"] = ""
+    return rows
+
+
+def score_uploads(disease, uploads):
+    """Results table for uploads ([(file name, LabReport or the error reading it)]), one row per patient."""
+    fields = list(REPORT_FIELDS[disease])
+    model = fuzzy_models.MODELS[disease]
+    results = pd.concat([_file_rows(name, outcome) for name, outcome in uploads], ignore_index=True)
+    results = results.reindex(columns=RESULT_COLUMNS[:2] + fields + RESULT_COLUMNS[2:])
+    results["error"] = results["error"].fillna("")
+
+    missing = results[fields].isna()
+    results["missing"] = missing.dot(pd.Index(fields) + " ").str.strip().str.replace(" ", ", ")
+    results.loc[results["error"] != "", "missing"] = ""
+    inputs = {label: results[column].to_numpy(dtype=float) for label, column in model["inputs"].items()}
+    # NaN (missing) values never fire a warning
+    results["warnings"] = [" | ".join(messages)
+                           for messages in warning_lists(disease, warning_matrix(disease, inputs))]
+
+    complete = ~missing.any(axis=1).to_numpy()
+    results["risk"] = np.nan
+    results["diagnosis"] = ""
+    if complete.any():
+        risk = REGISTRY.engine(disease).evaluate({label: values[complete] for label, values in inputs.items()})
+        risk = risk[model["output"]]
+        results.loc[complete, "risk"] = risk
+        # No rule firing leaves the risk undefined and the diagnosis empty
+        results.loc[complete, "diagnosis"] = fuzzy_models.diagnosis_labels(risk)
+    return results
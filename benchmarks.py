@@ -0,0 +1,285 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import numpy as np
+import pdfplumber
+from datasets import DATASET_FILES, read_csv_dataset, read_dataset
+from diet_loader import DietPlanStore, load_diet_plan
+from fuzzy_models import MODELS, model_inputs
+from lazy_imports import import_report
+from report_ingestion import ingest_report
+from report_renderer import CONDITIONS, health_report, render_report_pdf
+from result_cache import CachedSimulation, ResultCache
+from utils import generate_health_report_pdf
+
+# Offline benchmark suite:
+#
+#   python benchmarks.py                       # run all, write benchmark_results.json
+#   python benchmarks.py -k compute            # only names containing "compute"
+#   python benchmarks.py --save-baseline       # store the run as the baseline
+#   python benchmarks.py --baseline benchmark_baseline.json --threshold 0.2
+#
+# Each benchmark is a setup function returning (callable, items per call).
+# The callable is run once to warm up and then --repeats times; results
+# keep min/median/mean seconds and items/s on the median. With a baseline,
+# any benchmark whose median is more than threshold slower is reported and
+# the exit status is 1.
+
+RESULTS_FILE = "benchmark_results.json"
+BASELINE_FILE = "benchmark_baseline.json"
+REPORT_FOLDERS = ("diabetes", "pcod", "thyroid")
+BATCH_ROWS = 10000
+SINGLE_CALLS = 50
+WHAT_IF_STEPS = 100
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _sample_files(extensions):
+    files = []
+    for folder in REPORT_FOLDERS:
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(extensions):
+                files.append((folder, os.path.join(folder, name)))
+    return files
+
+
+# --- Startup ---
+@benchmark("startup.import_app")
+def _import_app():
+    # Fresh interpreter each time, as a cold start
+    return import_report, 1
+
+
+# --- Models ---
+for _disease in MODELS:
+    @benchmark(f"model.build.{_disease}")
+    def _build(disease=_disease):
+        df = read_dataset(disease)
+        return (lambda: MODELS[disease]["builder"](df)), 1
+
+    @benchmark(f"model.compute_single.{_disease}")
+    def _single(disease=_disease):
+        df = read_dataset(disease)
+        sim = MODELS[disease]["builder"](df)
+        inputs = model_inputs(disease, df)
+        rows = [{label: float(values[i]) for label, values in inputs.items()} for i in range(SINGLE_CALLS)]
+
+        def run():
+            for row in rows:
+                for label, value in row.items():
+                    sim.input[label] = value
+                try:
+                    sim.compute()
+                except ValueError:  # no rule fired for this row
+                    pass
+        return run, SINGLE_CALLS
+
+    @benchmark(f"model.compute_cached.{_disease}")
+    def _cached(disease=_disease):
+        # Repeated Predict clicks: every call after the warm-up is a cache hit
+        df = read_dataset(disease)
+        sim = CachedSimulation(MODELS[disease]["builder"](df), ResultCache(), disease)
+        inputs = model_inputs(disease, df)
+        rows = [{label: float(values[i]) for label, values in inputs.items()} for i in range(SINGLE_CALLS)]
+
+        def run():
+            for row in rows:
+                for label, value in row.items():
+                    sim.input[label] = value
+                try:
+                    sim.compute()
+                except ValueError:
+                    pass
+        return run, SINGLE_CALLS
+
+    @benchmark(f"model.compute_batch.{_disease}")
+    def _batch(disease=_disease):
+        df = read_dataset(disease)
+        engine = MODELS[disease]["builder"](df).engine
+        inputs = model_inputs(disease, df)
+        reps = -(-BATCH_ROWS // len(df))
+        inputs = {label: np.tile(values, reps)[:BATCH_ROWS] for label, values in inputs.items()}
+        return (lambda: engine.evaluate(inputs)), BATCH_ROWS
+
+    @benchmark(f"model.compute_batch_analytic.{_disease}")
+    def _batch_analytic(disease=_disease):
+        df = read_dataset(disease)
+        engine = MODELS[disease]["builder"](df, analytic=True).engine
+        inputs = model_inputs(disease, df)
+        reps = -(-BATCH_ROWS // len(df))
+        inputs = {label: np.tile(values, reps)[:BATCH_ROWS] for label, values in inputs.items()}
+        return (lambda: engine.evaluate(inputs)), BATCH_ROWS
+
+    @benchmark(f"model.what_if_grid.{_disease}")
+    def _what_if(disease=_disease):
+        # 100 x 100 grid over the first two inputs, the rest at their means
+        df = read_dataset(disease)
+        engine = MODELS[disease]["builder"](df).engine
+        means = {label: float(np.mean(values)) for label, values in model_inputs(disease, df).items()}
+        x, y = engine.antecedents[:2]
+        inputs = {label: np.full(WHAT_IF_STEPS ** 2, value) for label, value in means.items()}
+        inputs[x.label] = np.tile(np.linspace(x.lo, x.hi, WHAT_IF_STEPS), WHAT_IF_STEPS)
+        inputs[y.label] = np.repeat(np.linspace(y.lo, y.hi, WHAT_IF_STEPS), WHAT_IF_STEPS)
+        return (lambda: engine.evaluate(inputs, unique_cuts=True)), WHAT_IF_STEPS ** 2
+
+
+# --- Data ---
+for _disease in DATASET_FILES:
+    @benchmark(f"dataset.load_cached.{_disease}")
+    def _load_cached(disease=_disease):
+        read_dataset(disease)  # make sure the columnar cache exists
+        return (lambda: read_dataset(disease)), 1
+
+    @benchmark(f"dataset.load_csv.{_disease}")
+    def _load_csv(disease=_disease):
+        return (lambda: read_csv_dataset(disease)), 1
+
+
+@benchmark("diet.parse_workbook")
+def _diet_parse():
+    return (lambda: DietPlanStore("diet_plans.xlsx")), 1
+
+
+@benchmark("diet.load_plan")
+def _diet_plan():
+    conditions = list(CONDITIONS.values())
+
+    def run():
+        for condition in conditions:
+            load_diet_plan(condition, 3, "diet_plans.xlsx")
+    return run, len(conditions)
+
+
+# --- Reports ---
+@benchmark("reports.pdf_extract_text")
+def _pdf_extract():
+    files = [path for _, path in _sample_files((".pdf",))]
+
+    def run():
+        for path in files:
+            with pdfplumber.open(path) as pdf:
+                for page in pdf.pages:
+                    page.extract_text()
+    return run, len(files)
+
+
+@benchmark("reports.ingest")
+def _ingest():
+    files = _sample_files((".pdf", ".csv", ".xlsx"))
+
+    def run():
+        for disease, path in files:
+            ingest_report(disease, path)
+    return run, len(files)
+
+
+@benchmark("reports.render_pdf")
+def _render():
+    report = health_report("Benchmark Patient", "Diabetes", "Yes", ["⚠️ High glucose", "⚠️ High BMI"])
+    return (lambda: [render_report_pdf(report) for _ in range(20)]), 20
+
+
+@benchmark("reports.generate_health_report_pdf")
+def _generate():
+    # As the pages call it, with a new patient name on every call so each
+    # one misses the shared report cache and renders
+    names = (f"Benchmark Patient {i}" for i in itertools.count())
+    return (lambda: [generate_health_report_pdf(next(names), "Diabetes", "Yes") for _ in range(20)]), 20
+
+
+@benchmark("reports.generate_health_report_pdf_cached")
+def _generate_cached():
+    # The same report again: every call after the warm-up is a cache hit
+    return (lambda: [generate_health_report_pdf("Benchmark Patient", "Diabetes", "Yes") for _ in range(20)]), 20
+
+
+def run_benchmark(name, repeats=5):
+    func, items = BENCHMARKS[name]()
+    func()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+    return {"median_s": median, "min_s": min(times), "mean_s": statistics.fmean(times),
+            "repeats": repeats, "items": items, "items_per_s": items / median if median else None}
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "machine": platform.machine(), "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def run_suite(names, repeats=5, log=sys.stdout):
+    results = {}
+    for name in names:
+        results[name] = run_benchmark(name, repeats)
+        r = results[name]
+        print(f"{name:<45} median {1000 * r['median_s']:>10.3f} ms   {r['items_per_s']:>12.1f} items/s", file=log)
+    return {"environment": environment(), "results": results}
+
+
+def compare(results, baseline, threshold):
+    """[(name, baseline median, current median, ratio)] for benchmarks slower than threshold allows."""
+    regressions = []
+    for name, current in results["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None or not previous["median_s"]:
+            continue
+        ratio = current["median_s"] / previous["median_s"]
+        if ratio > 1 + threshold:
+            regressions.append((name, previous["median_s"], current["median_s"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark model build/inference, data loading, report parsing and PDF rendering.")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("-r", "--repeats", type=int, default=5)
+    parser.add_argument("-o", "--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown vs baseline (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"also write the results to {BASELINE_FILE}")
+    parser.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    results = run_suite(names, args.repeats)
+    for path in [args.output] + ([BASELINE_FILE] if args.save_baseline else []):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+    print(f"{len(names)} benchmarks -> {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {1000 * before:.3f} ms -> {1000 * after:.3f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
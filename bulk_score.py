@@ -0,0 +1,217 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from batch_scoring import patient_name, patient_names
+from fuzzy_models import MODELS, diagnosis_labels
+from health_warnings import cohort_warnings, warning_lists
+from model_registry import REGISTRY
+from patient_log import patient_log
+from report_ingestion import PARSE_VERSION, REPORT_FIELDS, SUPPORTED_TYPES, ingest_report
+from report_renderer import CONDITIONS, RENDERER, health_report
+
+# Headless scoring of report folders such as diabetes/, pcod/ and thyroid/:
+#
+#   python bulk_score.py diabetes pcod thyroid -o bulk_results.csv
+#
+# Files are parsed across a process pool, then every disease is scored in
+# one batched model evaluation. CSV/XLSX tables give one result row per
+# patient row. Rows no rule fires for get no label and a "no rule fired"
+# error. The results CSV doubles as the state for the next run: the rows
+# of a file whose path, mtime and size are unchanged are carried over
+# without re-parsing, as long as the parser and the disease model are the
+# ones that produced them (version: PARSE_VERSION plus the engine signature,
+# which changes with the rules and the dataset-derived universes). With
+# --pdf-dir a health report PDF is rendered per scored patient through the
+# shared content-addressed report cache. With --log the values of scored
+# patients from new or changed files are appended to the per-disease
+# patient logs (patient_log.py).
+
+RESULT_COLUMNS = ["path", "row", "patient", "disease", "risk", "label", "parse_seconds", "missing", "error",
+                  "version", "mtime_ns", "size"]
+
+
+def find_reports(roots):
+    for root in roots:
+        if os.path.isfile(root):
+            yield root
+            continue
+        for folder, _, files in os.walk(root):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower().lstrip(".") in SUPPORTED_TYPES:
+                    yield os.path.join(folder, name)
+
+
+def infer_disease(path, default=None):
+    # Nearest enclosing folder named after a disease decides
+    for part in reversed(os.path.abspath(os.path.dirname(path)).split(os.sep)):
+        if part.lower() in REPORT_FIELDS:
+            return part.lower()
+    return default
+
+
+def _parse_file(task):
+    path, disease, mtime_ns, size = task
+    base = {"path": path, "row": 0, "patient": patient_name(path), "disease": disease,
+            "mtime_ns": mtime_ns, "size": size, "missing": "", "error": ""}
+    start = time.perf_counter()
+    try:
+        report = ingest_report(disease, path)
+    except Exception as e:
+        rows = [dict(base, error=f"{type(e).__name__}: {e}")]
+    else:
+        values = report.rows.to_dict("records")
+        rows = [dict(base, **fields, row=i, patient=patient,
+                     missing=";".join(field for field, value in fields.items() if pd.isna(value)))
+                for i, (fields, patient) in enumerate(zip(values, patient_names(path, len(values))))]
+        if not rows:
+            rows = [dict(base, error="no patient rows")]
+    seconds = time.perf_counter() - start
+    for row in rows:
+        row["parse_seconds"] = seconds
+    return rows
+
+
+def results_version(disease):
+    """Parser and model version the results of disease are computed with."""
+    return f"{PARSE_VERSION}-{REGISTRY.engine(disease).signature()}"
+
+
+def _previous_results(output):
+    # path -> that file's result rows
+    if not os.path.exists(output):
+        return {}
+    previous = pd.read_csv(output)
+    if "version" not in previous.columns:
+        return {}  # written before results were versioned: score everything again
+    previous[["label", "missing", "error", "version"]] = (
+        previous[["label", "missing", "error", "version"]].fillna("").astype(str))
+    files = {}
+    for row in previous.to_dict("records"):
+        files.setdefault(row["path"], []).append(row)
+    return files
+
+
+def score_rows(rows):
+    """Fill risk/label for parsed rows, one vectorized evaluation per disease."""
+    frame = pd.DataFrame(rows)
+    frame["risk"] = np.nan
+    frame["label"] = ""
+    frame["version"] = ""
+    for disease, group in frame.groupby("disease"):
+        frame.loc[group.index, "version"] = results_version(disease)
+        fields = list(REPORT_FIELDS[disease])
+        ok = group[(group["error"] == "") & group[fields].notna().all(axis=1)]
+        if ok.empty:
+            continue
+        engine = REGISTRY.engine(disease)
+        inputs = {label: ok[column].to_numpy(dtype=float) for label, column in MODELS[disease]["inputs"].items()}
+        risk = engine.evaluate(inputs)[MODELS[disease]["output"]]
+        frame.loc[ok.index, "risk"] = risk
+        frame.loc[ok.index, "label"] = diagnosis_labels(risk)
+        frame.loc[ok.index[np.isnan(risk)], "error"] = "no rule fired"
+    return frame
+
+
+def log_records(results):
+    """Append the model values of scored rows to the patient logs; returns records per disease."""
+    counts = {}
+    for disease, group in results[results["label"] != ""].groupby("disease"):
+        fields = list(REPORT_FIELDS[disease])
+        patient_log(disease).append_many(group[fields].to_dict("records"))
+        counts[disease] = len(group)
+    return counts
+
+
+def bulk_score(roots, output, workers=None, disease=None, chunksize=16, log=False):
+    previous = _previous_results(output)
+    versions = {}
+    reused, tasks, changed = [], [], set()
+    reused_files = 0
+    for path in find_reports(roots):
+        report_disease = infer_disease(path, disease)
+        if report_disease is None:
+            print(f"skipping {path}: cannot tell which disease it is for (use --disease)", file=sys.stderr)
+            continue
+        if report_disease not in versions:
+            versions[report_disease] = results_version(report_disease)
+        stat = os.stat(path)
+        old = previous.get(path)
+        unchanged = (old is not None and old[0]["mtime_ns"] == stat.st_mtime_ns and old[0]["size"] == stat.st_size
+                     and old[0]["disease"] == report_disease)
+        if unchanged and old[0]["version"] == versions[report_disease]:
+            reused.extend(old)
+            reused_files += 1
+        else:
+            tasks.append((path, report_disease, stat.st_mtime_ns, stat.st_size))
+            if not unchanged:
+                changed.add(path)
+
+    start = time.perf_counter()
+    parsed = []
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = [row for rows in pool.map(_parse_file, tasks, chunksize=chunksize) for row in rows]
+    results = score_rows(parsed) if parsed else pd.DataFrame(columns=RESULT_COLUMNS)
+    if log and parsed:
+        # Only new or changed files; files re-scored for a new model version
+        # were logged by an earlier run
+        log_records(results[results["path"].isin(changed)])
+    if reused:
+        results = pd.concat([pd.DataFrame(reused), results], ignore_index=True)
+
+    value_columns = sorted({c for fields in REPORT_FIELDS.values() for c in fields} & set(results.columns))
+    results = results[RESULT_COLUMNS[:4] + value_columns + RESULT_COLUMNS[4:]].sort_values(["path", "row"])
+    results.to_csv(output, index=False)
+    return results, len(tasks), reused_files, time.perf_counter() - start
+
+
+def render_reports(results, pdf_dir, workers=None):
+    names, reports = [], []
+    for disease, group in results[results["label"] != ""].groupby("disease"):
+        # Warnings for the whole group from one rule-matrix evaluation
+        warnings = warning_lists(disease, cohort_warnings(disease, group))
+        for patient, label, messages in zip(group["patient"], group["label"], warnings):
+            names.append(f"{patient}_{disease}_Health_Report.pdf")
+            reports.append(health_report(patient, CONDITIONS[disease], label, messages))
+    rendered = RENDERER.render_many(reports, workers)
+    os.makedirs(pdf_dir, exist_ok=True)
+    for name, (_, pdf, _, _) in zip(names, rendered):
+        with open(os.path.join(pdf_dir, name), "wb") as f:
+            f.write(pdf)
+    return rendered
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse and score every report under the given folders.")
+    parser.add_argument("roots", nargs="+", help="report folders or files")
+    parser.add_argument("-o", "--output", default="bulk_results.csv", help="consolidated results CSV (also the skip state)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--pdf-dir", help="also write a health report PDF per scored patient here")
+    parser.add_argument("--disease", choices=sorted(REPORT_FIELDS), help="disease for files outside a disease folder")
+    parser.add_argument("--log", action="store_true", help="append newly scored report values to the patient logs")
+    args = parser.parse_args(argv)
+
+    results, parsed, reused, elapsed = bulk_score(args.roots, args.output, args.workers, args.disease, log=args.log)
+    print(f"{parsed + reused} reports ({parsed} parsed, {reused} unchanged), {len(results)} patients "
+          f"in {elapsed:.2f}s -> {args.output}")
+    for disease, group in results.groupby("disease"):
+        print(f"  {disease:<9} {len(group):>6} patients, {(group['label'] == 'Yes').sum():>6} Yes, "
+              f"{(group['label'] == '').sum():>6} not scored")
+
+    if args.pdf_dir:
+        start = time.perf_counter()
+        rendered = render_reports(results, args.pdf_dir, args.workers)
+        times = np.array([seconds for _, _, seconds, cached in rendered if not cached])
+        hits = sum(cached for _, _, _, cached in rendered)
+        print(f"{len(rendered)} PDFs in {time.perf_counter() - start:.2f}s -> {args.pdf_dir} "
+              f"({len(times)} rendered, {hits} from cache, hit rate {hits / max(len(rendered), 1):.0%})")
+        if len(times):
+            print(f"  render ms: mean {1000 * times.mean():.1f}, p95 {1000 * np.percentile(times, 95):.1f}")
+
+
+if __name__ == "__main__":
+    main()
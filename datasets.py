@@ -0,0 +1,146 @@
+import json
+import os
+import shutil
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+DATASET_FILES = {
+    "diabetes": "diabetes.csv",
+    "heart": "heart.csv",
+    "thyroid": "thyroid_dataset_300_rows.csv",
+    "pcod": "pcod.csv",
+    "anxiety": "anxiety_dataset_300_modified.csv",
+}
+
+THYROID_COLUMNS = {
+    'TSH (mIU/L)': 'TSH',
+    'T3 (ng/dL)': 'T3',
+    'T4 (µg/dL)': 'T4'
+}
+
+# Columnar cache: each CSV is imported once into CACHE_DIR/<type>-<mtime>-<size>-v<N>/
+# as one .npy per column (already normalized) plus manifest.json with the
+# schema and per-column min/max/mean/count/var. Text columns are stored dictionary-
+# encoded and come back as pandas categoricals. Loads memory-map the .npy
+# files, and the directory name changes with the source file, so an edited
+# CSV is re-imported automatically.
+CACHE_DIR = ".dataset_cache"
+# Bump when the cache layout or manifest changes; old versions are re-imported
+CACHE_VERSION = 2
+_manifests = {}
+
+
+def normalize_columns(dataset_type, df):
+    df.columns = df.columns.str.strip()
+    if dataset_type == "thyroid":
+        df.rename(columns=THYROID_COLUMNS, inplace=True)
+    return df
+
+
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def read_csv_dataset(dataset_type):
+    if dataset_type not in DATASET_FILES:
+        raise ValueError(f"Unknown dataset '{dataset_type}'")
+    df = pd.read_csv(DATASET_FILES[dataset_type])
+    return normalize_columns(dataset_type, df)
+
+
+def dataset_cache_path(dataset_type):
+    _, mtime, size = file_fingerprint(DATASET_FILES[dataset_type])
+    return os.path.join(CACHE_DIR, f"{dataset_type}-{mtime}-{size}-v{CACHE_VERSION}")
+
+
+def _column_stats(values):
+    # var is the population variance (ddof=0) over non-missing values
+    if values.dtype.kind in "iub":
+        return {"min": int(values.min()), "max": int(values.max()), "mean": float(values.mean()),
+                "count": len(values), "var": float(values.var())}
+    return {"min": float(np.nanmin(values)), "max": float(np.nanmax(values)), "mean": float(np.nanmean(values)),
+            "count": int(np.count_nonzero(~np.isnan(values))), "var": float(np.nanvar(values))}
+
+
+def import_dataset(dataset_type, path=None):
+    """Convert the CSV into the columnar cache and return its manifest."""
+    path = path or dataset_cache_path(dataset_type)
+    df = read_csv_dataset(dataset_type)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+
+    columns, stats = [], {}
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        column = {"name": name, "file": f"col_{i}.npy"}
+        if pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy()
+            column["kind"] = "numeric"
+            # Mean computed by pandas so widget defaults match the old df[col].mean()
+            stats[name] = {**_column_stats(values), "mean": float(series.mean())}
+        else:
+            # Dictionary-encoded: int32 codes (-1 = missing) + the distinct values
+            codes, categories = pd.factorize(series)
+            values = codes.astype(np.int32)
+            column["kind"] = "string"
+            column["categories"] = f"col_{i}.categories.npy"
+            np.save(os.path.join(tmp, column["categories"]), np.asarray(categories, dtype=str))
+        column["dtype"] = values.dtype.str
+        np.save(os.path.join(tmp, column["file"]), values)
+        columns.append(column)
+
+    manifest = {"dataset": dataset_type, "source": DATASET_FILES[dataset_type],
+                "rows": len(df), "columns": columns, "stats": stats}
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+    # Publish atomically; if another process got there first keep its copy
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+    _remove_stale(dataset_type, keep=os.path.basename(path))
+    return manifest
+
+
+def _remove_stale(dataset_type, keep):
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith(f"{dataset_type}-") and name != keep and ".tmp-" not in name:
+            shutil.rmtree(os.path.join(CACHE_DIR, name), ignore_errors=True)
+
+
+def dataset_manifest(dataset_type, path=None):
+    if dataset_type not in DATASET_FILES:
+        raise ValueError(f"Unknown dataset '{dataset_type}'")
+    path = path or dataset_cache_path(dataset_type)
+    manifest = _manifests.get(path)
+    if manifest is None:
+        manifest_file = os.path.join(path, "manifest.json")
+        if os.path.exists(manifest_file):
+            with open(manifest_file, encoding="utf-8") as f:
+                manifest = json.load(f)
+        else:
+            manifest = import_dataset(dataset_type, path)
+        _manifests[path] = manifest
+    return manifest
+
+
+def dataset_stats(dataset_type):
+    """{column: {"min", "max", "mean"}} for numeric columns, without loading the data."""
+    return dataset_manifest(dataset_type)["stats"]
+
+
+def read_dataset(dataset_type):
+    path = dataset_cache_path(dataset_type)
+    manifest = dataset_manifest(dataset_type, path)
+    data = {}
+    for column in manifest["columns"]:
+        values = np.load(os.path.join(path, column["file"]), mmap_mode="r")
+        if column["kind"] == "string":
+            categories = np.load(os.path.join(path, column["categories"]))
+            values = pd.Categorical.from_codes(values, categories)
+        data[column["name"]] = values
+    return pd.DataFrame(data)
@@ -1,22 +1,65 @@
-import pandas as pd
+import os
+import threading
+from lazy_imports import lazy_import
 
-def load_diet_plan(disease: str, days: int = 3, file_path: str = "diet_plans.xlsx") -> str:
-    try:
+pd = lazy_import("pandas")
+
+# Workbooks are parsed once into an index of (lower-cased disease, day) ->
+# meal lines, and every rendered plan is kept per (disease, days). A store is
+# dropped and re-parsed when the workbook's mtime changes.
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class DietPlanStore:
+    def __init__(self, file_path):
+        self.mtime = os.stat(file_path).st_mtime_ns
         df = pd.read_excel(file_path)
-        df = df[df["Disease"].str.lower() == disease.lower()]
-        df = df[df["Day"] <= days]
+        self.meals = {}
+        self.days = {}
+        for disease, day, meal_type, description in zip(df["Disease"], df["Day"], df["Meal Type"], df["Meal Description"]):
+            if not isinstance(disease, str) or pd.isna(day):
+                continue
+            key = disease.lower()
+            self.meals.setdefault((key, day), []).append(f"- {meal_type}: {description}\n")
+            self.days.setdefault(key, set()).add(day)
+        self.days = {key: sorted(days) for key, days in self.days.items()}
+        self.rendered = {}
+
+    def render(self, disease, days):
+        text = self.rendered.get((disease, days))
+        if text is None:
+            text = self._render(disease, days)
+            self.rendered[(disease, days)] = text
+        return text
 
-        if df.empty:
+    def _render(self, disease, days):
+        key = disease.lower()
+        plan_days = [day for day in self.days.get(key, []) if day <= days]
+        if not plan_days:
             return f"No diet plan found for {disease.title()} for {days} days."
 
         output = f"### 🥗 Diet Plan for {disease.title()} – {days} Day(s)\n"
-        grouped = df.groupby("Day")
-
-        for day, meals in grouped:
+        for day in plan_days:
             output += f"\n**Day {day}**\n"
-            for _, row in meals.iterrows():
-                output += f"- {row['Meal Type']}: {row['Meal Description']}\n"
+            output += "".join(self.meals[(key, day)])
         return output
 
+
+def diet_plan_store(file_path="diet_plans.xlsx"):
+    path = os.path.abspath(file_path)
+    store = _stores.get(path)
+    if store is None or store.mtime != os.stat(file_path).st_mtime_ns:
+        with _stores_lock:
+            store = _stores.get(path)
+            if store is None or store.mtime != os.stat(file_path).st_mtime_ns:
+                store = DietPlanStore(file_path)
+                _stores[path] = store
+    return store
+
+
+def load_diet_plan(disease: str, days: int = 3, file_path: str = "diet_plans.xlsx") -> str:
+    try:
+        return diet_plan_store(file_path).render(disease, days)
     except Exception as e:
-        return f"⚠️ Error loading diet plan: {e}"
\ No newline at end of file
+        return f"⚠️ Error loading diet plan: {e}"
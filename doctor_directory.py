@@ -0,0 +1,113 @@
+import threading
+from datasets import file_fingerprint
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+DOCTOR_FILE = "indian_doctors_dataset.csv"
+DOCTOR_COLUMNS = ['Doctor Name', 'Specialist', 'Phone Number', 'Email']
+
+# Keyword matched (case-insensitively, as a substring) against Specialist
+DISEASE_KEYWORDS = {
+    "heart": "heart",
+    "diabetes": "diabet",
+    "thyroid": "thyroid",
+    "pcod": "pcod",
+    "anxiety": "anxiety",
+}
+
+_directories = {}
+_directories_lock = threading.Lock()
+
+
+class DoctorDirectory:
+    """Doctor rows loaded once, with specialty and location indexes built up front."""
+
+    def __init__(self, path):
+        self.fingerprint = file_fingerprint(path)
+        self.doctors = pd.read_csv(path)
+
+        # Distinct specialties -> row ids; keyword lookups scan the (small)
+        # set of distinct specialties once and are memoized afterwards.
+        specialist = self.doctors['Specialist'].str.lower()
+        codes, names = pd.factorize(specialist)
+        self._specialty_rows = _group_rows(codes, len(names))
+        self._specialty_names = list(names)
+
+        # Clinic codes follow sorted address order, like groupby('Clinic Address')
+        clinic = self.doctors['Clinic Address']
+        self._clinic_codes, self._clinic_names = pd.factorize(clinic, sort=True)
+        self._clinic_rows = dict(zip(self._clinic_names, _group_rows(self._clinic_codes, len(self._clinic_names))))
+
+        city = clinic.str.rsplit(',', n=1).str[-1].str.strip().str.lower()
+        city_codes, city_names = pd.factorize(city)
+        self._city_rows = dict(zip(city_names, _group_rows(city_codes, len(city_names))))
+
+        self._keyword_rows = {}
+        self._answers = {}
+
+    def rows_for_keyword(self, keyword):
+        keyword = keyword.lower()
+        rows = self._keyword_rows.get(keyword)
+        if rows is None:
+            matches = [r for name, r in zip(self._specialty_names, self._specialty_rows) if keyword in name]
+            rows = np.sort(np.concatenate(matches)) if matches else np.empty(0, dtype=np.intp)
+            self._keyword_rows[keyword] = rows
+        return rows
+
+    def clinic(self, address):
+        return self.doctors.iloc[self._clinic_rows.get(address, [])]
+
+    def city(self, city):
+        return self.doctors.iloc[self._city_rows.get(city.strip().lower(), [])]
+
+    def top_doctors(self, disease, per_location=3, locations=3, city=None):
+        """[(clinic address, DataFrame of up to per_location doctors)] for the first locations clinics."""
+        key = (disease, per_location, locations, city and city.strip().lower())
+        answer = self._answers.get(key)
+        if answer is None:
+            answer = self._top_doctors(DISEASE_KEYWORDS.get(disease, disease), per_location, locations, key[3])
+            self._answers[key] = answer
+        return answer
+
+    def _top_doctors(self, keyword, per_location, locations, city):
+        rows = self.rows_for_keyword(keyword)
+        if city is not None:
+            rows = np.intersect1d(rows, self._city_rows.get(city, []))
+        codes = self._clinic_codes[rows]
+        rows, codes = rows[codes >= 0], codes[codes >= 0]
+        order = np.lexsort((rows, codes))
+        rows, codes = rows[order], codes[order]
+
+        answer = []
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else []
+        for start in starts[:locations]:
+            group = rows[start:start + per_location]
+            group = group[codes[start:start + per_location] == codes[start]]
+            answer.append((self._clinic_names[codes[start]], self.doctors.iloc[group][DOCTOR_COLUMNS]))
+        return answer
+
+
+def _group_rows(codes, groups):
+    # Row ids per code, in file order (stable sort keeps the original order)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(groups + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(groups)]
+
+
+def doctor_directory(path=DOCTOR_FILE):
+    """Shared directory for path, reloaded when the file changes."""
+    fingerprint = file_fingerprint(path)
+    directory = _directories.get(fingerprint[0])
+    if directory is None or directory.fingerprint != fingerprint:
+        with _directories_lock:
+            directory = _directories.get(fingerprint[0])
+            if directory is None or directory.fingerprint != fingerprint:
+                directory = DoctorDirectory(path)
+                _directories[fingerprint[0]] = directory
+    return directory
+
+
+def recommended_doctors(disease, per_location=3, locations=3, city=None, path=DOCTOR_FILE):
+    return doctor_directory(path).top_doctors(disease, per_location, locations, city)
@@ -0,0 +1,251 @@
+import argparse
+import json
+import sys
+import time
+import numpy as np
+import pandas as pd
+from datasets import DATASET_FILES, normalize_columns, read_dataset
+from fuzzy_models import MODELS, RISK_THRESHOLD, model_inputs
+from model_registry import REGISTRY
+
+# Evaluation of the fuzzy models against labeled reference data:
+#
+#   python evaluate_models.py                       # every dataset that carries labels
+#   python evaluate_models.py thyroid --curves thyroid_curves.csv --json thyroid_eval.json
+#   python evaluate_models.py diabetes --data labeled.csv --label-column Outcome --positive 1
+#   python evaluate_models.py --min-auc 0.7         # exit status 1 if a model scores lower
+#
+# Every labeled row is scored in one batched engine evaluation (unique_cuts:
+# rows with the same rule strengths are defuzzified once). All decision
+# thresholds then come from a single sort of the risks: cumulative sums of
+# the sorted labels give the confusion counts at every distinct risk, from
+# which the ROC and precision-recall curves, their areas, the matrix at the
+# pages' fixed cut-off and the best thresholds are read off. Rows the rules
+# leave without a risk are counted and left out.
+
+# Labels the datasets carry: disease -> (column, values counted negative, values left out)
+DATASET_LABELS = {
+    "thyroid": ("Diagnosis", ("Normal",), ("Unclear",)),
+}
+_TRUE = {"1", "1.0", "yes", "y", "true", "positive"}
+_FALSE = {"0", "0.0", "no", "n", "false", "negative"}
+DEFAULT_CURVE_POINTS = 1000
+
+
+class ThresholdSweep:
+    """Confusion counts at every distinct score, predicting positive for score >= threshold.
+
+    thresholds are the distinct scores in descending order; tp[i] and fp[i]
+    count the rows scoring at least thresholds[i].
+    """
+
+    def __init__(self, scores, labels):
+        scores = np.asarray(scores, dtype=float)
+        labels = np.asarray(labels, dtype=bool)
+        if not len(scores):
+            raise ValueError("No scored rows to evaluate")
+        order = np.argsort(-scores, kind="stable")
+        scores, labels = scores[order], labels[order]
+        tp = np.cumsum(labels)
+        fp = np.arange(1, len(labels) + 1) - tp
+        last = np.append(np.flatnonzero(scores[1:] != scores[:-1]), len(scores) - 1)  # end of each tie run
+        self.thresholds = scores[last]
+        self.tp = tp[last]
+        self.fp = fp[last]
+        self.positives = int(tp[-1])
+        self.negatives = len(labels) - self.positives
+
+    @property
+    def fn(self):
+        return self.positives - self.tp
+
+    @property
+    def tn(self):
+        return self.negatives - self.fp
+
+    def _rate(self, count, total):
+        return count / total if total else np.full(len(count), np.nan)
+
+    def roc(self):
+        """(false positive rate, true positive rate), starting at (0, 0)."""
+        return (np.append(0.0, self._rate(self.fp, self.negatives)),
+                np.append(0.0, self._rate(self.tp, self.positives)))
+
+    def pr(self):
+        """(recall, precision) at each threshold."""
+        return self._rate(self.tp, self.positives), self.tp / (self.tp + self.fp)
+
+    def roc_auc(self):
+        fpr, tpr = self.roc()
+        return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+    def average_precision(self):
+        recall, precision = self.pr()
+        return float(np.sum(np.diff(np.append(0.0, recall)) * precision))
+
+    def confusion(self, cutoff):
+        """{"tp", "fp", "fn", "tn"} predicting positive for score >= cutoff."""
+        k = np.searchsorted(-self.thresholds, -cutoff, side="right")
+        tp = int(self.tp[k - 1]) if k else 0
+        fp = int(self.fp[k - 1]) if k else 0
+        return {"tp": tp, "fp": fp, "fn": self.positives - tp, "tn": self.negatives - fp}
+
+    def best(self, metric):
+        """Threshold maximizing "youden" (TPR - FPR) or "f1"."""
+        if metric == "youden":
+            value = self._rate(self.tp, self.positives) - self._rate(self.fp, self.negatives)
+        elif metric == "f1":
+            value = 2 * self.tp / (2 * self.tp + self.fp + self.fn)
+        else:
+            raise ValueError(f"Unknown metric '{metric}'")
+        i = int(np.nanargmax(value))
+        return float(self.thresholds[i]), float(value[i])
+
+    def curves(self, points=None):
+        """One row per threshold (evenly thinned to about points rows) with counts and rates."""
+        idx = np.arange(len(self.thresholds))
+        if points and len(idx) > points:
+            idx = np.unique(np.linspace(0, len(idx) - 1, points).round().astype(int))
+        tp, fp = self.tp[idx], self.fp[idx]
+        return pd.DataFrame({
+            "threshold": self.thresholds[idx], "tp": tp, "fp": fp,
+            "fn": self.positives - tp, "tn": self.negatives - fp,
+            "tpr": self._rate(tp, self.positives), "fpr": self._rate(fp, self.negatives),
+            "precision": tp / (tp + fp),
+        })
+
+
+def matrix_metrics(matrix):
+    tp, fp, fn, tn = matrix["tp"], matrix["fp"], matrix["fn"], matrix["tn"]
+
+    def ratio(a, b):
+        return a / b if b else float("nan")
+    return dict(matrix, accuracy=ratio(tp + tn, tp + fp + fn + tn), sensitivity=ratio(tp, tp + fn),
+                specificity=ratio(tn, tn + fp), precision=ratio(tp, tp + fp), f1=ratio(2 * tp, 2 * tp + fp + fn))
+
+
+def binary_labels(values, positive=None, negative=None, exclude=()):
+    """(labels, keep): positive-class flags for values and which rows take part.
+
+    Without positive/negative values the column must hold 1/0, Yes/No or
+    True/False.
+    """
+    text = pd.Series(values).astype(str).str.strip()
+    keep = ~text.isin([str(v) for v in exclude]).to_numpy() & pd.notna(values)
+    if positive:
+        return text.isin([str(v) for v in positive]).to_numpy(), keep
+    if negative:
+        return ~text.isin([str(v) for v in negative]).to_numpy(), keep
+    lower = text.str.lower()
+    unknown = sorted(set(lower[keep & ~lower.isin(_TRUE | _FALSE).to_numpy()]))
+    if unknown:
+        raise ValueError(f"Cannot read {unknown[:5]} as labels; give --positive or --negative values")
+    return lower.isin(_TRUE).to_numpy(), keep
+
+
+def evaluate(disease, frame, labels, keep=None):
+    """Score frame's rows and sweep every threshold; returns (summary dict, ThresholdSweep)."""
+    start = time.perf_counter()
+    inputs = model_inputs(disease, frame)
+    if keep is not None:
+        inputs = {label: values[keep] for label, values in inputs.items()}
+        labels = labels[keep]
+    risk = REGISTRY.engine(disease).evaluate(inputs, unique_cuts=True)[MODELS[disease]["output"]]
+    scored = ~np.isnan(risk)
+    score_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sweep = ThresholdSweep(risk[scored], labels[scored])
+    summary = {
+        "disease": disease, "rows": len(risk), "unscored": int((~scored).sum()),
+        "positives": sweep.positives, "negatives": sweep.negatives,
+        "roc_auc": sweep.roc_auc(), "average_precision": sweep.average_precision(),
+        "cutoff": dict(matrix_metrics(sweep.confusion(RISK_THRESHOLD)), threshold=RISK_THRESHOLD),
+    }
+    for metric in ("youden", "f1"):
+        threshold, value = sweep.best(metric)
+        summary[f"best_{metric}"] = dict(matrix_metrics(sweep.confusion(threshold)), threshold=threshold,
+                                         value=value)
+    summary["score_seconds"] = score_seconds
+    summary["sweep_seconds"] = time.perf_counter() - start
+    return summary, sweep
+
+
+def labeled_data(disease, data=None, label_column=None, positive=None, negative=None, exclude=None):
+    """(frame, labels, keep) from the reference dataset or a CSV with the model's input columns."""
+    column, default_negative, default_exclude = DATASET_LABELS.get(disease, (None, (), ()))
+    label_column = label_column or column
+    if label_column is None:
+        raise ValueError(f"The {disease} dataset has no labels; give --data and --label-column")
+    frame = read_dataset(disease) if data is None else normalize_columns(disease, pd.read_csv(data))
+    if label_column not in frame.columns:
+        raise ValueError(f"No '{label_column}' column in {data or DATASET_FILES[disease]}")
+    if not positive and not negative and label_column == column:
+        negative = default_negative
+        exclude = default_exclude if exclude is None else exclude
+    labels, keep = binary_labels(frame[label_column], positive, negative, exclude or ())
+    return frame, labels, keep
+
+
+def _print_matrix(title, matrix):
+    print(f"  {title:<22} threshold {matrix['threshold']:7.3f}   TP {matrix['tp']:>8} FP {matrix['fp']:>8} "
+          f"FN {matrix['fn']:>8} TN {matrix['tn']:>8}   acc {matrix['accuracy']:.3f} sens {matrix['sensitivity']:.3f} "
+          f"spec {matrix['specificity']:.3f} prec {matrix['precision']:.3f} F1 {matrix['f1']:.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the fuzzy models against labeled data.")
+    parser.add_argument("diseases", nargs="*", metavar="disease",
+                        help=f"models to evaluate: {', '.join(sorted(MODELS))} (default: {', '.join(DATASET_LABELS)})")
+    parser.add_argument("--data", help="labeled CSV with the model's input columns (one disease only)")
+    parser.add_argument("--label-column", help="column holding the labels")
+    parser.add_argument("--positive", nargs="+", help="label values of the positive class")
+    parser.add_argument("--negative", nargs="+", help="label values of the negative class (all others positive)")
+    parser.add_argument("--exclude", nargs="+", help="label values to leave out")
+    parser.add_argument("--curves", help="write ROC/PR points per threshold to this CSV")
+    parser.add_argument("--curve-points", type=int, default=DEFAULT_CURVE_POINTS,
+                        help="thin the curves to about this many thresholds per model (0: all)")
+    parser.add_argument("--json", help="write the summaries to this JSON file")
+    parser.add_argument("--min-auc", type=float, help="exit status 1 if a model's ROC AUC is lower")
+    args = parser.parse_args(argv)
+
+    diseases = args.diseases or list(DATASET_LABELS)
+    unknown = [disease for disease in diseases if disease not in MODELS]
+    if unknown:
+        parser.error(f"unknown disease: {', '.join(unknown)}")
+    if args.data and len(diseases) != 1:
+        parser.error("--data needs exactly one disease")
+
+    summaries, curves, failed = [], [], []
+    for disease in diseases:
+        frame, labels, keep = labeled_data(disease, args.data, args.label_column, args.positive,
+                                           args.negative, args.exclude)
+        summary, sweep = evaluate(disease, frame, labels, keep)
+        summaries.append(summary)
+        print(f"{disease}: {summary['rows']} rows ({summary['positives']} positive, {summary['negatives']} negative, "
+              f"{summary['unscored']} unscored), scored in {summary['score_seconds']:.2f}s, "
+              f"{len(sweep.thresholds)} thresholds swept in {1000 * summary['sweep_seconds']:.1f} ms")
+        print(f"  ROC AUC {summary['roc_auc']:.4f}   average precision {summary['average_precision']:.4f}")
+        _print_matrix("fixed cut-off", summary["cutoff"])
+        _print_matrix("best Youden's J", summary["best_youden"])
+        _print_matrix("best F1", summary["best_f1"])
+        if args.curves:
+            curve = sweep.curves(args.curve_points)
+            curve.insert(0, "disease", disease)
+            curves.append(curve)
+        if args.min_auc is not None and not summary["roc_auc"] >= args.min_auc:
+            failed.append(disease)
+
+    if args.curves:
+        pd.concat(curves, ignore_index=True).to_csv(args.curves, index=False)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=2)
+    if failed:
+        print(f"FAIL: ROC AUC below {args.min_auc} for {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from report_ingestion import ingest_report
+
+# Background extraction of uploaded reports. A page submits the bytes of
+# one or more files and gets an ExtractionJob back right away; it keeps the
+# job in its session state, shows its progress on later reruns and reads the
+# LabReports once the job is done. Parsing runs in a process pool shared by
+# every session of the server process, one task per file, so the files of
+# a job are read concurrently:
+#
+#   MDS_EXTRACT_WORKERS   files read at once (default 2)
+#   MDS_EXTRACT_QUEUE     jobs running or waiting; submit() raises
+#                         ExtractionBusy beyond this (default 8)
+#
+# Workers are spawned rather than forked, since the server process is
+# multi-threaded; a spawned worker imports the page script, whose main()
+# stays behind its __main__ guard. Workers report each PDF page read
+# through a queue that a thread in the server drains into the job handles.
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 8
+
+_progress = None  # set in each worker by _init_worker
+
+
+class ExtractionBusy(RuntimeError):
+    pass
+
+
+def _init_worker(progress):
+    global _progress
+    _progress = progress
+
+
+def _extract(job_id, index, disease, name, data):
+    _progress.put((job_id, index, 0, 0))
+    return ingest_report(disease, BytesIO(data), name=name,
+                         progress=lambda done, total: _progress.put((job_id, index, done, total)))
+
+
+class ExtractionJob:
+    """Handle of one submitted upload of files; keys identify the files."""
+
+    def __init__(self, job_id, disease, names, keys):
+        self.id = job_id
+        self.disease = disease
+        self.names = names
+        self.keys = keys
+        self.futures = []
+        self.submitted = time.monotonic()
+        self.started = False
+        self.pages = [(0, 0)] * len(names)  # (done, total) per file
+
+    @property
+    def name(self):
+        return self.names[0] if len(self.names) == 1 else f"{len(self.names)} files"
+
+    @property
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+    @property
+    def files_done(self):
+        return sum(future.done() for future in self.futures)
+
+    @property
+    def status(self):
+        if any(future.cancelled() for future in self.futures):
+            return "cancelled"
+        if self.done:
+            return "failed" if any(future.exception() is not None for future in self.futures) else "done"
+        return "running" if self.started else "queued"
+
+    @property
+    def fraction(self):
+        parts = [1.0 if future.done() else done / total if total else 0.0
+                 for future, (done, total) in zip(self.futures, self.pages)]
+        return sum(parts) / len(parts)
+
+    def result(self):
+        """The LabReport of the first file; raises its extraction error if it failed."""
+        return self.futures[0].result()
+
+    def outcomes(self):
+        """Per file, in order: its LabReport, or the exception that stopped it."""
+        return [future.exception() or future.result() for future in self.futures]
+
+    def cancel(self):
+        # Only files still waiting for a worker can be cancelled
+        return all([future.cancel() for future in self.futures])
+
+
+class ExtractionPool:
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or int(os.environ.get("MDS_EXTRACT_WORKERS", DEFAULT_WORKERS))
+        self.max_pending = max_pending or int(os.environ.get("MDS_EXTRACT_QUEUE", DEFAULT_MAX_PENDING))
+        self._context = multiprocessing.get_context("spawn")
+        self._pool = None
+        self._progress = None
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0}
+
+    def _start(self):
+        # Created on first use, and again if a worker died
+        if self._progress is None:
+            self._progress = self._context.Queue()
+            threading.Thread(target=self._drain, name="extraction-progress", daemon=True).start()
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=self._context,
+                                         initializer=_init_worker, initargs=(self._progress,))
+
+    def _drain(self):
+        while True:
+            job_id, index, done, total = self._progress.get()
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.started = True
+                job.pages[index] = (done, total)
+
+    def _finished(self, future):
+        with self._lock:
+            job = self._jobs.get(future.job_id)
+            if not future.cancelled():
+                self._stats["failed" if future.exception() is not None else "completed"] += 1
+            if job is not None and job.done:
+                del self._jobs[future.job_id]
+
+    def submit(self, disease, files):
+        """Queue extraction of reports ([(file name, bytes, key)]); returns their ExtractionJob."""
+        with self._lock:
+            if len(self._jobs) >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise ExtractionBusy(f"{len(self._jobs)} uploads are already being read, try again shortly.")
+            if self._pool is None:
+                self._start()
+            job_id = next(self._ids)
+            job = self._jobs[job_id] = ExtractionJob(job_id, disease, [name for name, _, _ in files],
+                                                     [key for _, _, key in files])
+            for index, (name, data, _) in enumerate(files):
+                try:
+                    future = self._pool.submit(_extract, job_id, index, disease, name, data)
+                except BrokenProcessPool:
+                    self._start()
+                    future = self._pool.submit(_extract, job_id, index, disease, name, data)
+                future.job_id = job_id
+                job.futures.append(future)
+            self._stats["submitted"] += len(files)
+        for future in job.futures:
+            future.add_done_callback(self._finished)
+        return job
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=len(self._jobs), workers=self.workers, max_pending=self.max_pending)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+# Shared by every session of this process
+EXTRACTIONS = ExtractionPool()
@@ -0,0 +1,304 @@
+import hashlib
+import numpy as np
+from skfuzzy.control.term import Term, TermAggregate
+
+# Vectorized replacement for skfuzzy's ControlSystemSimulation.
+#
+# A ControlSystem is compiled once into plain arrays (sampled membership
+# functions per term, rule trees over term indices) and then evaluated with
+# NumPy for any number of input rows at the same time. The maths follows
+# skfuzzy step by step -- clip to universe, np.interp fuzzification, rule
+# and/or (fmin/fmax), fmax accumulation, the same upsampled universe and
+# the same piecewise-linear centroid -- so results agree with
+# ControlSystemSimulation.compute() to within TOLERANCE (on the five disease
+# models the observed difference is 0.0). Inputs whose rules leave the output
+# empty come back as NaN, where skfuzzy would drop the output.
+#
+# Analytic mode (compile_system(system, analytic=True)) drops the sampled
+# grids. Every membership function is reduced to the points where its slope
+# changes (min, middle and max for automf(3) triangles), which np.interp
+# treats exactly like the full grid, so the cost no longer grows with the
+# universe's range or step. The output is the max of clipped triangles: it is
+# linear between the term breakpoints, the points where one term's edge
+# meets another's cut and the points where two edges cross. Integrating it
+# segment by segment gives the exact centroid. skfuzzy's sampled centroid
+# misses the edge/cut crossings between grid points, so the two differ by
+# up to ANALYTIC_TOLERANCE risk points (observed: <= 0.06 on random inputs,
+# <= 0.03 on the dataset rows). Many risks sit exactly on the 50 cut-off
+# (most diabetes rows), where the sampled result is e.g. 49.99999999999999
+# and the analytic one 50.0. Diagnoses keep the exact risk >= 50 of the
+# sampled engine; `python fuzzy_models.py` reports such ties (both risks
+# within TOLERANCE of the cut-off) separately and fails on any other
+# differing diagnosis.
+
+TOLERANCE = 1e-9
+ANALYTIC_TOLERANCE = 0.1
+
+# Rows evaluated per defuzzification chunk, keeps memory bounded for cohorts
+_CHUNK = 4096
+
+
+class FuzzyVariableArrays:
+    def __init__(self, variable, compact=False):
+        self.label = variable.label
+        self.universe = np.asarray(variable.universe, dtype=float)
+        self.term_names = list(variable.terms)
+        self.mfs = np.array([variable.terms[t].mf for t in self.term_names], dtype=float)
+        if compact:
+            self.universe, self.mfs = _breakpoints(self.universe, self.mfs)
+        self.lo = self.universe.min()
+        self.hi = self.universe.max()
+
+    def term_index(self, name):
+        return self.term_names.index(name)
+
+    def fuzzify(self, values):
+        values = np.clip(values, self.lo, self.hi)
+        return np.array([np.interp(values, self.universe, mf) for mf in self.mfs])
+
+
+class CompiledFuzzySystem:
+    def __init__(self, system, analytic=False):
+        self.ctrl = system
+        self.analytic = analytic
+        self.antecedents = [FuzzyVariableArrays(a, analytic) for a in system.antecedents]
+        self.consequents = [FuzzyVariableArrays(c, analytic) for c in system.consequents]
+        self.input_labels = [a.label for a in self.antecedents]
+        self.output_labels = [c.label for c in self.consequents]
+
+        for c in system.consequents:
+            if c.defuzzify_method != 'centroid':
+                raise ValueError(f"Unsupported defuzzify method '{c.defuzzify_method}' for '{c.label}'")
+        self._accumulate = {c.label: c.accumulation_method for c in system.consequents}
+
+        # Each rule becomes (expression tree, and_func, or_func, [(consequent, term, weight)])
+        self.rules = []
+        for rule in system.rules:
+            targets = []
+            for weighted in rule.consequent:
+                var = self._variable(self.consequents, weighted.term.parent.label)
+                targets.append((var, var.term_index(weighted.term.label), weighted.weight))
+            self.rules.append((self._compile_term(rule.antecedent), rule.and_func, rule.or_func, targets))
+
+    def _variable(self, variables, label):
+        for var in variables:
+            if var.label == label:
+                return var
+        raise ValueError(f"Unknown fuzzy variable '{label}'")
+
+    def _compile_term(self, term):
+        if isinstance(term, Term):
+            var = self._variable(self.antecedents, term.parent.label)
+            return ('term', var.label, var.term_index(term.label))
+        if isinstance(term, TermAggregate):
+            if term.kind == 'not':
+                return ('not', self._compile_term(term.term1))
+            return (term.kind, self._compile_term(term.term1), self._compile_term(term.term2))
+        raise ValueError(f"Unexpected rule antecedent: {term!r}")
+
+    def _fire(self, node, memberships, and_func, or_func):
+        kind = node[0]
+        if kind == 'term':
+            return memberships[node[1]][node[2]]
+        if kind == 'not':
+            return 1.0 - self._fire(node[1], memberships, and_func, or_func)
+        left = self._fire(node[1], memberships, and_func, or_func)
+        right = self._fire(node[2], memberships, and_func, or_func)
+        return and_func(left, right) if kind == 'and' else or_func(left, right)
+
+    def evaluate(self, inputs, unique_cuts=False):
+        """Return {output label: risk array} for a mapping of input label -> values.
+
+        With unique_cuts each distinct combination of rule strengths is
+        defuzzified once; worth it when most rows repeat one, as on a grid
+        that varies two inputs and holds the rest.
+        """
+        missing = [label for label in self.input_labels if inputs.get(label) is None]
+        if missing:
+            raise ValueError(f"All antecedents must have input values! Missing: {missing}")
+
+        columns = {label: np.atleast_1d(np.asarray(inputs[label], dtype=float)) for label in self.input_labels}
+        n = max(len(v) for v in columns.values())
+        memberships = {
+            var.label: var.fuzzify(np.broadcast_to(columns[var.label], (n,)))
+            for var in self.antecedents
+        }
+
+        cuts = {c.label: [None] * len(c.term_names) for c in self.consequents}
+        for tree, and_func, or_func, targets in self.rules:
+            firing = self._fire(tree, memberships, and_func, or_func)
+            for var, term, weight in targets:
+                value = firing * weight
+                current = cuts[var.label][term]
+                cuts[var.label][term] = value if current is None else self._accumulate[var.label](value, current)
+
+        return {c.label: self._defuzzify(c, cuts[c.label], n, unique_cuts) for c in self.consequents}
+
+    def _defuzzify(self, var, term_cuts, n, unique_cuts=False):
+        active = [i for i, cut in enumerate(term_cuts) if cut is not None]
+        if not active:
+            return np.full(n, np.nan)
+        mfs = var.mfs[active]
+        cuts = np.stack([np.broadcast_to(term_cuts[i], (n,)) for i in active], axis=1)
+        inverse = None
+        if unique_cuts:
+            cuts, inverse = np.unique(cuts, axis=0, return_inverse=True)
+        centroid = _centroid_exact if self.analytic else _centroid
+        out = np.empty(len(cuts))
+        for start in range(0, len(cuts), _CHUNK):
+            out[start:start + _CHUNK] = centroid(var.universe, mfs, cuts[start:start + _CHUNK])
+        return out if inverse is None else out[inverse.reshape(-1)]
+
+    def signature(self):
+        """Hash of universes, membership functions and rules; changes whenever the model would."""
+        digest = hashlib.sha1(b"analytic" if self.analytic else b"")
+        for var in self.antecedents + self.consequents:
+            digest.update(var.label.encode())
+            digest.update(var.universe.tobytes())
+            digest.update(var.mfs.tobytes())
+        for tree, and_func, or_func, targets in self.rules:
+            digest.update(repr((tree, and_func.__name__, or_func.__name__)).encode())
+            digest.update(repr([(var.label, term, weight) for var, term, weight in targets]).encode())
+        return digest.hexdigest()
+
+    def simulation(self):
+        return FuzzySimulation(self)
+
+
+def _centroid(x, mfs, cuts):
+    # Upsampled universe: every grid point plus the points where a term's
+    # membership crosses its cut (skfuzzy's _interp_universe_fast). Rows have
+    # different numbers of crossings, so short rows are padded with x[0];
+    # the duplicates only add zero-width segments.
+    n = len(cuts)
+    level = cuts[:, :, None]
+    above = np.where(level == 0.0, mfs[None] > level, mfs[None] >= level)
+    crosses = (above[:, :, :-1] != above[:, :, 1:]).reshape(n, -1)
+    rows, cols = np.nonzero(crosses)
+    term, seg = np.divmod(cols, len(x) - 1)
+    xc = (x[seg] + (cuts[rows, term] - mfs[term, seg])
+          * (x[seg + 1] - x[seg]) / (mfs[term, seg + 1] - mfs[term, seg]))
+
+    counts = crosses.sum(axis=1)
+    rank = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    extra = np.full((n, counts.max(initial=0)), x[0])
+    extra[rows, rank] = xc
+    points = np.sort(np.concatenate([np.broadcast_to(x, (n, len(x))), extra], axis=1), axis=1)
+
+    y = np.zeros_like(points)
+    for t in range(mfs.shape[0]):
+        np.maximum(y, np.minimum(cuts[:, t, None], np.interp(points, x, mfs[t])), out=y)
+
+    # Centroid of the piecewise-linear output using skfuzzy.defuzzify.centroid's
+    # per-segment formulas and left-to-right summation (cumsum), so a risk that
+    # sits exactly on the 50 cut-off rounds the same way as the reference.
+    x1, x2 = points[:, :-1], points[:, 1:]
+    y1, y2 = y[:, :-1], y[:, 1:]
+    dx = x2 - x1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moment = np.where(
+            y1 == y2, 0.5 * (x1 + x2),
+            np.where(y1 == 0.0, 2.0 / 3.0 * dx + x1,
+                     np.where(y2 == 0.0, 1.0 / 3.0 * dx + x1,
+                              (2.0 / 3.0 * dx * (y2 + 0.5 * y1)) / (y1 + y2) + x1)))
+        area = np.where(
+            y1 == y2, dx * y1,
+            np.where(y1 == 0.0, 0.5 * dx * y2,
+                     np.where(y2 == 0.0, 0.5 * dx * y1, 0.5 * dx * (y1 + y2))))
+    skip = ((y1 == 0.0) & (y2 == 0.0)) | (dx == 0.0)
+    moment_area = np.where(skip, 0.0, moment * area)
+    area = np.where(skip, 0.0, area)
+    total_moment = np.cumsum(moment_area, axis=1)[:, -1]
+    total_area = np.cumsum(area, axis=1)[:, -1]
+    result = total_moment / np.fmax(total_area, np.finfo(float).eps)
+    return np.where(y.sum(axis=1) == 0, np.nan, result)
+
+
+def _breakpoints(x, mfs):
+    # Keep the ends and every point where some term's slope changes
+    slopes = np.diff(mfs, axis=1) / np.diff(x)
+    keep = np.ones(len(x), dtype=bool)
+    keep[1:-1] = (np.abs(np.diff(slopes, axis=1)) > 1e-9).any(axis=0)
+    return x[keep], mfs[:, keep]
+
+
+def _centroid_exact(x, mfs, cuts):
+    # x/mfs are breakpoints, so every term is linear on each segment. Add the
+    # points where a term's edge reaches any term's cut (its own clip, or the
+    # level where it overtakes another term's flat top) and where two edges
+    # cross; the aggregated output is linear between all of them. Rows whose
+    # crossings fall outside a segment are padded with x[0], which only adds
+    # zero-width segments.
+    n, terms = cuts.shape
+    x1, x2 = x[:-1], x[1:]
+    m1, m2 = mfs[:, :-1], mfs[:, 1:]
+
+    fixed = [x]
+    for t in range(terms):
+        for s in range(t + 1, terms):
+            d1, d2 = m1[t] - m1[s], m2[t] - m2[s]
+            crossing = d1 * d2 < 0
+            fixed.append(x1[crossing] + d1[crossing] / (d1[crossing] - d2[crossing]) * (x2 - x1)[crossing])
+    fixed = np.concatenate(fixed)
+
+    rise = m2 - m1
+    sloped = rise != 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = (cuts[:, None, None, :] - m1[None, :, :, None]) / rise[None, :, :, None]
+    inside = sloped[None, :, :, None] & (frac > 0) & (frac < 1)
+    reached = np.where(inside, x1[None, None, :, None] + frac * (x2 - x1)[None, None, :, None], x[0])
+    points = np.sort(np.concatenate([np.broadcast_to(fixed, (n, len(fixed))), reached.reshape(n, -1)], axis=1), axis=1)
+
+    y = np.zeros_like(points)
+    for t in range(terms):
+        np.maximum(y, np.minimum(cuts[:, t, None], np.interp(points, x, mfs[t])), out=y)
+
+    # Exact area and first moment of each trapezoid
+    xa, xb = points[:, :-1], points[:, 1:]
+    ya, yb = y[:, :-1], y[:, 1:]
+    dx = xb - xa
+    area = (0.5 * dx * (ya + yb)).sum(axis=1)
+    moment = (dx * (xa * (2 * ya + yb) + xb * (ya + 2 * yb)) / 6.0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(area > 0, moment / area, np.nan)
+
+
+class FuzzySimulation:
+    """Drop-in for ControlSystemSimulation: set .input[...], call compute(), read .output[...]."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.ctrl = engine.ctrl
+        self.input = _SimulationInput(engine.input_labels)
+        self.output = {}
+
+    def compute(self):
+        scalar = all(np.ndim(v) == 0 for v in self.input.values())
+        results = self.engine.evaluate(self.input)
+        if scalar:
+            self.output = {}
+            for label, values in results.items():
+                if np.isnan(values[0]):
+                    raise ValueError(f"Cannot defuzzify the fuzzy variable '{label}'. The membership area is empty.")
+                self.output[label] = float(values[0])
+        else:
+            self.output = results
+
+    def reset(self):
+        self.input.clear()
+        self.output = {}
+
+
+class _SimulationInput(dict):
+    def __init__(self, labels):
+        super().__init__()
+        self._labels = labels
+
+    def __setitem__(self, key, value):
+        if key not in self._labels:
+            raise ValueError("Unexpected input: " + key)
+        super().__setitem__(key, value)
+
+
+def compile_system(system, analytic=False):
+    return CompiledFuzzySystem(system, analytic)
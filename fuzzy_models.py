@@ -0,0 +1,319 @@
+import os
+import numpy as np
+import pandas as pd
+import skfuzzy.control as ctrl
+from fuzzy_engine import ANALYTIC_TOLERANCE, TOLERANCE, compile_system
+from datasets import read_dataset, normalize_columns
+
+RISK_THRESHOLD = 50
+
+# Set MDS_ANALYTIC=1 to build every model in analytic mode (see fuzzy_engine):
+# universes hold only the points the automf(3) triangles bend at, and the
+# centroid is computed in closed form.
+ANALYTIC = os.environ.get("MDS_ANALYTIC") == "1"
+
+
+def _limit(source, column, which):
+    # Universe bounds from the reference DataFrame, or from live column
+    # statistics ({column: {"min", "max", ...}}, see patient_log)
+    if isinstance(source, dict):
+        return source[column][which]
+    return getattr(source[column], which)()
+
+
+def _universe(start, stop, step, analytic=False):
+    """np.arange(start, stop, step), or in analytic mode just the points its automf(3) terms bend at."""
+    if not analytic:
+        return np.arange(start, stop, step)
+    count = int(np.ceil((stop - start) / step))
+    last = start + (count - 1) * step
+    middle = (start + last) / 2
+    # automf peaks at min, middle and max. On odd spans the middle falls
+    # between grid points; keeping its two neighbours instead reproduces the
+    # flattened peak the full grid would sample.
+    below = np.floor((middle - start) / step + 1e-9)
+    if abs(start + below * step - middle) <= 1e-9 * step:
+        points = [start, middle, last]
+    else:
+        points = [start, start + below * step, start + (below + 1) * step, last]
+    return np.unique(np.array(points, dtype=float))
+
+
+# --- Fuzzy Logic for Heart Disease ---
+def create_fuzzy_heart(df, analytic=ANALYTIC):
+    age = ctrl.Antecedent(_universe(_limit(df, 'age', 'min'), _limit(df, 'age', 'max') + 1, 1, analytic), 'age')
+    cholesterol = ctrl.Antecedent(_universe(_limit(df, 'Cholesterol', 'min'), _limit(df, 'Cholesterol', 'max') + 1, 1, analytic), 'cholesterol')
+    thalach = ctrl.Antecedent(_universe(_limit(df, 'thalach', 'min'), _limit(df, 'thalach', 'max') + 1, 1, analytic), 'thalach')
+    chest_pain = ctrl.Antecedent(_universe(0, 4, 1, analytic), 'chest_pain')
+    resting_bp = ctrl.Antecedent(_universe(_limit(df, 'trestbps', 'min'), _limit(df, 'trestbps', 'max') + 1, 1, analytic), 'resting_bp')
+    heart_risk = ctrl.Consequent(_universe(0, 101, 1, analytic), 'heart_risk')
+
+    age.automf(3)
+    cholesterol.automf(3)
+    thalach.automf(3)
+    chest_pain.automf(3)
+    resting_bp.automf(3)
+    heart_risk.automf(3)
+
+    rules = [
+        ctrl.Rule(age['poor'] & cholesterol['poor'], heart_risk['poor']),
+        ctrl.Rule(chest_pain['poor'] & resting_bp['poor'], heart_risk['poor']),
+        ctrl.Rule(age['average'] & cholesterol['average'], heart_risk['average']),
+        ctrl.Rule(thalach['good'] & cholesterol['good'], heart_risk['good']),
+        ctrl.Rule(chest_pain['good'] & thalach['good'] & age['good'], heart_risk['good']),
+    ]
+
+    heart_ctrl = ctrl.ControlSystem(rules)
+    return compile_system(heart_ctrl, analytic).simulation()
+
+
+# --- Fuzzy Logic for Diabetes ---
+def create_fuzzy_diabetes(df, analytic=ANALYTIC):
+    glucose = ctrl.Antecedent(_universe(_limit(df, 'Glucose', 'min'), _limit(df, 'Glucose', 'max') + 1, 1, analytic), 'glucose')
+    bmi = ctrl.Antecedent(_universe(_limit(df, 'BMI', 'min'), _limit(df, 'BMI', 'max') + 1, 1, analytic), 'bmi')
+    age = ctrl.Antecedent(_universe(_limit(df, 'Age', 'min'), _limit(df, 'Age', 'max') + 1, 1, analytic), 'age')
+    blood_pressure = ctrl.Antecedent(_universe(_limit(df, 'BloodPressure', 'min'), _limit(df, 'BloodPressure', 'max') + 1, 1, analytic), 'blood_pressure')
+    diabetes_risk = ctrl.Consequent(_universe(0, 101, 1, analytic), 'diabetes_risk')
+
+    glucose.automf(3)
+    bmi.automf(3)
+    age.automf(3)
+    blood_pressure.automf(3)
+    diabetes_risk.automf(3)
+
+    rules = [
+        ctrl.Rule(glucose['poor'] & bmi['poor'] & age['poor'], diabetes_risk['poor']),
+        ctrl.Rule(glucose['average'] & bmi['average'] & age['average'], diabetes_risk['average']),
+        ctrl.Rule(glucose['good'] & bmi['good'] & age['good'], diabetes_risk['good']),
+        ctrl.Rule(blood_pressure['poor'] & glucose['poor'], diabetes_risk['poor']),
+        ctrl.Rule(blood_pressure['average'] & bmi['average'] & age['average'], diabetes_risk['average']),
+        ctrl.Rule(glucose['average'] & blood_pressure['good'], diabetes_risk['average'])
+    ]
+
+    diabetes_ctrl = ctrl.ControlSystem(rules)
+    return compile_system(diabetes_ctrl, analytic).simulation()
+
+
+# --- Fuzzy Logic for Thyroid ---
+def create_fuzzy_thyroid(df, analytic=ANALYTIC):
+    tsh = ctrl.Antecedent(_universe(_limit(df, 'TSH', 'min'), _limit(df, 'TSH', 'max') + 1, 0.1, analytic), 'tsh')
+    t3 = ctrl.Antecedent(_universe(_limit(df, 'T3', 'min'), _limit(df, 'T3', 'max') + 1, 1, analytic), 't3')
+    t4 = ctrl.Antecedent(_universe(_limit(df, 'T4', 'min'), _limit(df, 'T4', 'max') + 1, 0.1, analytic), 't4')
+    thyroid_risk = ctrl.Consequent(_universe(0, 101, 1, analytic), 'thyroid_risk')
+
+    tsh.automf(3)
+    t3.automf(3)
+    t4.automf(3)
+    thyroid_risk.automf(3)
+
+    rules = [
+        ctrl.Rule(tsh['good'] & t3['good'] & t4['good'], thyroid_risk['poor']),
+        ctrl.Rule(tsh['average'] | t3['average'] | t4['average'], thyroid_risk['average']),
+        ctrl.Rule(tsh['poor'] | t3['poor'] | t4['poor'], thyroid_risk['good']),
+    ]
+
+    system = ctrl.ControlSystem(rules)
+    return compile_system(system, analytic).simulation()
+
+
+# --- Fuzzy Logic for PCOD ---
+def create_fuzzy_pcod(df, analytic=ANALYTIC):
+    bmi = ctrl.Antecedent(_universe(_limit(df, 'BMI', 'min'), _limit(df, 'BMI', 'max') + 1, 1, analytic), 'bmi')
+    insulin = ctrl.Antecedent(_universe(_limit(df, 'Insulin_Level', 'min'), _limit(df, 'Insulin_Level', 'max') + 1, 1, analytic), 'insulin')
+    lh = ctrl.Antecedent(_universe(_limit(df, 'LH', 'min'), _limit(df, 'LH', 'max') + 1, 1, analytic), 'lh')
+    pcod_risk = ctrl.Consequent(_universe(0, 101, 1, analytic), 'pcod_risk')
+
+    bmi.automf(3)
+    insulin.automf(3)
+    lh.automf(3)
+    pcod_risk.automf(3)
+
+    rules = [
+        ctrl.Rule(bmi['good'] & insulin['good'] & lh['good'], pcod_risk['poor']),
+        ctrl.Rule(bmi['average'] | insulin['average'] | lh['average'], pcod_risk['average']),
+        ctrl.Rule(bmi['poor'] | insulin['poor'] | lh['poor'], pcod_risk['good'])
+    ]
+
+    system = ctrl.ControlSystem(rules)
+    return compile_system(system, analytic).simulation()
+
+# --- Fuzzy Logic for Anxiety ---
+
+def create_fuzzy_anxiety(df, analytic=ANALYTIC):
+    sleep = ctrl.Antecedent(_universe(_limit(df, 'SleepHours', 'min'), _limit(df, 'SleepHours', 'max')+0.1, 0.1, analytic), 'sleep')
+    heart_rate = ctrl.Antecedent(_universe(_limit(df, 'HeartRate', 'min'), _limit(df, 'HeartRate', 'max')+1, 1, analytic), 'heart_rate')
+    fatigue = ctrl.Antecedent(_universe(0, 2, 1, analytic), 'fatigue')
+    irritability = ctrl.Antecedent(_universe(0, 2, 1, analytic), 'irritability')
+    restlessness = ctrl.Antecedent(_universe(0, 2, 1, analytic), 'restlessness')
+    score = ctrl.Antecedent(_universe(_limit(df, 'ScoreGAD7', 'min'), _limit(df, 'ScoreGAD7', 'max')+1, 1, analytic), 'score')
+    anxiety_risk = ctrl.Consequent(_universe(0, 101, 1, analytic), 'anxiety_risk')
+
+    sleep.automf(3)
+    heart_rate.automf(3)
+    fatigue.automf(3)
+    irritability.automf(3)
+    restlessness.automf(3)
+    score.automf(3)
+    anxiety_risk.automf(3)
+
+    rules = [
+        ctrl.Rule(sleep['poor'] | score['good'] | heart_rate['good'], anxiety_risk['good']),
+        ctrl.Rule(score['average'] | irritability['average'] | fatigue['average'], anxiety_risk['average']),
+        ctrl.Rule(sleep['good'] & fatigue['poor'] & irritability['poor'], anxiety_risk['poor']),
+        ctrl.Rule(restlessness['poor'] | fatigue['good'], anxiety_risk['good']),  # ✅ Added rule with restlessness
+    ]
+
+
+    system = ctrl.ControlSystem(rules)
+    return compile_system(system, analytic).simulation()
+
+
+# --- Batch scoring ---
+# Per disease: model builder, output label and which dataset column feeds
+# each antecedent. Columns may also be given under the antecedent label.
+MODELS = {
+    "heart": {
+        "builder": create_fuzzy_heart,
+        "output": "heart_risk",
+        "inputs": {"age": "age", "cholesterol": "Cholesterol", "thalach": "thalach",
+                   "chest_pain": "cp", "resting_bp": "trestbps"},
+    },
+    "diabetes": {
+        "builder": create_fuzzy_diabetes,
+        "output": "diabetes_risk",
+        "inputs": {"glucose": "Glucose", "bmi": "BMI", "age": "Age", "blood_pressure": "BloodPressure"},
+    },
+    "thyroid": {
+        "builder": create_fuzzy_thyroid,
+        "output": "thyroid_risk",
+        "inputs": {"tsh": "TSH", "t3": "T3", "t4": "T4"},
+    },
+    "pcod": {
+        "builder": create_fuzzy_pcod,
+        "output": "pcod_risk",
+        "inputs": {"bmi": "BMI", "insulin": "Insulin_Level", "lh": "LH"},
+    },
+    "anxiety": {
+        "builder": create_fuzzy_anxiety,
+        "output": "anxiety_risk",
+        "inputs": {"sleep": "SleepHours", "heart_rate": "HeartRate", "fatigue": "Fatigue",
+                   "irritability": "Irritability", "restlessness": "Restlessness", "score": "ScoreGAD7"},
+    },
+}
+
+BATCH_DTYPE = np.dtype([("risk", float), ("label", "U3")])
+
+
+def build_model(disease):
+    return MODELS[disease]["builder"](read_dataset(disease))
+
+
+def _column_values(values):
+    # Anxiety symptom columns are "Yes"/"No" in the dataset, 1/0 on the page
+    if not pd.api.types.is_numeric_dtype(values):
+        values = values.astype(str).str.strip().str.lower().map({"yes": 1, "no": 0}).fillna(values)
+    return values.to_numpy(dtype=float)
+
+
+def model_inputs(disease, df):
+    if disease not in MODELS:
+        raise ValueError(f"Unknown disease '{disease}'")
+    df = normalize_columns(disease, df.copy())
+    inputs, missing = {}, []
+    for label, column in MODELS[disease]["inputs"].items():
+        if column in df.columns:
+            inputs[label] = _column_values(df[column])
+        elif label in df.columns:
+            inputs[label] = _column_values(df[label])
+        else:
+            missing.append(column)
+    if missing:
+        raise KeyError(f"Missing columns for {disease}: {missing}")
+    return inputs
+
+
+def diagnosis_labels(risk):
+    """"Yes"/"No" per risk; "" where no rule fired (NaN risk) rather than a confident "No"."""
+    risk = np.asarray(risk, dtype=float)
+    return np.where(np.isnan(risk), "", np.where(risk >= RISK_THRESHOLD, "Yes", "No"))
+
+
+def score_batch(disease, df, sim=None):
+    """Score every row of df in one pass; returns a record array with 'risk' and 'label'.
+
+    Rows no rule fires for keep a NaN risk and an empty label.
+    """
+    if sim is None:
+        sim = build_model(disease)
+    risk = sim.engine.evaluate(model_inputs(disease, df))[MODELS[disease]["output"]]
+    result = np.empty(len(risk), dtype=BATCH_DTYPE)
+    result["risk"] = risk
+    result["label"] = diagnosis_labels(risk)
+    return result
+
+
+def reference_difference(disease):
+    """Rows of the reference dataset where score_batch() and a row-by-row
+    skfuzzy ControlSystemSimulation loop (risk >= RISK_THRESHOLD, "" when no
+    rule fires) give different diagnoses; returns (differing, rows).
+    """
+    df = read_dataset(disease)
+    sim = MODELS[disease]["builder"](df, analytic=False)
+    labels = score_batch(disease, df, sim)["label"]
+    rows = model_inputs(disease, df)
+    reference = ctrl.ControlSystemSimulation(sim.ctrl)
+    output = MODELS[disease]["output"]
+    expected = []
+    for i in range(len(labels)):
+        reference.reset()
+        for label, values in rows.items():
+            reference.input[label] = values[i]
+        try:
+            reference.compute()
+            risk = reference.output.get(output)
+        except ValueError:  # empty output area
+            risk = None
+        expected.append("" if risk is None else "Yes" if risk >= RISK_THRESHOLD else "No")
+    return int((labels != np.array(expected)).sum()), len(labels)
+
+
+def analytic_difference(disease, points=20000, seed=0):
+    """Analytic vs sampled inference on the dataset rows plus random inputs.
+
+    Returns (max abs risk difference, differing diagnoses at a cut-off tie,
+    other differing diagnoses). A tie is a row whose sampled and analytic
+    risks are both within TOLERANCE of RISK_THRESHOLD: the sampled centroid
+    gives e.g. 49.99999999999999 where the exact one is 50.0, so the
+    diagnosis of a risk on the cut-off depends on float noise in either mode.
+    """
+    df = read_dataset(disease)
+    sampled = MODELS[disease]["builder"](df, analytic=False).engine
+    analytic = MODELS[disease]["builder"](df, analytic=True).engine
+    rng = np.random.default_rng(seed)
+    rows = model_inputs(disease, df)
+    inputs = {var.label: np.concatenate([rows[var.label], rng.uniform(var.lo, var.hi, points)])
+              for var in sampled.antecedents}
+    output = MODELS[disease]["output"]
+    expected, actual = sampled.evaluate(inputs)[output], analytic.evaluate(inputs)[output]
+    scored = ~np.isnan(expected)
+    if (scored != ~np.isnan(actual)).any():
+        raise AssertionError(f"{disease}: analytic and sampled models disagree on empty outputs")
+    difference = np.abs(actual[scored] - expected[scored])
+    flips = diagnosis_labels(actual[scored]) != diagnosis_labels(expected[scored])
+    tie = (np.abs(expected[scored] - RISK_THRESHOLD) <= TOLERANCE) & (np.abs(actual[scored] - RISK_THRESHOLD) <= TOLERANCE)
+    return float(difference.max(initial=0.0)), int((flips & tie).sum()), int((flips & ~tie).sum())
+
+
+# Check the batch diagnoses against skfuzzy and the analytic models against
+# the sampled ones: python fuzzy_models.py
+if __name__ == "__main__":
+    failed = False
+    for disease in MODELS:
+        differing, rows = reference_difference(disease)
+        failed |= differing > 0
+        print(f"{disease:<9} score_batch vs skfuzzy: {differing} of {rows} diagnoses differ")
+        difference, ties, flips = analytic_difference(disease)
+        failed |= difference > ANALYTIC_TOLERANCE or flips > 0
+        print(f"{disease:<9} max abs difference {difference:.4f} (tolerance {ANALYTIC_TOLERANCE})  "
+              f"diagnoses differing: {ties} at a cut-off tie, {flips} otherwise")
+    raise SystemExit(1 if failed else 0)
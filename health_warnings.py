@@ -0,0 +1,112 @@
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+fuzzy_models = lazy_import("fuzzy_models")
+
+# Per disease: (model input label, comparison, threshold, message), in the
+# order the pages list them. Inputs use the antecedent labels from
+# fuzzy_models.MODELS.
+#
+# Rules are evaluated as NumPy masks over a whole cohort at once:
+# warning_matrix() returns a (patients x rules) boolean matrix, with one
+# vectorized comparison per operator. The pages use the same engine on a
+# one-row cohort. Missing (NaN) values never raise a warning.
+_UFUNCS = {">": "greater", "<": "less", ">=": "greater_equal", "<=": "less_equal", "==": "equal"}
+
+WARNING_RULES = {
+    "heart": [
+        ("cholesterol", ">", 240, "⚠️ High Cholesterol – Increased risk of heart disease."),
+        ("cholesterol", "<", 125, "⚠️ Low Cholesterol – May indicate underlying health issues or malnutrition."),
+        ("resting_bp", ">", 140, "⚠️ High Resting Blood Pressure – May indicate hypertension."),
+        ("resting_bp", "<", 100, "⚠️ Low Resting Blood Pressure – May lead to dizziness or fainting."),
+        ("thalach", "<", 100, "⚠️ Low Max Heart Rate – May be a sign of poor cardiovascular fitness."),
+        ("age", ">", 60, "⚠️ Age over 60 – Age is a major risk factor for heart disease."),
+        ("chest_pain", "==", 3, "⚠️ Asymptomatic Chest Pain Type – Often linked with higher heart disease risk."),
+    ],
+    "diabetes": [
+        ("glucose", ">", 140, "⚠️ High glucose"),
+        ("glucose", "<", 70, "⚠️ Low glucose – Your sugar level is too low."),
+        ("bmi", ">", 30, "⚠️ High BMI – Risk of obesity-related diabetes."),
+        ("bmi", "<", 18.5, "⚠️ Low BMI – Consider nutritional evaluation."),
+        ("blood_pressure", ">", 80, "⚠️ High Blood Pressure"),
+        ("blood_pressure", "<", 60, "⚠️ Low Blood Pressure – May cause dizziness."),
+    ],
+    "thyroid": [
+        ("tsh", ">", 4.0, "⚠️ High TSH – Could indicate hypothyroidism."),
+        ("tsh", "<", 0.4, "⚠️ Low TSH – Could be a sign of hyperthyroidism."),
+        ("t3", "<", 70, "⚠️ Low T3 – Often seen in hypothyroidism."),
+        ("t3", ">", 200, "⚠️ High T3 – Might indicate an overactive thyroid."),
+        ("t4", "<", 5.0, "⚠️ Low T4 – May signal thyroid hormone deficiency."),
+        ("t4", ">", 12, "⚠️ High T4 – Often seen in hyperthyroidism."),
+    ],
+    "pcod": [
+        ("bmi", ">", 25, "⚠️ High BMI – Obesity is a major risk factor for PCOD."),
+        ("bmi", "<", 18.5, "⚠️ Low BMI – Consider monitoring nutritional health."),
+        ("insulin", ">", 15, "⚠️ Elevated Insulin – May indicate insulin resistance."),
+        ("insulin", "<", 10, "⚠️ Very Low Insulin – May need medical attention."),
+        ("lh", ">", 9, "⚠️ High LH – Can contribute to irregular ovulation."),
+    ],
+    "anxiety": [
+        ("restlessness", "==", 1, "⚠️ High Restlessness – Major contributor to anxiety."),
+        ("sleep", "<", 6, "⚠️ Poor Sleep – Can worsen anxiety."),
+        ("fatigue", "==", 1, "⚠️ Fatigue – Often linked with anxiety symptoms."),
+        ("irritability", "==", 1, "⚠️ Irritability – A strong emotional indicator."),
+        ("sleep", ">", 9, "⚠️ Oversleeping – May signal underlying issues."),
+        ("heart_rate", "<", 60, "⚠️ Low Heart Rate – May indicate bradycardia or exhaustion."),
+        ("heart_rate", ">", 100, "⚠️ Elevated Heart Rate – Could be a sign of anxiety or stress."),
+        ("score", "<", 5, "✅ Low GAD-7 Score – Minimal anxiety risk."),
+        ("score", ">=", 15, "⚠️ Severe anxiety – Consider professional evaluation."),
+    ],
+}
+
+
+_compiled = {}
+
+
+def _compile(disease):
+    compiled = _compiled.get(disease)
+    if compiled is None:
+        if disease not in WARNING_RULES:
+            raise ValueError(f"Unknown disease '{disease}'")
+        rules = WARNING_RULES[disease]
+        labels = list(dict.fromkeys(label for label, _, _, _ in rules))
+        columns = np.array([labels.index(label) for label, _, _, _ in rules])
+        thresholds = np.array([threshold for _, _, threshold, _ in rules], dtype=float)
+        groups = []
+        for op in dict.fromkeys(op for _, op, _, _ in rules):
+            idx = np.array([j for j, (_, rule_op, _, _) in enumerate(rules) if rule_op == op])
+            groups.append((getattr(np, _UFUNCS[op]), idx, columns[idx], thresholds[idx]))
+        messages = np.array([message for _, _, _, message in rules], dtype=object)
+        compiled = _compiled[disease] = (labels, groups, messages)
+    return compiled
+
+
+def rule_messages(disease):
+    """Rule messages in column order of warning_matrix()."""
+    return list(_compile(disease)[2])
+
+
+def warning_matrix(disease, inputs):
+    """(patients x rules) boolean matrix for inputs ({input label: array})."""
+    labels, groups, messages = _compile(disease)
+    values = np.column_stack([np.asarray(inputs[label], dtype=float).ravel() for label in labels])
+    matrix = np.empty((len(values), len(messages)), dtype=bool)
+    for ufunc, idx, columns, thresholds in groups:
+        matrix[:, idx] = ufunc(values[:, columns], thresholds)
+    return matrix
+
+
+def cohort_warnings(disease, df):
+    """warning_matrix() for a DataFrame with dataset (or input label) columns."""
+    return warning_matrix(disease, fuzzy_models.model_inputs(disease, df))
+
+
+def warning_lists(disease, matrix):
+    """Messages per patient from a warning_matrix() result."""
+    messages = _compile(disease)[2]
+    return [list(messages[row]) for row in matrix]
+
+
+def health_warnings(disease, values):
+    """Messages of every rule that fires for one patient ({input label: value})."""
+    return warning_lists(disease, warning_matrix(disease, {label: [value] for label, value in values.items()}))[0]
@@ -0,0 +1,100 @@
+import argparse
+import importlib
+import subprocess
+import sys
+import time
+
+# Heavy dependencies are bound with lazy_import() at the top of the modules
+# the app imports, so a library is only imported when one of its attributes
+# is first used. The Home and Doctors pages then never load skfuzzy,
+# pdfplumber, BeautifulSoup or ReportLab. Code that runs at import time must
+# not touch a lazily imported module, or the laziness is lost.
+#
+#   python lazy_imports.py                  # import-time report for the app
+#   python lazy_imports.py --budget-ms 800  # ... and fail if over budget
+
+# Modules that must not be loaded just by importing the app
+HEAVY_MODULES = ("numpy", "pandas", "skfuzzy", "scipy", "networkx", "pdfplumber", "bs4", "reportlab", "openpyxl")
+APP_MODULE = "Medical_Diagnosis_System"
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    Unlike importlib.util.LazyLoader nothing goes into sys.modules before
+    that, so code scanning sys.modules (inspect.getmodule, Streamlit's file
+    watcher) does not trigger the import.
+    """
+
+    def __init__(self, name):
+        object.__setattr__(self, "_lazy_name", name)
+        object.__setattr__(self, "_lazy_module", None)
+
+    def __getattr__(self, attr):
+        module = self._lazy_module
+        if module is None:
+            module = importlib.import_module(self._lazy_name)
+            object.__setattr__(self, "_lazy_module", module)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._lazy_module is not None else "not loaded"
+        return f"<lazy module '{self._lazy_name}' ({state})>"
+
+
+def lazy_import(name):
+    """The module if it is already imported, otherwise a LazyModule for it."""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def import_report(module=APP_MODULE, top=15):
+    """Import module in a fresh interpreter; returns (wall ms, [(cumulative ms, name)], heavy modules loaded)."""
+    code = (f"import sys, time; t = time.perf_counter(); import {module}; "
+            f"print((time.perf_counter() - t) * 1000); "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, check=True)
+    wall_ms, heavy = result.stdout.splitlines()[-2:]
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    costs = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:
+            costs.append((int(cumulative) / 1000, name.strip()))
+    costs.sort(reverse=True)
+    return float(wall_ms), costs[:top], [m for m in heavy.split(",") if m]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the import cost of the app module and check a startup budget.")
+    parser.add_argument("--module", default=APP_MODULE)
+    parser.add_argument("--top", type=int, default=15, help="modules to list")
+    parser.add_argument("--budget-ms", type=float, help="fail if importing the module takes longer")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    wall_ms, costs, heavy = import_report(args.module, args.top)
+    print(f"import {args.module}: {wall_ms:.0f} ms (interpreter total {1000 * (time.perf_counter() - start):.0f} ms)")
+    for cumulative, name in costs:
+        print(f"  {cumulative:>9.1f} ms  {name}")
+    print(f"heavy modules loaded at import: {', '.join(heavy) or 'none'}")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: {', '.join(heavy)} should only load on the pages that use them")
+        failed = True
+    if args.budget_ms is not None:
+        if wall_ms > args.budget_ms:
+            print(f"FAIL: {wall_ms:.0f} ms is over the {args.budget_ms:.0f} ms startup budget")
+            failed = True
+        else:
+            print(f"OK: within the {args.budget_ms:.0f} ms startup budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
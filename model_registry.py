@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+import tracing
+from datasets import DATASET_FILES, file_fingerprint, read_dataset
+from lazy_imports import lazy_import
+from patient_log import live_stats, patient_log
+from result_cache import CachedSimulation, ResultCache
+
+# skfuzzy is only loaded once a model is actually built
+fuzzy_models = lazy_import("fuzzy_models")
+risk_surfaces = lazy_import("risk_surfaces")
+population = lazy_import("population")
+
+# One compiled model (and its reference DataFrame) per disease, shared by
+# every Streamlit session in the process. Entries are keyed by the source
+# CSV's fingerprint and rebuilt only when the file changes; sessions get
+# their own FuzzySimulation handle over the shared engine, which is cheap.
+# Handles answer repeated inputs from a per-disease ResultCache, which is
+# emptied whenever that model is rebuilt; its keys carry the model's
+# signature, so an answer still being computed by the old model when the
+# rebuild happens is never served by the new one.
+
+# Set MDS_LIVE_BOUNDS=1 to take universe bounds from the live statistics of
+# the patient log (patient_log.py) instead of the dataset alone; a model is
+# then also rebuilt when a logged record widens one of the ranges.
+LIVE_BOUNDS = os.environ.get("MDS_LIVE_BOUNDS") == "1"
+
+
+class _Entry:
+    def __init__(self, fingerprint, dataset, engine):
+        self.fingerprint = fingerprint
+        self.dataset = dataset
+        self.engine = engine
+        self.signature = engine.signature()
+        self.surface = None  # the LUT surface once loaded; served only within its error tolerance
+        self.population = None
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._entries = {}
+        self._locks = {disease: threading.Lock() for disease in DATASET_FILES}
+        self._stats_lock = threading.Lock()
+        self._stats = {disease: {"builds": 0, "hits": 0, "misses": 0, "last_build_s": 0.0, "total_build_s": 0.0}
+                       for disease in DATASET_FILES}
+        self._results = {disease: ResultCache() for disease in DATASET_FILES}
+
+    def _count(self, disease, key, amount=1):
+        with self._stats_lock:
+            self._stats[disease][key] += amount
+
+    def _entry(self, disease):
+        if disease not in DATASET_FILES:
+            raise ValueError(f"Unknown disease '{disease}'")
+        fingerprint = file_fingerprint(DATASET_FILES[disease])
+        if LIVE_BOUNDS:
+            fingerprint = (fingerprint, patient_log(disease).bounds())
+        entry = self._entries.get(disease)
+        if entry is None or entry.fingerprint != fingerprint:
+            with self._locks[disease]:
+                # Another session may have rebuilt it while we waited
+                entry = self._entries.get(disease)
+                if entry is None or entry.fingerprint != fingerprint:
+                    self._count(disease, "misses")
+                    return self._build(disease, fingerprint)
+        self._count(disease, "hits")
+        return entry
+
+    def _build(self, disease, fingerprint):
+        start = time.perf_counter()
+        with tracing.span("read_dataset"):
+            dataset = read_dataset(disease)
+        with tracing.span(f"create_fuzzy_{disease}"):
+            source = live_stats(disease) if LIVE_BOUNDS else dataset
+            engine = fuzzy_models.MODELS[disease]["builder"](source).engine
+        elapsed = time.perf_counter() - start
+        entry = _Entry(fingerprint, dataset, engine)
+        self._entries[disease] = entry
+        self._results[disease].clear()
+        with self._stats_lock:
+            stats = self._stats[disease]
+            stats["builds"] += 1
+            stats["last_build_s"] = elapsed
+            stats["total_build_s"] += elapsed
+        return entry
+
+    def dataset(self, disease):
+        return self._entry(disease).dataset
+
+    def engine(self, disease):
+        return self._entry(disease).engine
+
+    def simulation(self, disease, lut=False):
+        return self._simulation(disease, self._entry(disease), lut)
+
+    def model(self, disease, lut=False):
+        """(reference DataFrame, fresh simulation handle) from a single registry lookup."""
+        entry = self._entry(disease)
+        return entry.dataset, self._simulation(disease, entry, lut)
+
+    def _simulation(self, disease, entry, lut):
+        if lut and entry.surface is None:
+            with self._locks[disease]:
+                if entry.surface is None:
+                    entry.surface = risk_surfaces.load_or_build_surface(disease, entry.engine.simulation())
+        # A surface outside its error tolerance is never served; the model
+        # answers from the engine instead (see lut_fallback)
+        if lut and entry.surface.within_tolerance:
+            return CachedSimulation(entry.surface.simulation(), self._results[disease], disease,
+                                    f"{entry.signature}-lut")
+        return CachedSimulation(entry.engine.simulation(), self._results[disease], disease, entry.signature)
+
+    def lut_fallback(self, disease):
+        """Why LUT mode answers this model from the engine, or None while its surface is served."""
+        surface = self._entry(disease).surface
+        if surface is None or surface.within_tolerance:
+            return None
+        return risk_surfaces.describe(surface)
+
+    def population(self, disease):
+        """Sorted reference-cohort risks for the current model (see population.py)."""
+        entry = self._entry(disease)
+        if entry.population is None:
+            with self._locks[disease]:
+                if entry.population is None:
+                    entry.population = population.reference_risks(disease, entry.engine, entry.dataset)
+        return entry.population
+
+    def result_cache(self, disease):
+        return self._results[disease]
+
+    def stats(self):
+        with self._stats_lock:
+            stats = {disease: dict(stats) for disease, stats in self._stats.items()}
+        for disease, cache in self._results.items():
+            stats[disease].update({f"result_{k}": v for k, v in cache.stats().items()})
+        return stats
+
+    def clear(self):
+        self._entries.clear()
+        for cache in self._results.values():
+            cache.clear()
+
+
+REGISTRY = ModelRegistry()
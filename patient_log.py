@@ -0,0 +1,270 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import threading
+from datasets import DATASET_FILES, THYROID_COLUMNS, dataset_cache_path, dataset_manifest
+
+# Append-only log of accepted patient records on top of each reference
+# dataset, written by `bulk_score.py --log` (values read from reports) and,
+# with MDS_PATIENT_LOG=1, by the pages' predictions:
+#
+#   LOG_DIR/<disease>.jsonl        one JSON record per line, dataset column -> value
+#   LOG_DIR/<disease>.stats.json   running statistics + how much of the log they cover
+#
+# Per numeric dataset column the log keeps count, sum, min, max, mean and
+# M2 (Welford), seeded from the columnar cache's manifest, so adding a record
+# and reading the live statistics are both O(columns) and never touch the
+# CSV. Opening a log only replays the records written after its last
+# snapshot. compact() folds the log into the CSV (appending rows, existing
+# lines are left byte for byte) and starts an empty log over the re-imported
+# dataset. A log is meant to be written by one process at a time.
+#
+#   python patient_log.py stats diabetes
+#   python patient_log.py compact diabetes
+
+LOG_DIR = "patient_log"
+
+# Raw CSV header -> normalized column, inverted for compaction
+_RAW_COLUMNS = {"thyroid": {v: k for k, v in THYROID_COLUMNS.items()}}
+
+
+class RunningStats:
+    __slots__ = ("count", "sum", "min", "max", "mean", "m2")
+
+    def __init__(self, count=0, total=0.0, low=None, high=None, mean=0.0, m2=0.0):
+        self.count = count
+        self.sum = total
+        self.min = low
+        self.max = high
+        self.mean = mean
+        self.m2 = m2
+
+    @classmethod
+    def from_manifest(cls, stats):
+        count = stats["count"]
+        return cls(count, stats["mean"] * count, stats["min"], stats["max"], stats["mean"], stats["var"] * count)
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def state(self):
+        return [self.count, self.sum, self.min, self.max, self.mean, self.m2]
+
+    def summary(self):
+        return {"min": self.min, "max": self.max, "mean": self.mean, "count": self.count, "sum": self.sum,
+                "var": self.m2 / self.count if self.count else 0.0}
+
+
+class PatientLog:
+    def __init__(self, disease, directory=LOG_DIR):
+        if disease not in DATASET_FILES:
+            raise ValueError(f"Unknown disease '{disease}'")
+        self.disease = disease
+        self.directory = directory
+        self.path = os.path.join(directory, f"{disease}.jsonl")
+        self.snapshot_path = os.path.join(directory, f"{disease}.stats.json")
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        manifest = dataset_manifest(self.disease)
+        self.base = os.path.basename(dataset_cache_path(self.disease))
+        self.columns = [column["name"] for column in manifest["columns"]]
+        self._stats = {name: RunningStats.from_manifest(stats) for name, stats in manifest["stats"].items()}
+        self.records = 0
+        self.offset = 0
+
+        # Statistics saved over this same dataset version skip replaying the log
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot["base"] == self.base and snapshot["offset"] <= self._log_size():
+                self._stats = {name: RunningStats(*state) for name, state in snapshot["columns"].items()}
+                self.records = snapshot["records"]
+                self.offset = snapshot["offset"]
+        if self.offset < self._log_size():
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                for line in f:
+                    if line.endswith(b"\n"):
+                        self._fold(json.loads(line))
+                        self.offset += len(line)
+            if self.offset < self._log_size():
+                # A torn last line from an interrupted append
+                os.truncate(self.path, self.offset)
+            self._save_snapshot()
+
+    def _log_size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def _fold(self, record):
+        for name, value in record.items():
+            stats = self._stats.get(name)
+            if stats is not None and value is not None:
+                stats.add(float(value))
+        self.records += 1
+
+    def _save_snapshot(self):
+        snapshot = {"base": self.base, "offset": self.offset, "records": self.records,
+                    "columns": {name: stats.state() for name, stats in self._stats.items()}}
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self.snapshot_path}.tmp-{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, self.snapshot_path)
+
+    def _record(self, values):
+        unknown = [name for name in values if name not in self.columns]
+        if unknown:
+            raise ValueError(f"Not {self.disease} dataset columns: {unknown}")
+        record = {}
+        for name, value in values.items():
+            if value is None:
+                continue
+            if name in self._stats:
+                value = float(value)
+                if value != value:  # NaN: leave the field out
+                    continue
+            record[name] = value
+        return record
+
+    def append(self, values):
+        """Add one record ({dataset column: value}); returns the record as logged."""
+        return self.append_many([values])[0]
+
+    def append_many(self, rows):
+        records = [self._record(values) for values in rows]
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode()
+        with self._lock:
+            # Created with the first record; opening a log writes nothing
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(data)
+            for record in records:
+                self._fold(record)
+            self.offset += len(data)
+            self._save_snapshot()
+        return records
+
+    def stats(self):
+        """{column: {"min", "max", "mean", "count", "sum", "var"}} over the dataset plus the log."""
+        with self._lock:
+            return {name: stats.summary() for name, stats in self._stats.items()}
+
+    def bounds(self):
+        """((column, min, max), ...); changes only when a record widens a range."""
+        with self._lock:
+            return tuple((name, stats.min, stats.max) for name, stats in self._stats.items())
+
+    def read_records(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            return [json.loads(line) for line in f if line.endswith(b"\n")]
+
+    def compact(self):
+        """Append the logged records to the dataset CSV and start an empty log; returns rows folded."""
+        with self._lock:
+            records = self.read_records()
+            if records:
+                source = DATASET_FILES[self.disease]
+                with open(source, newline="", encoding="utf-8") as f:
+                    header = next(csv.reader(f))
+                raw = _RAW_COLUMNS.get(self.disease, {})
+                text_columns = {column["name"] for column in dataset_manifest(self.disease)["columns"]
+                                if column["kind"] == "string"}
+
+                tmp = f"{source}.tmp-{os.getpid()}"
+                shutil.copyfile(source, tmp)
+                newline = _line_ending(source)
+                with open(tmp, "a", newline="", encoding="utf-8") as f:
+                    if not _ends_with_newline(source):
+                        f.write(newline)
+                    writer = csv.writer(f, lineterminator=newline)
+                    for record in records:
+                        by_raw = {raw.get(name, name): _csv_value(value, name in text_columns)
+                                  for name, value in record.items()}
+                        writer.writerow([by_raw.get(name.strip(), "") for name in header])
+                os.replace(tmp, source)
+
+            # New CSV fingerprint: re-import, then an empty log over the new base
+            for path in (self.path, self.snapshot_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._load()
+            self._save_snapshot()
+            return len(records)
+
+
+def _line_ending(path):
+    with open(path, "rb") as f:
+        return "\r\n" if f.readline().endswith(b"\r\n") else "\n"
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _csv_value(value, text):
+    # Yes/No columns are logged as 1/0, like the pages and report parsers read them
+    if text and isinstance(value, (int, float)):
+        return "Yes" if value else "No"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def patient_log(disease, directory=LOG_DIR):
+    """Shared log for disease; reopened when its dataset version changes."""
+    key = (disease, os.path.abspath(directory))
+    log = _logs.get(key)
+    if log is None or log.base != os.path.basename(dataset_cache_path(disease)):
+        with _logs_lock:
+            log = _logs.get(key)
+            if log is None or log.base != os.path.basename(dataset_cache_path(disease)):
+                log = _logs[key] = PatientLog(disease, directory)
+    return log
+
+
+def live_stats(disease):
+    """Reference statistics including every logged record (same shape as datasets.dataset_stats)."""
+    return patient_log(disease).stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or compact the append-only patient logs.")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("disease", choices=sorted(DATASET_FILES))
+    args = parser.parse_args(argv)
+
+    log = patient_log(args.disease)
+    if args.command == "compact":
+        print(f"{log.compact()} records folded into {DATASET_FILES[args.disease]}")
+        return 0
+    print(f"{args.disease}: {log.records} logged records over {log.base}")
+    for name, s in log.stats().items():
+        print(f"  {name:<28} n={s['count']:<6} min={s['min']:<10g} max={s['max']:<10g} "
+              f"mean={s['mean']:<12.4f} var={s['var']:.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
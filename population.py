@@ -0,0 +1,51 @@
+import glob
+import os
+from datasets import dataset_cache_path, dataset_manifest, read_dataset
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+fuzzy_models = lazy_import("fuzzy_models")
+
+# Where a patient's risk falls in the reference cohort (heart.csv, ...).
+# Each dataset is scored once per model into a sorted risk array, saved as
+# risks-<model signature>.npy inside that dataset's columnar cache directory
+# (datasets.py). Editing the CSV gives a new cache directory and changing the
+# rules or universes a new signature, so either rebuilds the array on first
+# use. A percentile query is two binary searches over the array.
+
+REFERENCE_PREFIX = "risks-"
+
+
+def reference_path(disease, engine):
+    return os.path.join(dataset_cache_path(disease), f"{REFERENCE_PREFIX}{engine.signature()}.npy")
+
+
+def reference_risks(disease, engine, dataset=None):
+    """Sorted risks of the reference cohort under engine; rows no rule fires for are left out."""
+    dataset_manifest(disease)  # make sure the cache directory exists
+    path = reference_path(disease, engine)
+    if os.path.exists(path):
+        return np.load(path)
+
+    if dataset is None:
+        dataset = read_dataset(disease)
+    risks = engine.evaluate(fuzzy_models.model_inputs(disease, dataset))[fuzzy_models.MODELS[disease]["output"]]
+    risks = np.sort(risks[~np.isnan(risks)])
+
+    tmp = f"{path}.tmp-{os.getpid()}.npy"
+    np.save(tmp, risks)
+    os.replace(tmp, path)
+    # Arrays of earlier rule sets for this dataset version
+    for stale in glob.glob(os.path.join(os.path.dirname(path), f"{REFERENCE_PREFIX}*.npy")):
+        if stale != path and ".tmp-" not in stale:
+            os.remove(stale)
+    return risks
+
+
+def percentile(sorted_risks, risk):
+    """Percent of the cohort with a lower risk than risk, counting equal risks as half."""
+    if not len(sorted_risks) or np.isnan(risk):
+        return float("nan")
+    below = np.searchsorted(sorted_risks, risk, side="left")
+    up_to = np.searchsorted(sorted_risks, risk, side="right")
+    return 100.0 * (below + up_to) / (2 * len(sorted_risks))
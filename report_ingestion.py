@@ -0,0 +1,263 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from datasets import normalize_columns
+from lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
+pdfplumber = lazy_import("pdfplumber")
+
+_NUMBER = r"[:\s]+([\d.]+)"
+_YES_NO = r"[:\s]+(yes|no|[01])\b"
+
+
+def _number(text):
+    return float(text)
+
+
+def _yes_no(text):
+    return 1.0 if text.lower() in ("yes", "1") else 0.0
+
+
+# Per disease: dataset column -> (pattern for PDF text, value parser). The
+# columns are the ones the disease model reads (fuzzy_models.MODELS).
+REPORT_FIELDS = {
+    "diabetes": {
+        "Glucose": (r"Glucose" + _NUMBER, _number),
+        "BMI": (r"BMI" + _NUMBER, _number),
+        "Age": (r"Age" + _NUMBER, _number),
+        "BloodPressure": (r"BloodPressure" + _NUMBER, _number),
+    },
+    "thyroid": {
+        "TSH": (r"TSH" + _NUMBER, _number),
+        "T3": (r"T3" + _NUMBER, _number),
+        "T4": (r"T4" + _NUMBER, _number),
+    },
+    "pcod": {
+        "BMI": (r"BMI" + _NUMBER, _number),
+        "Insulin_Level": (r"Insulin[_\s]?Level" + _NUMBER, _number),
+        "LH": (r"LH" + _NUMBER, _number),
+    },
+    "heart": {
+        "age": (r"Age" + _NUMBER, _number),
+        "Cholesterol": (r"Cholesterol" + _NUMBER, _number),
+        "thalach": (r"(?:thalach|Max(?:imum)?\s*Heart\s*Rate)" + _NUMBER, _number),
+        "cp": (r"(?:\bcp|Chest\s*Pain(?:\s*Type)?)" + _NUMBER, _number),
+        "trestbps": (r"(?:trestbps|Resting\s*(?:Blood\s*Pressure|BP))" + _NUMBER, _number),
+    },
+    "anxiety": {
+        "SleepHours": (r"Sleep\s*(?:Hours)?" + _NUMBER, _number),
+        "HeartRate": (r"Heart\s*Rate" + _NUMBER, _number),
+        "Fatigue": (r"Fatigue" + _YES_NO, _yes_no),
+        "Irritability": (r"Irritability" + _YES_NO, _yes_no),
+        "Restlessness": (r"Restlessness" + _YES_NO, _yes_no),
+        "ScoreGAD7": (r"(?:ScoreGAD7|GAD-?7(?:\s*Score)?)" + _NUMBER, _number),
+    },
+}
+
+_COMPILED = {
+    disease: {field: (re.compile(pattern, re.IGNORECASE), parser) for field, (pattern, parser) in fields.items()}
+    for disease, fields in REPORT_FIELDS.items()
+}
+
+SUPPORTED_TYPES = ("csv", "xlsx", "pdf")
+
+
+class LabReport:
+    """Values extracted from one uploaded report; fields not found are listed in missing.
+
+    values holds the first patient; rows has one row per patient (every row
+    of a CSV/XLSX table), one column per field, NaN where not found.
+    """
+
+    def __init__(self, disease, source, values, table, pages_read=0, parse_seconds=0.0, rows=None):
+        self.disease = disease
+        self.source = source
+        self.values = values
+        self.table = table
+        self.pages_read = pages_read
+        self.parse_seconds = parse_seconds
+        self.rows = rows if rows is not None else pd.DataFrame([values], columns=list(values), dtype=float)
+
+    @property
+    def patients(self):
+        return len(self.rows)
+
+    @property
+    def missing(self):
+        return [field for field, value in self.values.items() if value is None]
+
+    @property
+    def complete(self):
+        return not self.missing
+
+    def value(self, field, default=None):
+        value = self.values.get(field)
+        return default if value is None else value
+
+
+def report_type(name):
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    if extension not in SUPPORTED_TYPES:
+        raise ValueError("Unsupported file type.")
+    return extension
+
+
+def ingest_report(disease, source, name=None, progress=None):
+    """Parse a CSV/XLSX/PDF report (path or file-like object with .name) for disease.
+
+    progress(pages read, total pages) is called after each PDF page.
+    """
+    if disease not in _COMPILED:
+        raise ValueError(f"Unknown disease '{disease}'")
+    name = name or getattr(source, "name", source)
+    kind = report_type(str(name))
+    start = time.perf_counter()
+    if kind == "pdf":
+        values, pages_read = _scan_pdf(_COMPILED[disease], source, progress)
+        table, rows = pd.DataFrame([values]), None
+    else:
+        table = _read_table(kind, source)
+        rows, pages_read = _table_rows(disease, table), 0
+        values = {field: None if rows.empty or pd.isna(rows[field].iloc[0]) else float(rows[field].iloc[0])
+                  for field in rows.columns}
+    return LabReport(disease, kind, values, table, pages_read, time.perf_counter() - start, rows)
+
+
+def _read_table(kind, source):
+    if kind == "xlsx":
+        return pd.read_excel(source)
+    try:
+        return pd.read_csv(source)
+    except UnicodeDecodeError:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return pd.read_csv(source, encoding="latin1")
+
+
+def _table_rows(disease, table):
+    # Tables use the dataset's own column names (thyroid headers normalized),
+    # one patient per row. Rows without any field value (blank spreadsheet
+    # rows, often trailing ones with a stray space in some other column) are
+    # not patients.
+    table = normalize_columns(disease, table.copy())
+    rows = {}
+    for field, (_, parser) in _COMPILED[disease].items():
+        if field not in table.columns:
+            rows[field] = float("nan")
+            continue
+        column = table[field]
+        if not pd.api.types.is_numeric_dtype(column):
+            column = column.map(lambda value: parser(value.strip()) if isinstance(value, str) else value)
+        rows[field] = column.to_numpy(dtype=float)
+    rows = pd.DataFrame(rows, index=pd.RangeIndex(len(table)))
+    return rows[rows.notna().any(axis=1)].reset_index(drop=True)
+
+
+def _scan_pdf(fields, source, progress=None):
+    # Page by page, searching only for fields not yet found, and stopping as
+    # soon as every field has a value.
+    values = dict.fromkeys(fields)
+    pending = dict(fields)
+    pages_read = 0
+    with pdfplumber.open(source) as pdf:
+        for page in pdf.pages:
+            pages_read += 1
+            text = page.extract_text()
+            if text:
+                for field, (pattern, parser) in list(pending.items()):
+                    match = pattern.search(text)
+                    if match:
+                        values[field] = parser(match.group(1))
+                        del pending[field]
+            if progress is not None:
+                progress(pages_read, len(pdf.pages))
+            if not pending:
+                break
+    return values, pages_read
+
+
+# --- Cache ---
+# Parsed uploads keyed on a hash of the file's bytes plus disease and file
+# type, shared by every session of the process. Streamlit reruns the page on
+# each widget interaction and a re-uploaded file arrives with a new file id,
+# so both then cost one hash of the bytes instead of a parse. Entries are
+# charged the memory of their table and evicted least recently used beyond
+# MDS_UPLOAD_CACHE_MB. Cached reports are shared: treat them as read-only.
+PARSE_VERSION = 3  # bump when parsing changes what a report yields
+DEFAULT_UPLOAD_CACHE_MB = 64
+
+
+def upload_key(disease, name, data):
+    """Cache key of an uploaded file (name, bytes) parsed for disease."""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{PARSE_VERSION}-{disease}-{report_type(name)}-{digest}"
+
+
+class ParsedReportCache:
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("MDS_UPLOAD_CACHE_MB", DEFAULT_UPLOAD_CACHE_MB)) * 2 ** 20)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "parse_seconds": 0.0}
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self._stats["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self._stats["hits"] += 1
+            return item[0]
+
+    def put(self, key, report):
+        size = int(report.table.memory_usage(deep=True).sum() + report.rows.memory_usage().sum()) + 1024
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._items[key] = (report, size)
+            self.bytes += size
+            self._stats["parse_seconds"] += report.parse_seconds
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.bytes -= evicted
+                self._stats["evictions"] += 1
+
+    def parse(self, disease, name, data, key=None):
+        """LabReport of an uploaded file (name, bytes), parsed at most once per content."""
+        key = key or upload_key(disease, name, data)
+        report = self.get(key)
+        if report is None:
+            report = ingest_report(disease, BytesIO(data), name=name)
+            self.put(key, report)
+        return report
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, size=len(self._items), bytes=self.bytes)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+# Shared by every session of this process
+PARSED_REPORTS = ParsedReportCache()
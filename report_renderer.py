@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import tracing
+from diet_loader import load_diet_plan
+from lazy_imports import lazy_import
+
+bs4 = lazy_import("bs4")
+canvas = lazy_import("reportlab.pdfgen.canvas")
+pagesizes = lazy_import("reportlab.lib.pagesizes")
+rl_utils = lazy_import("reportlab.lib.utils")
+
+# Rendered PDFs are addressed by a hash of the report content (plus
+# RENDER_VERSION), so an identical report is rendered once and then served
+# from memory (the REPORT_MEMORY_ITEMS most recently used). The PDFs carry
+# patient names and diagnoses, so keeping them on disk is opt-in:
+#
+#   MDS_REPORT_CACHE_DIR   also keep PDFs there as <hash>.pdf (default: memory only)
+#   MDS_REPORT_CACHE_MB    size limit of that directory; least recently used
+#                          PDFs are deleted beyond it (default 64)
+#
+# Canvases are created with invariant=1, which keeps the output bytes
+# reproducible.
+RENDER_VERSION = 1  # bump when the layout changes
+REPORT_CACHE_DIR = os.environ.get("MDS_REPORT_CACHE_DIR") or None
+DEFAULT_REPORT_CACHE_MB = 64
+REPORT_MEMORY_ITEMS = 256
+
+HEALTH_TIPS = (
+    "Maintain a balanced diet",
+    "Exercise regularly",
+    "Avoid processed sugar",
+    "Follow up with a physician",
+)
+
+# Disease key -> condition name used on the pages and in diet_plans.xlsx
+CONDITIONS = {
+    "heart": "Heart Disease",
+    "diabetes": "Diabetes",
+    "thyroid": "Thyroid",
+    "pcod": "PCOD",
+    "anxiety": "Anxiety",
+}
+
+
+class HealthReport:
+    def __init__(self, name, condition, diagnosis, warnings=(), tips=HEALTH_TIPS, diet=""):
+        self.name = name
+        self.condition = condition
+        self.diagnosis = diagnosis
+        self.warnings = tuple(warnings)
+        self.tips = tuple(tips)
+        self.diet = diet
+
+    @property
+    def key(self):
+        content = [RENDER_VERSION, self.name, self.condition, self.diagnosis,
+                   self.warnings, self.tips, self.diet]
+        return hashlib.sha256(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def health_report(name, condition, diagnosis, warnings=(), days=3, diet_file="diet_plans.xlsx"):
+    """HealthReport with the standard tips and the condition's diet plan."""
+    with tracing.span("load_diet_plan"):
+        raw_diet = load_diet_plan(condition, days, diet_file)
+    with tracing.span("beautifulsoup"):
+        diet = bs4.BeautifulSoup(raw_diet, "html.parser").get_text()
+    return HealthReport(name, condition, diagnosis, warnings, HEALTH_TIPS, diet)
+
+
+# --- Rendering ---
+_MARGIN = 60
+_LINE = 18
+
+
+def _pdf_text(text):
+    # Standard PDF fonts only cover cp1252; emoji and markdown markers are dropped
+    text = re.sub(r"[#*]+", "", text)
+    return text.encode("cp1252", "ignore").decode("cp1252").strip()
+
+
+def render_report_pdf(report):
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=pagesizes.A4, invariant=1)
+    width, height = pagesizes.A4
+    y = height - _MARGIN
+
+    def line(text, font="Helvetica", size=12, indent=0):
+        nonlocal y
+        for part in rl_utils.simpleSplit(_pdf_text(text), font, size, width - 2 * _MARGIN - indent) or [""]:
+            if y < _MARGIN:
+                pdf.showPage()
+                y = height - _MARGIN
+            pdf.setFont(font, size)
+            pdf.drawString(_MARGIN + indent, y, part)
+            y -= _LINE
+
+    line(f"Health Report for {report.name}", "Helvetica-Bold", 16)
+    y -= _LINE / 2
+    line(f"Condition: {report.condition}")
+    line(f"Diagnosis: {report.diagnosis}")
+
+    for title, items in [("Health Warnings", report.warnings), ("Health Tips", report.tips)]:
+        if items:
+            y -= _LINE / 2
+            line(title, "Helvetica-Bold", 13)
+            for text in items:
+                line(f"- {_pdf_text(text)}", indent=12)
+
+    # The diet plan keeps its own layout: "- meal" lines under day headings
+    diet = [text for text in report.diet.splitlines() if _pdf_text(text)]
+    if diet:
+        y -= _LINE / 2
+        line("Diet Plan", "Helvetica-Bold", 13)
+        for text in diet:
+            line(text, indent=12 if text.lstrip().startswith("-") else 0)
+
+    pdf.save()
+    return buffer.getvalue()
+
+
+def _render_worker(report):
+    start = time.perf_counter()
+    pdf = render_report_pdf(report)
+    return pdf, time.perf_counter() - start
+
+
+# --- Cache ---
+class ReportRenderer:
+    """Content-addressed PDF cache in front of render_report_pdf."""
+
+    def __init__(self, cache_dir=REPORT_CACHE_DIR, memory_items=REPORT_MEMORY_ITEMS, max_disk_bytes=None):
+        if max_disk_bytes is None:
+            max_disk_bytes = int(float(os.environ.get("MDS_REPORT_CACHE_MB", DEFAULT_REPORT_CACHE_MB)) * 2 ** 20)
+        self.cache_dir = cache_dir
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_bytes = 0
+        self._memory = OrderedDict()
+        self._disk = None  # key -> size of the PDFs in cache_dir, least recently used first
+        self._lock = threading.Lock()
+        self._stats = {"renders": 0, "hits": 0, "render_seconds": 0.0, "disk_evictions": 0}
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def _disk_index(self):
+        # Built from the directory on first use, oldest modification first;
+        # call with the lock held
+        if self._disk is None:
+            entries = []
+            if os.path.isdir(self.cache_dir):
+                for entry in os.scandir(self.cache_dir):
+                    if entry.name.endswith(".pdf"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, entry.name[:-len(".pdf")], stat.st_size))
+            self._disk = OrderedDict((key, size) for _, key, size in sorted(entries))
+            self.disk_bytes = sum(self._disk.values())
+        return self._disk
+
+    def _remember(self, key, pdf):
+        with self._lock:
+            self._memory[key] = pdf
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        with self._lock:
+            if key not in self._disk_index():
+                return None
+            self._disk.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                pdf = f.read()
+            os.utime(self._path(key))  # keeps the recency order across restarts
+        except FileNotFoundError:
+            with self._lock:
+                self.disk_bytes -= self._disk.pop(key, 0)
+            return None
+        return pdf
+
+    def _write_disk(self, key, pdf):
+        if len(pdf) > self.max_disk_bytes:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{self._path(key)}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp, self._path(key))
+        evicted = []
+        with self._lock:
+            disk = self._disk_index()
+            self.disk_bytes += len(pdf) - disk.pop(key, 0)
+            disk[key] = len(pdf)
+            while self.disk_bytes > self.max_disk_bytes:
+                old, size = disk.popitem(last=False)
+                self.disk_bytes -= size
+                self._stats["disk_evictions"] += 1
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(self._path(old))
+            except FileNotFoundError:
+                pass
+
+    def cached(self, key):
+        pdf = self._memory.get(key)
+        if pdf is None and self.cache_dir:
+            pdf = self._read_disk(key)
+        if pdf is not None:
+            self._remember(key, pdf)
+            with self._lock:
+                self._stats["hits"] += 1
+        return pdf
+
+    def _store(self, key, pdf, seconds):
+        self._remember(key, pdf)
+        with self._lock:
+            self._stats["renders"] += 1
+            self._stats["render_seconds"] += seconds
+        if self.cache_dir:
+            self._write_disk(key, pdf)
+
+    def render(self, report):
+        key = report.key
+        pdf = self.cached(key)
+        if pdf is None:
+            with tracing.span("render_pdf"):
+                pdf, seconds = _render_worker(report)
+            self._store(key, pdf, seconds)
+        return pdf
+
+    def render_many(self, reports, workers=None, chunksize=32):
+        """Render reports across a process pool; returns [(key, pdf, seconds, cached)] in order.
+
+        Identical reports are rendered once; cached ones are not rendered at all.
+        """
+        keys = [report.key for report in reports]
+        done = {}
+        todo = {}
+        for key, report in zip(keys, reports):
+            if key in done or key in todo:
+                with self._lock:
+                    self._stats["hits"] += 1
+                continue
+            pdf = self.cached(key)
+            if pdf is None:
+                todo[key] = report
+            else:
+                done[key] = (pdf, 0.0, True)
+
+        if todo:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rendered = pool.map(_render_worker, todo.values(), chunksize=chunksize)
+                for key, (pdf, seconds) in zip(todo, rendered):
+                    self._store(key, pdf, seconds)
+                    done[key] = (pdf, seconds, False)
+
+        results = []
+        seen = set()
+        for key in keys:
+            pdf, seconds, cached = done[key]
+            # Repeats of a report rendered in this call are cache hits
+            if key in seen:
+                seconds, cached = 0.0, True
+            results.append((key, pdf, seconds, cached))
+            seen.add(key)
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["renders"] + stats["hits"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["mean_render_ms"] = 1000 * stats["render_seconds"] / stats["renders"] if stats["renders"] else 0.0
+        if self.cache_dir:
+            with self._lock:
+                stats.update(disk_files=len(self._disk_index()), disk_bytes=self.disk_bytes)
+        return stats
+
+
+RENDERER = ReportRenderer()
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+from decimal import ROUND_HALF_UP, Decimal
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+# Memoized model answers for the Predict buttons. Reruns and repeated clicks
+# resubmit the same values, so each disease model gets a ResultCache keyed on
+# its inputs rounded to the precision the field is clinically read at
+# (integer glucose, 0.1 BMI, 0.01 TSH, ...), halves rounded up as a reading
+# is (TSH 0.125 -> 0.13). The model is always run on the rounded inputs, hit
+# or miss, so a cached answer is exactly what a fresh compute() on the same
+# rounded inputs returns; the caller's input values are left as entered.
+#
+# Entries are a small tuple key plus the output dict (a few hundred bytes),
+# so max_items bounds the memory; entries older than ttl seconds are
+# dropped when next looked up. Inputs whose rules leave the output empty are
+# cached too and raise the same ValueError again.
+
+DEFAULT_MAX_ITEMS = 4096
+DEFAULT_TTL_S = 3600.0
+
+# Decimal places kept per model input
+PRECISION = {
+    "heart": {"age": 0, "cholesterol": 0, "thalach": 0, "chest_pain": 0, "resting_bp": 0},
+    "diabetes": {"glucose": 0, "bmi": 1, "age": 0, "blood_pressure": 0},
+    "thyroid": {"tsh": 2, "t3": 1, "t4": 1},
+    "pcod": {"bmi": 1, "insulin": 1, "lh": 1},
+    "anxiety": {"sleep": 1, "heart_rate": 0, "fatigue": 0, "irritability": 0, "restlessness": 0, "score": 0},
+}
+
+
+def quantize(disease, values):
+    """values ({input label: number}) rounded half up to the precision of each field."""
+    precision = PRECISION[disease]
+    return {label: float(Decimal(str(float(value))).quantize(Decimal(1).scaleb(-precision[label]), ROUND_HALF_UP))
+            for label, value in values.items()}
+
+
+class ResultCache:
+    def __init__(self, max_items=DEFAULT_MAX_ITEMS, ttl=DEFAULT_TTL_S, clock=time.monotonic):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._clock = clock
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                expires, value = item
+                if expires is None or expires > self._clock():
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._items[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        expires = self._clock() + self.ttl if self.ttl else None
+        with self._lock:
+            self._items[key] = (expires, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self._items), "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "expirations": self.expirations, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+class CachedSimulation:
+    """Wraps a FuzzySimulation; compute() answers repeated rounded inputs from a ResultCache."""
+
+    def __init__(self, sim, cache, disease, namespace=""):
+        self.sim = sim
+        self.engine = sim.engine
+        self.ctrl = sim.ctrl
+        self.input = sim.input
+        self.output = {}
+        self.cache = cache
+        self.disease = disease
+        # Separates answers of different engines sharing a cache: LUT mode,
+        # or a model rebuilt while a compute on the old one was running
+        self.namespace = namespace
+
+    def compute(self):
+        if set(self.input) != set(self.engine.input_labels) or any(np.ndim(v) for v in self.input.values()):
+            # Missing inputs (raises as usual) or a batch: not cached
+            self.sim.compute()
+            self.output = self.sim.output
+            return
+
+        values = quantize(self.disease, self.input)
+        key = (self.namespace,) + tuple(sorted(values.items()))
+        cached = self.cache.get(key)
+        if cached is None:
+            # A scratch handle, so the caller's input keeps its own values
+            sim = self.engine.simulation()
+            for label, value in values.items():
+                sim.input[label] = value
+            try:
+                sim.compute()
+                cached = (dict(sim.output), None)
+            except ValueError as e:  # empty output area
+                cached = (None, str(e))
+            self.cache.put(key, cached)
+
+        output, error = cached
+        if error is not None:
+            raise ValueError(error)
+        self.output = dict(output)
+
+    def reset(self):
+        self.sim.reset()
+        self.output = {}
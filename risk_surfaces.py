@@ -0,0 +1,349 @@
+import itertools
+import os
+import numpy as np
+from fuzzy_engine import FuzzySimulation
+from fuzzy_models import MODELS, RISK_THRESHOLD, build_model
+
+# "LUT mode": each model's risk tabulated on a grid over its antecedent
+# universes and answered by multilinear interpolation. Inputs are clipped
+# to the universe exactly like the fuzzy engine does, so the grid covers
+# every possible query. Small discrete universes (chest pain 0-3, the
+# anxiety Yes/No symptoms) are tabulated at their own points only. Odd
+# resolutions (2^k + 1) put grid lines on the automf peaks at min, middle
+# and max of each universe, which roughly halves the error of an even grid.
+#
+# Interpolation error must not flip a diagnosis, so cells whose corner
+# risks come within max_error of the cut-off, or that have a corner where
+# no rule fires, are "exact cells" answered by the fuzzy engine. Near the
+# inputs where no rule fires the risk is steep and refining barely shrinks
+# the error there, so cells whose corners spread more than a multiple of
+# max_error (the largest multiple that keeps the surface in tolerance) are
+# exact cells too. Starting from the resolution grid, the continuous axis
+# along which the interpolated cells change the most is refined (n -> 2n - 1
+# points) while the grid fits max_cells; of the grids within max_error on
+# random inputs, the one answering the most inputs by interpolation is kept.
+# A model whose surface never gets within max_error is not served from it
+# (see within_tolerance) and answers from the engine.
+#
+#   MDS_LUT_MAX_ERROR    tolerated max-abs error in risk points (default 1)
+#   MDS_LUT_RESOLUTION   points per continuous axis of the first grid, e.g.
+#                        "17" or "age=33,cholesterol=17" (default 9)
+#   MDS_LUT_MAX_CELLS    refinement stops before the grid exceeds this many
+#                        points (default 2000000); 0 keeps the first grid
+
+DEFAULT_MAX_ERROR = 1.0
+DEFAULT_RESOLUTION = 9
+DEFAULT_MAX_CELLS = 2_000_000
+SURFACE_DIR = "lut_cache"
+_VALIDATION_POINTS = 20000
+_DISCRETE_POINTS = 8
+_STEEP_FACTORS = (None, 16, 8, 4, 2, 1)
+_TABULATE_CHUNK = 200_000
+
+
+def parse_resolution(text):
+    """MDS_LUT_RESOLUTION: "17" for every axis or "label=points,..." per axis."""
+    if "=" not in text:
+        return int(text)
+    return {label.strip(): int(points) for label, points in (item.split("=") for item in text.split(","))}
+
+
+MAX_ERROR = float(os.environ.get("MDS_LUT_MAX_ERROR", DEFAULT_MAX_ERROR))
+RESOLUTION = parse_resolution(os.environ.get("MDS_LUT_RESOLUTION", str(DEFAULT_RESOLUTION)))
+MAX_CELLS = int(os.environ.get("MDS_LUT_MAX_CELLS", DEFAULT_MAX_CELLS))
+
+
+class RiskSurface:
+    def __init__(self, disease, output, input_labels, axes, table, signature, max_abs_error=None,
+                 max_error=MAX_ERROR, exact=None, exact_share=None, settings=""):
+        self.disease = disease
+        self.output = output
+        self.output_labels = [output]
+        self.input_labels = list(input_labels)
+        self.axes = [np.asarray(a, dtype=float) for a in axes]
+        self.table = np.asarray(table, dtype=float)
+        self.signature = signature
+        self.max_abs_error = max_abs_error
+        self.max_error = max_error
+        self.exact = _exact_cells(self.table, max_error) if exact is None else np.asarray(exact, dtype=bool)
+        # Share of the validation inputs answered by the engine (exact cells)
+        self.exact_share = exact_share
+        # The build_surface() arguments it was built with (see surface_settings)
+        self.settings = settings
+        self.exact_engine = None  # answers the exact cells; attached by build_surface/load_or_build_surface
+        self.ctrl = None
+        self._corners = np.array(list(itertools.product((0, 1), repeat=len(self.axes))))
+
+    @property
+    def resolution(self):
+        return max(len(a) for a in self.axes)
+
+    @property
+    def within_tolerance(self):
+        return self.max_abs_error is not None and self.max_abs_error <= self.max_error
+
+    def _locate(self, inputs):
+        missing = [label for label in self.input_labels if inputs.get(label) is None]
+        if missing:
+            raise ValueError(f"All antecedents must have input values! Missing: {missing}")
+
+        columns = [np.atleast_1d(np.asarray(inputs[label], dtype=float)) for label in self.input_labels]
+        n = max(len(c) for c in columns)
+        lower, frac = [], []
+        for axis, values in zip(self.axes, columns):
+            values = np.clip(np.broadcast_to(values, (n,)), axis[0], axis[-1])
+            i = np.clip(np.searchsorted(axis, values, side='right') - 1, 0, len(axis) - 2)
+            lower.append(i)
+            frac.append((values - axis[i]) / (axis[i + 1] - axis[i]))
+        return columns, n, np.array(lower), np.array(frac)
+
+    def exact_rows(self, inputs):
+        """Per input row, whether it falls in an exact cell (answered by the engine)."""
+        _, _, lower, _ = self._locate(inputs)
+        return self.exact[tuple(lower)]
+
+    def evaluate(self, inputs):
+        columns, n, lower, frac = self._locate(inputs)
+
+        # All 2^d cell corners at once; zero-weight corners are masked so a
+        # NaN (no rule fired) next to an exact grid hit does not leak in.
+        corners = self._corners[:, :, None]
+        weight = np.where(corners, frac, 1.0 - frac).prod(axis=1)
+        value = self.table[tuple((lower + corners).transpose(1, 0, 2))]
+        with np.errstate(invalid='ignore'):
+            risk = np.where(weight > 0, weight * value, 0.0).sum(axis=0)
+
+        exact = self.exact[tuple(lower)]
+        if exact.any():
+            if self.exact_engine is None:
+                raise RuntimeError(f"No engine attached for the exact cells of the {self.disease} surface")
+            rows = {label: np.broadcast_to(values, (n,))[exact] for label, values in zip(self.input_labels, columns)}
+            risk[exact] = self.exact_engine.evaluate(rows)[self.output]
+        return {self.output: risk}
+
+    def simulation(self):
+        return FuzzySimulation(self)
+
+    def save(self, path):
+        np.savez_compressed(
+            path, table=self.table, disease=self.disease, output=self.output,
+            input_labels=np.array(self.input_labels), signature=self.signature,
+            max_abs_error=np.nan if self.max_abs_error is None else self.max_abs_error,
+            max_error=self.max_error, exact=self.exact,
+            exact_share=np.nan if self.exact_share is None else self.exact_share, settings=self.settings,
+            **{f"axis_{i}": a for i, a in enumerate(self.axes)},
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if "settings" not in data.files:
+                return None  # saved before surfaces recorded their settings; rebuilt
+            axes = [data[f"axis_{i}"] for i in range(len(data["input_labels"]))]
+            error, share = float(data["max_abs_error"]), float(data["exact_share"])
+            return cls(str(data["disease"]), str(data["output"]), [str(s) for s in data["input_labels"]],
+                       axes, data["table"], str(data["signature"]), None if np.isnan(error) else error,
+                       float(data["max_error"]), data["exact"], None if np.isnan(share) else share,
+                       str(data["settings"]))
+
+
+def _cells(values, reduce, skip=None):
+    # Per grid cell, reduce() over its corners; along axis skip values are
+    # already per cell (e.g. differences between neighbouring grid points)
+    for axis in range(values.ndim):
+        if axis != skip:
+            first = (slice(None),) * axis + (slice(0, -1),)
+            second = (slice(None),) * axis + (slice(1, None),)
+            values = reduce(values[first], values[second])
+    return values
+
+
+def _exact_cells(table, margin):
+    # Per cell: its corner risks come within margin of the cut-off, or one
+    # of them is NaN (no rule fired there)
+    low, high = _cells(table, np.minimum), _cells(table, np.maximum)
+    return ~((low > RISK_THRESHOLD + margin) | (high < RISK_THRESHOLD - margin))
+
+
+def _discrete(var):
+    # Analytic-mode universes are only a few breakpoints; only unit-step
+    # integer codes count as small discrete universes
+    return len(var.universe) <= _DISCRETE_POINTS and np.all(np.diff(var.universe) == 1)
+
+
+def _axis_points(engine, resolution):
+    # Grid points per antecedent: a discrete universe's own points, else
+    # resolution (an int, or per input label with DEFAULT_RESOLUTION for the rest)
+    points = []
+    for var in engine.antecedents:
+        if _discrete(var):
+            points.append(len(var.universe))
+        elif isinstance(resolution, dict):
+            points.append(resolution.get(var.label, DEFAULT_RESOLUTION))
+        else:
+            points.append(resolution)
+    unknown = set(resolution) - set(engine.input_labels) if isinstance(resolution, dict) else set()
+    if unknown:
+        raise ValueError(f"Unknown inputs in the LUT resolution: {sorted(unknown)}")
+    return points
+
+
+def _grid_axis(var, points):
+    return var.universe.copy() if _discrete(var) else np.linspace(var.lo, var.hi, points)
+
+
+def _tabulate(engine, axes, output):
+    # In chunks of grid points, so a large grid's meshgrid is never held at once
+    shape = tuple(len(a) for a in axes)
+    table = np.empty(int(np.prod(shape)))
+    for start in range(0, table.size, _TABULATE_CHUNK):
+        index = np.unravel_index(np.arange(start, min(start + _TABULATE_CHUNK, table.size)), shape)
+        inputs = {label: axis[i] for label, axis, i in zip(engine.input_labels, axes, index)}
+        table[start:start + len(index[0])] = engine.evaluate(inputs, unique_cuts=True)[output]
+    return table.reshape(shape)
+
+
+def _refine_axis(engine, table, interpolated):
+    # The continuous axis along which the interpolated cells change the most
+    best, axis = 0.0, None
+    for k, var in enumerate(engine.antecedents):
+        if _discrete(var):
+            continue
+        change = np.nansum(np.where(interpolated, _cells(np.abs(np.diff(table, axis=k)), np.fmax, skip=k), 0.0))
+        if change > best:
+            best, axis = change, k
+    return axis
+
+
+def surface_settings(max_error, resolution, max_cells):
+    resolution = ",".join(f"{k}={v}" for k, v in sorted(resolution.items())) if isinstance(resolution, dict) \
+        else str(resolution)
+    return f"max_error={max_error:g} resolution={resolution} max_cells={max_cells}"
+
+
+def build_surface(disease, sim=None, max_error=MAX_ERROR, resolution=RESOLUTION, max_cells=MAX_CELLS,
+                  validation_points=_VALIDATION_POINTS, seed=0):
+    """Tabulate a disease model, refining the grid one axis at a time while it fits max_cells.
+
+    Returns the grid within max_error that answers the most validation inputs
+    by interpolation, or the last grid tried if none gets there
+    (within_tolerance is then False).
+    """
+    if sim is None:
+        sim = build_model(disease)
+    engine = sim.engine
+    output = MODELS[disease]["output"]
+    # Two independent samples: one alone lets a grid pass on luck near its steep cells
+    samples = [validation_sample(engine, validation_points, seed + i) for i in range(2)]
+    samples = [(sample, engine.evaluate(sample)[output]) for sample in samples]
+    points = _axis_points(engine, resolution)
+    settings = surface_settings(max_error, resolution, max_cells)
+    best = None
+    while True:
+        axes = [_grid_axis(var, n) for var, n in zip(engine.antecedents, points)]
+        table = _tabulate(engine, axes, output)
+        near_cut_off = _exact_cells(table, max_error)
+        spread = _cells(table, np.maximum) - _cells(table, np.minimum)
+        for factor in _STEEP_FACTORS:
+            exact = near_cut_off if factor is None else near_cut_off | (spread > factor * max_error)
+            surface = RiskSurface(disease, output, engine.input_labels, axes, table, engine.signature(),
+                                  max_error=max_error, exact=exact, settings=settings)
+            surface.exact_engine = engine
+            surface.max_abs_error = max(_error(surface, sample, expected) for sample, expected in samples)
+            surface.exact_share = float(np.mean([surface.exact_rows(sample).mean() for sample, _ in samples]))
+            if surface.within_tolerance:
+                break
+        if surface.within_tolerance and (best is None or surface.exact_share < best.exact_share):
+            best = surface
+        if surface.within_tolerance and factor is None:
+            break  # no steep cells needed; a finer grid only costs memory
+        axis = _refine_axis(engine, table, ~near_cut_off)
+        if axis is None:
+            break
+        points[axis] = 2 * points[axis] - 1
+        if np.prod(points) > max_cells:
+            break
+    return best or surface
+
+
+def validation_sample(engine, points=_VALIDATION_POINTS, seed=0):
+    # Random points inside the universes; discrete axes are sampled at their
+    # own values since those are the only inputs the pages send
+    rng = np.random.default_rng(seed)
+    sample = {}
+    for var in engine.antecedents:
+        if _discrete(var):
+            sample[var.label] = rng.choice(var.universe, points)
+        else:
+            sample[var.label] = rng.uniform(var.lo, var.hi, points)
+    return sample
+
+
+def _error(surface, sample, expected):
+    # A point one side scores and the other leaves empty counts as an
+    # infinite error
+    approx = surface.evaluate(sample)[surface.output]
+    if (np.isnan(expected) != np.isnan(approx)).any():
+        return float("inf")
+    both = ~np.isnan(expected)
+    return float(np.abs(expected[both] - approx[both]).max(initial=0.0))
+
+
+def surface_error(surface, engine, points=_VALIDATION_POINTS, seed=0):
+    """Max-abs error of surface against engine on random inputs."""
+    sample = validation_sample(engine, points, seed)
+    return _error(surface, sample, engine.evaluate(sample)[surface.output])
+
+
+def surface_path(disease, max_error=MAX_ERROR, directory=SURFACE_DIR):
+    return os.path.join(directory, f"{disease}_{max_error:g}.npz")
+
+
+def load_or_build_surface(disease, sim=None, max_error=MAX_ERROR, directory=SURFACE_DIR,
+                          resolution=RESOLUTION, max_cells=MAX_CELLS):
+    """Load the saved surface for this model, rebuilding it if missing or built from other rules/data/settings.
+
+    Surfaces that miss max_error are saved and returned too, so callers
+    check within_tolerance rather than rebuilding them on every start.
+    """
+    if sim is None:
+        sim = build_model(disease)
+    path = surface_path(disease, max_error, directory)
+    surface = RiskSurface.load(path) if os.path.exists(path) else None
+    if (surface is None or surface.signature != sim.engine.signature()
+            or surface.settings != surface_settings(max_error, resolution, max_cells)):
+        surface = build_surface(disease, sim, max_error, resolution, max_cells)
+        os.makedirs(directory, exist_ok=True)
+        surface.save(path)
+    surface.exact_engine = sim.engine
+    return surface
+
+
+def lut_simulation(disease, sim=None, max_error=MAX_ERROR, directory=SURFACE_DIR):
+    """Simulation over the model's surface, or over the engine itself if the surface misses max_error."""
+    if sim is None:
+        sim = build_model(disease)
+    surface = load_or_build_surface(disease, sim, max_error, directory)
+    return surface.simulation() if surface.within_tolerance else sim.engine.simulation()
+
+
+def describe(surface):
+    """One line on how a surface answers: interpolated share, or that the engine answers instead."""
+    if not surface.within_tolerance:
+        return (f"risk surface misses the {surface.max_error:g}-point error tolerance "
+                f"(max abs error {surface.max_abs_error:.3g}); predictions use the fuzzy engine")
+    return (f"risk surface within {surface.max_error:g} risk points; "
+            f"{1 - surface.exact_share:.0%} of inputs interpolated, the rest answered by the fuzzy engine")
+
+
+# Build (or refresh) every surface and report its error: python risk_surfaces.py [max error]
+if __name__ == "__main__":
+    import sys
+
+    max_error = float(sys.argv[1]) if len(sys.argv) > 1 else MAX_ERROR
+    for disease in MODELS:
+        surface = load_or_build_surface(disease, max_error=max_error)
+        print(f"{disease:<9} grid {'x'.join(str(len(a)) for a in surface.axes):<18} "
+              f"max abs error {surface.max_abs_error:6.3f}  exact cells {surface.exact.mean():4.0%}  "
+              f"-> {surface_path(disease, max_error)}")
+        print(f"          {describe(surface)}")
@@ -0,0 +1,338 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from http import HTTPStatus
+import numpy as np
+from fuzzy_models import MODELS, RISK_THRESHOLD, model_inputs
+from health_warnings import warning_lists, warning_matrix
+from model_registry import REGISTRY
+
+# Headless JSON scoring for the five models, without the Streamlit UI:
+#
+#   python scoring_service.py serve --port 8765
+#   curl -d '{"tsh": 5.1, "t3": 90, "t4": 7}' localhost:8765/score/thyroid
+#
+# POST /score/<disease> takes the model inputs under their antecedent labels
+# (or dataset column names) and returns risk, diagnosis and warnings. GET
+# /metrics returns per-disease counters and latency percentiles.
+#
+# Requests for the same disease are queued and evaluated together: the
+# first request of a batch waits window_ms for others to join (at most
+# max_batch), then the whole batch goes through one vectorized engine
+# evaluation. The default window of 0 only yields to the event loop, which
+# already collects every request that arrived concurrently; timed windows
+# add at least a timer tick of latency at low load. Queues are bounded; a
+# full queue answers 503. Batches are evaluated in a worker thread, so a
+# model rebuild (its dataset changed, see model_registry) or a large batch
+# never blocks the event loop. Bodies over max_body bytes answer 413 and a
+# malformed Content-Length 400, both closing the connection.
+#
+#   python scoring_service.py loadtest --callers 1 8 64
+
+DEFAULT_WINDOW_MS = 0.0
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_QUEUE = 1024
+DEFAULT_MAX_BODY = 64 * 1024
+_LATENCY_SAMPLES = 10000
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _percentiles(samples):
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p50, p95, p99 = np.percentile(np.fromiter(samples, float), [50, 95, 99])
+    return {"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3)}
+
+
+class MicroBatcher:
+    def __init__(self, disease, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH, max_queue=DEFAULT_MAX_QUEUE):
+        self.disease = disease
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue(max_queue)
+        self.counts = {"requests": 0, "rejected": 0, "batches": 0, "errors": 0}
+        self.latencies_ms = deque(maxlen=_LATENCY_SAMPLES)
+        self.batch_sizes = deque(maxlen=_LATENCY_SAMPLES)
+
+    def parse(self, body):
+        """{antecedent label: float} from a request body; labels or dataset columns."""
+        if not isinstance(body, dict):
+            raise ServiceError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        values, missing = {}, []
+        for label, column in MODELS[self.disease]["inputs"].items():
+            value = body.get(label, body.get(column))
+            if value is None:
+                missing.append(label)
+                continue
+            if isinstance(value, str) and value.strip().lower() in ("yes", "no"):
+                value = 1 if value.strip().lower() == "yes" else 0
+            try:
+                values[label] = float(value)
+            except (TypeError, ValueError):
+                raise ServiceError(HTTPStatus.BAD_REQUEST, f"'{label}' must be a number")
+        if missing:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"Missing inputs for {self.disease}: {missing}")
+        return values
+
+    async def score(self, values):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((values, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.counts["rejected"] += 1
+            raise ServiceError(HTTPStatus.SERVICE_UNAVAILABLE, f"{self.disease} queue is full")
+        self.counts["requests"] += 1
+        return await future
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            if self.queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await self._evaluate(batch)
+
+    def _compute(self, batch):
+        inputs = {label: np.array([values[label] for values, _, _ in batch])
+                  for label in MODELS[self.disease]["inputs"]}
+        risks = REGISTRY.engine(self.disease).evaluate(inputs)[MODELS[self.disease]["output"]]
+        return risks, warning_lists(self.disease, warning_matrix(self.disease, inputs))
+
+    async def _evaluate(self, batch):
+        self.counts["batches"] += 1
+        self.batch_sizes.append(len(batch))
+        try:
+            risks, warnings = await asyncio.get_running_loop().run_in_executor(None, self._compute, batch)
+        except Exception as e:
+            self.counts["errors"] += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        done = time.perf_counter()
+        for (_, future, start), risk, messages in zip(batch, risks, warnings):
+            latency_ms = 1000 * (done - start)
+            self.latencies_ms.append(latency_ms)
+            if future.done():  # caller went away
+                continue
+            scored = not np.isnan(risk)
+            future.set_result({
+                "disease": self.disease,
+                "risk": float(risk) if scored else None,
+                "diagnosis": ("Yes" if risk >= RISK_THRESHOLD else "No") if scored else None,
+                "warnings": messages,
+                "batch_size": len(batch),
+                "latency_ms": round(latency_ms, 3),
+            })
+
+    def metrics(self):
+        sizes = self.batch_sizes
+        return {**self.counts, "queued": self.queue.qsize(),
+                "mean_batch": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+                "latency_ms": _percentiles(self.latencies_ms)}
+
+
+class ScoringService:
+    def __init__(self, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH, max_queue=DEFAULT_MAX_QUEUE,
+                 max_body=DEFAULT_MAX_BODY):
+        self.batchers = {disease: MicroBatcher(disease, window_ms, max_batch, max_queue) for disease in MODELS}
+        self.max_body = max_body
+        self._tasks = []
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=8765):
+        for disease in MODELS:
+            REGISTRY.engine(disease)  # build models before accepting requests
+        self._tasks = [asyncio.create_task(b.run()) for b in self.batchers.values()]
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+
+    def metrics(self):
+        return {disease: batcher.metrics() for disease, batcher in self.batchers.items()}
+
+    async def route(self, method, path, body):
+        if path == "/health":
+            return HTTPStatus.OK, {"status": "ok"}
+        if path == "/metrics":
+            return HTTPStatus.OK, self.metrics()
+        parts = path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "score":
+            batcher = self.batchers.get(parts[1])
+            if batcher is None:
+                raise ServiceError(HTTPStatus.NOT_FOUND, f"Unknown disease '{parts[1]}'")
+            if method != "POST":
+                raise ServiceError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST")
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                raise ServiceError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+            return HTTPStatus.OK, await batcher.score(batcher.parse(payload))
+        raise ServiceError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+
+    async def _handle(self, reader, writer):
+        # Minimal HTTP/1.1: Content-Length bodies, keep-alive unless asked to close
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length", "0")
+                if not length.isdigit():
+                    # The body cannot be framed, so the connection cannot be reused
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length"}, False)
+                    break
+                if int(length) > self.max_body:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                        {"error": f"Body over {self.max_body} bytes"}, False)
+                    break
+                body = await reader.readexactly(int(length))
+
+                try:
+                    status, payload = await self.route(method, path.split("?")[0], body)
+                except ServiceError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}"
+                     f"\r\n\r\n".encode() + data)
+        await writer.drain()
+
+
+# --- Load test ---
+async def _post(reader, writer, path, body):
+    data = json.dumps(body).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    return status, json.loads(await reader.readexactly(length))
+
+
+def _sample_requests(count, seed=0):
+    # Real rows from the reference datasets, mixed across diseases
+    rng = np.random.default_rng(seed)
+    pools = {}
+    for disease in MODELS:
+        inputs = model_inputs(disease, REGISTRY.dataset(disease))
+        pools[disease] = [dict(zip(inputs, row)) for row in zip(*(v.tolist() for v in inputs.values()))]
+    diseases = rng.choice(list(MODELS), count)
+    return [(d, pools[d][rng.integers(len(pools[d]))]) for d in diseases]
+
+
+async def load_test(host, port, callers, total_requests):
+    """Run total_requests spread over callers keep-alive connections; returns a summary dict."""
+    samples = _sample_requests(total_requests)
+    latencies, failures = [], 0
+
+    async def caller(share):
+        nonlocal failures
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for disease, body in share:
+                start = time.perf_counter()
+                status, _ = await _post(reader, writer, f"/score/{disease}", body)
+                latencies.append(1000 * (time.perf_counter() - start))
+                failures += status != 200
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller(samples[i::callers]) for i in range(callers)))
+    elapsed = time.perf_counter() - start
+    return {"callers": callers, "requests": total_requests, "failures": failures,
+            "throughput_rps": round(total_requests / elapsed, 1), "latency_ms": _percentiles(latencies)}
+
+
+async def _run_load_test(args):
+    service = None
+    host, port = args.host, args.port
+    if not args.external:
+        service = ScoringService(args.window_ms, args.max_batch, args.max_queue, args.max_body)
+        host, port = await service.start(args.host, 0)
+    try:
+        for callers in args.callers:
+            before = service.metrics() if service else None
+            result = await load_test(host, port, callers, args.requests)
+            line = (f"{callers:>4} callers: {result['throughput_rps']:>8.1f} req/s, latency ms "
+                    f"p50 {result['latency_ms']['p50']:.2f} p95 {result['latency_ms']['p95']:.2f} "
+                    f"p99 {result['latency_ms']['p99']:.2f}, {result['failures']} failed")
+            if service:
+                after = service.metrics()
+                requests = sum(after[d]["requests"] - before[d]["requests"] for d in after)
+                batches = sum(after[d]["batches"] - before[d]["batches"] for d in after)
+                line += f", mean batch {requests / max(batches, 1):.1f}"
+            print(line)
+    finally:
+        if service:
+            await service.stop()
+
+
+async def _serve(args):
+    service = ScoringService(args.window_ms, args.max_batch, args.max_queue, args.max_body)
+    host, port = await service.start(args.host, args.port)
+    print(f"Scoring service on http://{host}:{port} (window {args.window_ms} ms, max batch {args.max_batch})")
+    async with service.server:
+        await service.server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON scoring service for the diagnosis models.")
+    parser.add_argument("command", choices=["serve", "loadtest"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS, help="micro-batch window")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE, help="queued requests per disease")
+    parser.add_argument("--max-body", type=int, default=DEFAULT_MAX_BODY, help="largest request body in bytes")
+    parser.add_argument("--callers", type=int, nargs="+", default=[1, 8, 64], help="loadtest concurrency levels")
+    parser.add_argument("--requests", type=int, default=2000, help="loadtest requests per level")
+    parser.add_argument("--external", action="store_true", help="loadtest a running service at --host/--port")
+    args = parser.parse_args(argv)
+    asyncio.run(_serve(args) if args.command == "serve" else _run_load_test(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import threading
+from collections import OrderedDict
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Server-side table viewer for the Dataset and Doctors pages. A TableView
+# holds every column as a NumPy array (numeric as is, text dictionary-
+# encoded) and answers queries -- text search, numeric ranges, category
+# choices, a sort column -- with vectorized masks over whole columns. Text
+# filters are matched once against the distinct values and mapped to rows
+# through a lookup table; each column's sort order is computed once per view
+# and filtered results are read off it, so a query is O(rows) with no
+# re-sorting. Only the requested page of rows becomes a DataFrame for the
+# browser. The ordered row ids of recent queries live in a per-session
+# QueryCache, so paging through a result costs O(page size).
+#
+# Views are shared by all sessions and keyed on their source's version
+# (see table_view()), so an edited file gets a new view.
+
+DEFAULT_PAGE_SIZE = 50
+QUERY_CACHE_ITEMS = 16
+
+
+class TableView:
+    def __init__(self, frame):
+        self.columns = [str(name) for name in frame.columns]
+        self.rows = len(frame)
+        self._numeric = {}
+        self._text = {}
+        self._labels = {}  # distinct values plus None for missing (code -1)
+        for name, (_, series) in zip(self.columns, frame.items()):
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                self._numeric[name] = series.to_numpy()
+            else:
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    codes, categories = series.cat.codes.to_numpy(), series.cat.categories
+                else:
+                    codes, categories = pd.factorize(series)
+                categories = pd.Index(categories).astype(str)
+                self._text[name] = (codes.astype(np.int32), np.asarray(categories, dtype=object),
+                                    categories.str.lower())
+                self._labels[name] = np.append(self._text[name][1], None)
+        self.numeric_columns = [name for name in self.columns if name in self._numeric]
+        self.text_columns = [name for name in self.columns if name in self._text]
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def bounds(self, column):
+        values = self._numeric[column]
+        if values.dtype.kind in "iu":
+            return int(values.min()), int(values.max())
+        return float(np.nanmin(values)), float(np.nanmax(values))
+
+    def categories(self, column):
+        return list(self._text[column][1])
+
+    def _rows_with_codes(self, column, wanted):
+        # Lookup table over the codes; the extra last slot catches -1 (missing)
+        codes, categories, _ = self._text[column]
+        table = np.zeros(len(categories) + 1, dtype=bool)
+        table[wanted] = True
+        return table[codes]
+
+    def _order(self, column):
+        # Ascending row order for column with missing values last, plus how
+        # many rows are not missing; computed once per view
+        entry = self._orders.get(column)
+        if entry is None:
+            if column in self._numeric:
+                values = self._numeric[column]
+                order = np.argsort(values, kind="stable")
+                valid = int(np.count_nonzero(~np.isnan(values))) if values.dtype.kind == "f" else len(values)
+            else:
+                codes, categories, _ = self._text[column]
+                rank = np.empty(len(categories) + 1, dtype=np.int64)
+                rank[np.argsort(categories.astype(str), kind="stable")] = np.arange(len(categories))
+                rank[-1] = len(categories)  # missing (-1) sorts last
+                order = np.argsort(rank[codes], kind="stable")
+                valid = int(np.count_nonzero(codes >= 0))
+            with self._lock:
+                entry = self._orders.setdefault(column, (order, valid))
+        return entry
+
+    def select(self, search="", ranges=(), choices=(), sort=None, ascending=True):
+        """Ordered row ids matching every filter.
+
+        search: substring of any text column (case-insensitive)
+        ranges: ((numeric column, low, high), ...), inclusive
+        choices: ((text column, (allowed values, ...)), ...)
+        """
+        mask = np.ones(self.rows, dtype=bool)
+        for column, low, high in ranges:
+            values = self._numeric[column]
+            mask &= (values >= low) & (values <= high)
+        for column, allowed in choices:
+            categories = self._text[column][1]
+            mask &= self._rows_with_codes(column, np.flatnonzero(np.isin(categories, list(allowed))))
+        if search:
+            needle = search.lower()
+            found = np.zeros(self.rows, dtype=bool)
+            for column, (_, _, lower) in self._text.items():
+                wanted = np.flatnonzero(lower.str.contains(needle, regex=False))
+                if len(wanted):
+                    found |= self._rows_with_codes(column, wanted)
+            mask &= found
+
+        if sort is None:
+            return np.flatnonzero(mask)
+        order, valid = self._order(sort)
+        if not ascending:
+            order = np.concatenate([order[:valid][::-1], order[valid:]])
+        return order[mask[order]]
+
+    def page(self, rows, page, page_size=DEFAULT_PAGE_SIZE):
+        """DataFrame of one page (counting from 0) of rows; only these rows are materialized."""
+        ids = rows[page * page_size:(page + 1) * page_size]
+        data = {}
+        for column in self.columns:
+            if column in self._numeric:
+                data[column] = self._numeric[column][ids]
+            else:
+                data[column] = self._labels[column][self._text[column][0][ids]]
+        return pd.DataFrame(data, index=ids, columns=self.columns)
+
+    def summary(self, rows):
+        """Per-column stats over rows: count/min/max/mean for numbers, distinct/most common for text."""
+        summary = {}
+        for column in self.columns:
+            if column in self._numeric:
+                values = self._numeric[column][rows].astype(float)
+                values = values[~np.isnan(values)]
+                count = len(values)
+                summary[column] = {"count": count,
+                                   "min": values.min() if count else np.nan,
+                                   "max": values.max() if count else np.nan,
+                                   "mean": values.mean() if count else np.nan,
+                                   "distinct": np.nan, "most common": ""}
+            else:
+                codes, categories, _ = self._text[column]
+                codes = codes[rows]
+                counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+                summary[column] = {"count": int(counts.sum()), "min": np.nan, "max": np.nan, "mean": np.nan,
+                                   "distinct": int(np.count_nonzero(counts)),
+                                   "most common": categories[counts.argmax()] if counts.any() else ""}
+        return pd.DataFrame(summary).T
+
+
+class QueryCache:
+    """Small LRU of query results for one session."""
+
+    def __init__(self, max_items=QUERY_CACHE_ITEMS):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = self._items[key] = compute()
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+        return value
+
+
+_views = {}
+_views_lock = threading.Lock()
+
+
+def table_view(key, load):
+    """Shared TableView for key (name plus source version), built from load() on first use."""
+    view = _views.get(key)
+    if view is None:
+        with _views_lock:
+            view = _views.get(key)
+            if view is None:
+                # Drop views of older versions of the same source
+                for old in [k for k in _views if k[0] == key[0]]:
+                    del _views[old]
+                view = _views[key] = TableView(load())
+    return view
@@ -0,0 +1,209 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+# Per-stage timing for Streamlit reruns. Off unless MDS_TRACE=1; disabled
+# spans are a shared no-op context manager.
+#
+#   MDS_TRACE=1                      record spans
+#   MDS_TRACE_PROM_FILE=stages.prom  rewrite a Prometheus text file after each rerun
+#   MDS_TRACE_PORT=9108              serve the same text on http://127.0.0.1:9108/metrics
+#   MDS_SLOW_RERUN_MS=500            append reruns slower than this ...
+#   MDS_SLOW_RERUN_LOG=slow_reruns.log   ... with their spans, as JSON lines
+#
+# Spans are aggregated per (stage, page) over the last _SAMPLES durations.
+# The session id is kept out of the metric labels (one series per session
+# would grow without bound) and only appears in the slow-rerun log.
+
+_SAMPLES = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+_enabled = os.environ.get("MDS_TRACE") == "1"
+_prom_file = os.environ.get("MDS_TRACE_PROM_FILE")
+_slow_ms = float(os.environ.get("MDS_SLOW_RERUN_MS", "0") or 0)
+_slow_log = os.environ.get("MDS_SLOW_RERUN_LOG", "slow_reruns.log")
+
+_context = contextvars.ContextVar("trace_context", default=None)
+_lock = threading.Lock()
+_stages = {}
+
+
+class _Stage:
+    def __init__(self):
+        self.samples = deque(maxlen=_SAMPLES)
+        self.count = 0
+        self.total = 0.0
+
+
+class _RerunContext:
+    def __init__(self, session):
+        self.session = session
+        self.page = ""
+        self.spans = []
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def enabled():
+    return _enabled
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = flag
+
+
+def span(stage):
+    """Time the with-block as stage, tagged with the current rerun's page."""
+    if not _enabled:
+        return _NOOP
+    return _Span(stage)
+
+
+def record(stage, seconds):
+    context = _context.get()
+    page = context.page if context else ""
+    if context:
+        context.spans.append((stage, seconds))
+    with _lock:
+        entry = _stages.get((stage, page))
+        if entry is None:
+            entry = _stages[(stage, page)] = _Stage()
+        entry.samples.append(seconds)
+        entry.count += 1
+        entry.total += seconds
+
+
+def set_page(page):
+    context = _context.get()
+    if context:
+        context.page = page
+
+
+@contextmanager
+def rerun(session=""):
+    """Wraps one script run; spans inside are tagged with its page and session."""
+    if not _enabled:
+        yield None
+        return
+    context = _RerunContext(session)
+    token = _context.set(context)
+    start = time.perf_counter()
+    try:
+        yield context
+    finally:
+        total = time.perf_counter() - start
+        record("rerun", total)
+        _context.reset(token)
+        if _slow_ms and 1000 * total >= _slow_ms:
+            _log_slow(context, total)
+        if _prom_file:
+            write_prometheus(_prom_file)
+
+
+def _log_slow(context, total):
+    entry = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "session": context.session, "page": context.page,
+             "total_ms": round(1000 * total, 3),
+             "spans": [[stage, round(1000 * seconds, 3)] for stage, seconds in context.spans]}
+    with _lock, open(_slow_log, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def stage_stats():
+    """{(stage, page): {"count", "sum", "p50", "p95", "p99"}} in seconds."""
+    with _lock:
+        snapshot = {key: (list(s.samples), s.count, s.total) for key, s in _stages.items()}
+    stats = {}
+    for key, (samples, count, total) in sorted(snapshot.items()):
+        values = np.quantile(samples, QUANTILES)
+        stats[key] = {"count": count, "sum": total,
+                      **{f"p{round(q * 100)}": float(v) for q, v in zip(QUANTILES, values)}}
+    return stats
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text():
+    lines = ["# HELP mds_stage_seconds Duration of app stages per rerun.",
+             "# TYPE mds_stage_seconds summary"]
+    for (stage, page), s in stage_stats().items():
+        labels = f'stage="{_label(stage)}",page="{_label(page)}"'
+        for q in QUANTILES:
+            lines.append(f'mds_stage_seconds{{{labels},quantile="{q}"}} {s[f"p{round(q * 100)}"]:.9f}')
+        lines.append(f"mds_stage_seconds_sum{{{labels}}} {s['sum']:.9f}")
+        lines.append(f"mds_stage_seconds_count{{{labels}}} {s['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="mds-metrics").start()
+    return server
+
+
+if _enabled and os.environ.get("MDS_TRACE_PORT"):
+    serve_metrics(int(os.environ["MDS_TRACE_PORT"]))
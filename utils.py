@@ -23,20 +23,11 @@
 
 
 import streamlit as st
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from io import BytesIO
-
-def generate_health_report_pdf(name):
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
-    pdf.setFont("Helvetica", 14)
-    pdf.drawString(100, 800, f"Health Report for {name}")
-    pdf.drawString(100, 770, "Diagnosis: Yes")
-    pdf.drawString(100, 740, "Tips: Exercise, eat well")
-    pdf.save()
-    buffer.seek(0)
-    return buffer.getvalue()
+from report_renderer import HEALTH_TIPS, RENDERER, HealthReport
+
+def generate_health_report_pdf(name, condition="", diagnosis="", tips=HEALTH_TIPS, diet="", warnings=()):
+    # Served from the content-addressed report cache; identical reports are rendered once
+    return RENDERER.render(HealthReport(name, condition, diagnosis, warnings, tips, diet))
 
 # 👇 This block will only run if you open utils.py directly (for testing)
 if __name__ == "__main__":
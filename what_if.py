@@ -0,0 +1,82 @@
+from lazy_imports import lazy_import
+from model_registry import REGISTRY
+from result_cache import ResultCache, quantize
+
+alt = lazy_import("altair")
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+fuzzy_models = lazy_import("fuzzy_models")
+
+# What-if risk maps for the disease pages: a model's risk over a grid of
+# two inputs with the others held at the patient's values. The whole grid
+# is one engine.evaluate() call with unique_cuts, so the many cells that
+# share their rule strengths are defuzzified once; a 100 x 100 grid takes
+# 10-60 ms instead of the ~130 ms a plain batch evaluation costs. Grids
+# are cached by model signature, axes, grid size and the held inputs
+# rounded as for the Predict buttons (result_cache.quantize); a 100 x 100
+# grid is about 80 KB.
+
+DEFAULT_STEPS = 100
+GRID_CACHE_ITEMS = 128
+DISCRETE_POINTS = 8
+
+# Axis titles of the model inputs
+INPUT_TITLES = {
+    "age": "Age", "cholesterol": "Cholesterol", "thalach": "Max Heart Rate", "chest_pain": "Chest Pain Type",
+    "resting_bp": "Resting BP", "glucose": "Glucose", "bmi": "BMI", "blood_pressure": "Blood Pressure",
+    "tsh": "TSH", "t3": "T3", "t4": "T4", "insulin": "Insulin Level", "lh": "LH", "sleep": "Sleep Hours",
+    "heart_rate": "Heart Rate", "fatigue": "Fatigue", "irritability": "Irritability",
+    "restlessness": "Restlessness", "score": "GAD-7 Score",
+}
+
+_grids = ResultCache(GRID_CACHE_ITEMS)
+
+
+def _axis(var, steps):
+    # Small integer-coded inputs (chest pain type, Yes/No symptoms) only
+    # take their own values
+    if len(var.universe) <= DISCRETE_POINTS and np.all(np.diff(var.universe) == 1):
+        return var.universe.copy()
+    return np.linspace(var.lo, var.hi, steps)
+
+
+def risk_grid(disease, x, y, values, steps=DEFAULT_STEPS):
+    """(x axis, y axis, risk[y index, x index]) over inputs x and y; the other inputs are taken from values."""
+    engine = REGISTRY.engine(disease)
+    variables = {var.label: var for var in engine.antecedents}
+    held = quantize(disease, {label: value for label, value in values.items() if label not in (x, y)})
+    key = (disease, engine.signature(), x, y, steps) + tuple(sorted(held.items()))
+    grid = _grids.get(key)
+    if grid is None:
+        xs, ys = _axis(variables[x], steps), _axis(variables[y], steps)
+        inputs = {label: np.full(len(xs) * len(ys), value) for label, value in held.items()}
+        inputs[x] = np.tile(xs, len(ys))
+        inputs[y] = np.repeat(ys, len(xs))
+        risk = engine.evaluate(inputs, unique_cuts=True)[fuzzy_models.MODELS[disease]["output"]]
+        grid = (xs, ys, risk.reshape(len(ys), len(xs)))
+        _grids.put(key, grid)
+    return grid
+
+
+def risk_chart(grid, point, x_title, y_title):
+    """Altair heatmap of a risk_grid() result with point ((x, y) of the patient) marked."""
+    xs, ys, risk = grid
+    cells = pd.DataFrame({"x": np.tile(xs, len(ys)), "y": np.repeat(ys, len(xs)), "risk": risk.ravel().round(1)})
+    # Evenly spaced axes: cell borders are computed by Vega, half a step either side
+    dx = (xs[-1] - xs[0]) / (len(xs) - 1) / 2
+    dy = (ys[-1] - ys[0]) / (len(ys) - 1) / 2
+    x_scale = alt.Scale(domain=[float(xs[0] - dx), float(xs[-1] + dx)], nice=False, zero=False)
+    y_scale = alt.Scale(domain=[float(ys[0] - dy), float(ys[-1] + dy)], nice=False, zero=False)
+    heatmap = alt.Chart(cells).transform_calculate(
+        x0=f"datum.x - {dx}", x1=f"datum.x + {dx}", y0=f"datum.y - {dy}", y1=f"datum.y + {dy}",
+    ).mark_rect().encode(
+        x=alt.X("x0:Q", title=x_title, scale=x_scale), x2="x1",
+        y=alt.Y("y0:Q", title=y_title, scale=y_scale), y2="y1",
+        # Diverging at the Yes/No cut-off
+        color=alt.Color("risk:Q", title="Risk", scale=alt.Scale(scheme="redyellowgreen", reverse=True,
+                                                                domain=[0, 100], domainMid=50)),
+        tooltip=[alt.Tooltip("x:Q", title=x_title), alt.Tooltip("y:Q", title=y_title), "risk:Q"],
+    )
+    marker = alt.Chart(pd.DataFrame({"x": [point[0]], "y": [point[1]]})).mark_point(
+        shape="cross", size=250, filled=True, color="black").encode(x="x:Q", y="y:Q")
+    return (heatmap + marker).properties(height=420)